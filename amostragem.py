@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+import pandas as pd
+import numpy as np
+import argparse
+import os
+import sys
+import time
+from statistics import NormalDist
+from esquema import colunas_para
+from ingestao import detectar_codificacao, ler_primeira_linha, tem_cabecalho, validar_colunas
+from indice_ativos import ARQUIVO_ATIVOS, carregar_indice
+from instrumentacao import etapa
+from analise_por_status import STATUS, NAO_INFORMADO, ORDEM_DIMENSOES, marcar_status, derivar_dimensoes
+
+# Linhas lidas por bloco na passada de amostragem (leitor do pandas)
+TAMANHO_CHUNK_PADRAO = 100_000
+
+# Bytes por bloco no leitor em fluxo do pyarrow
+TAMANHO_BLOCO_BYTES = 8 * 1024 * 1024
+
+# Linhas sorteadas por estrato (ou no total, sem estratificação)
+TAMANHO_AMOSTRA_PADRAO = 2_000
+
+CONFIANCA_PADRAO = 0.95
+
+# Linhas exibidas por tabela (as demais categorias continuam no resultado)
+MAXIMO_LINHAS = 15
+
+# Proporções estimadas: coluna derivada -> título no relatório
+ANALISES = {
+    'tipo_plano': 'Distribuição por tipo de plano',
+    'cidade': 'Distribuição por cidade',
+    'tipo_pessoa': 'Classificação PF/PJ',
+    'faixa_etaria': 'Distribuição por faixa etária',
+    'tempo_categoria': 'Distribuição por categoria de tempo (anos)',
+}
+
+# Médias estimadas: coluna -> título no relatório
+MEDIAS = {
+    'idade': 'Idade média',
+    'tempo_plataforma': 'Tempo médio de plataforma (anos)',
+}
+
+
+class Reservatorio:
+    """Amostra aleatória simples de tamanho fixo em uma passada: guarda as linhas de menores chaves sorteadas"""
+
+    def __init__(self, tamanho, rng):
+        self.tamanho = tamanho
+        self.rng = rng
+        self.linhas = None
+        self.chaves = np.empty(0)
+        self.vistos = 0
+
+    def atualizar(self, bloco):
+        """Considera as linhas de um bloco; cada linha tem a mesma chance de ficar na amostra"""
+        self.vistos += len(bloco)
+        chaves = self.rng.random(len(bloco))
+        if len(self.chaves) == self.tamanho:
+            # Com o reservatório cheio, só entram chaves menores que a maior guardada
+            candidatas = chaves < self.chaves.max()
+            bloco, chaves = bloco[candidatas], chaves[candidatas]
+        if len(bloco) == 0:
+            return self
+        linhas = bloco if self.linhas is None else pd.concat([self.linhas, bloco], ignore_index=True)
+        chaves = np.concatenate([self.chaves, chaves])
+        if len(chaves) > self.tamanho:
+            manter = np.argpartition(chaves, self.tamanho - 1)[:self.tamanho]
+            linhas, chaves = linhas.iloc[manter], chaves[manter]
+        self.linhas = linhas.reset_index(drop=True)
+        self.chaves = chaves
+        return self
+
+
+def _blocos_pyarrow(caminho, colunas, codificacao, nomes, possui_cabecalho):
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    # Linhas malformadas ficam fora da amostra; a ingestão completa (cli.py ingest) as separa em quarentena
+    invalidas = []
+
+    def tratar_linha_invalida(linha):
+        invalidas.append(linha.text)
+        return 'skip'
+
+    # Leitor em fluxo do pyarrow: analisa cada bloco de bytes em várias threads e só converte as colunas pedidas
+    leitor = pacsv.open_csv(
+        caminho,
+        read_options=pacsv.ReadOptions(block_size=TAMANHO_BLOCO_BYTES, encoding=codificacao, column_names=nomes,
+                                       skip_rows=1 if possui_cabecalho else 0),
+        parse_options=pacsv.ParseOptions(invalid_row_handler=tratar_linha_invalida, newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(include_columns=colunas,
+                                             column_types={col: pa.string() for col in colunas},
+                                             strings_can_be_null=True),
+    )
+    for lote in leitor:
+        yield lote.to_pandas()
+    if invalidas:
+        print(f"AVISO: {len(invalidas)} linhas malformadas ignoradas em {caminho}", flush=True)
+
+
+def _blocos_pandas(caminho, colunas, codificacao, nomes, possui_cabecalho, tamanho_chunk):
+    with pd.read_csv(caminho, encoding=codificacao, header=None, names=nomes,
+                     skiprows=1 if possui_cabecalho else 0, usecols=colunas, dtype=str,
+                     chunksize=tamanho_chunk) as leitor:
+        yield from leitor
+
+
+def ler_em_blocos(caminho, colunas, tamanho_chunk=TAMANHO_CHUNK_PADRAO):
+    """Percorre o CSV em blocos de linhas, lendo apenas as colunas indicadas"""
+    # Codificação, cabeçalho e nomes das colunas detectados como na ingestão dos dumps legados
+    codificacao = detectar_codificacao(caminho)
+    campos = ler_primeira_linha(caminho, codificacao)
+    possui_cabecalho = tem_cabecalho(campos)
+    nomes = validar_colunas(campos, possui_cabecalho)
+    try:
+        import pyarrow.csv  # noqa: F401
+    except ImportError:
+        print("AVISO: pyarrow não instalado; usando o leitor em blocos do pandas.", flush=True)
+        return _blocos_pandas(caminho, colunas, codificacao, nomes, possui_cabecalho, tamanho_chunk)
+    return _blocos_pyarrow(caminho, colunas, codificacao, nomes, possui_cabecalho)
+
+
+def amostrar(caminho, tamanho, indice=None, semente=None, tamanho_chunk=TAMANHO_CHUNK_PADRAO):
+    """Sorteia, em uma leitura em blocos, `tamanho` linhas por status (ou no total, sem índice de ativos)"""
+    rng = np.random.default_rng(semente)
+    estratos = {}
+    colunas = colunas_para('planos', 'cidades', 'pf_pj', 'idade', 'tempo')
+    with etapa('amostragem', arquivo=caminho) as registro:
+        for bloco in ler_em_blocos(caminho, colunas, tamanho_chunk):
+            if indice is None:
+                estratos.setdefault('Total', Reservatorio(tamanho, rng)).atualizar(bloco)
+                continue
+            bloco = marcar_status(bloco, indice)
+            for status in STATUS:
+                estratos.setdefault(status, Reservatorio(tamanho, rng)).atualizar(bloco[bloco['status'] == status])
+        registro['linhas'] = sum(r.vistos for r in estratos.values())
+        registro['amostra'] = sum(len(r.chaves) for r in estratos.values())
+
+    amostras = {nome: r.linhas for nome, r in estratos.items() if r.linhas is not None}
+    populacoes = {nome: r.vistos for nome, r in estratos.items() if r.linhas is not None}
+    return amostras, populacoes
+
+
+def derivar_amostras(amostras):
+    """Deriva as dimensões de todos os estratos de uma vez e separa o resultado por estrato"""
+    # Uma única normalização de cidades: feita por estrato, a grafia escolhida (a mais frequente
+    # na amostra) poderia mudar entre estratos e a mesma cidade apareceria duas vezes no total
+    juntas = pd.concat([amostra.assign(estrato=nome) for nome, amostra in amostras.items()], ignore_index=True)
+    juntas = derivar_dimensoes(juntas)
+    return {nome: juntas[juntas['estrato'] == nome].drop(columns='estrato').reset_index(drop=True)
+            for nome in amostras}
+
+
+def fator_correcao(n, populacao):
+    """Correção para população finita: a variância de uma amostra sem reposição encolhe por (N - n) / (N - 1)"""
+    return (populacao - n) / (populacao - 1) if populacao > 1 else 0.0
+
+
+def limites_wilson(p, n_efetivo, z):
+    """Limites de Wilson para proporções p com tamanhos de amostra efetivos (escalares ou arrays; inf = exato)"""
+    with np.errstate(divide='ignore'):
+        inverso = 1 / np.asarray(n_efetivo, dtype=float)
+    denominador = 1 + z ** 2 * inverso
+    centro = (p + z ** 2 * inverso / 2) / denominador
+    margem = z * np.sqrt(p * (1 - p) * inverso + z ** 2 * inverso ** 2 / 4) / denominador
+    return np.maximum(centro - margem, 0.0), np.minimum(centro + margem, 1.0)
+
+
+def intervalo_wilson(sucessos, n, populacao, z):
+    """Intervalo de Wilson para uma proporção, com n efetivo corrigido para população finita"""
+    p = sucessos / n
+    fpc = fator_correcao(n, populacao)
+    if fpc == 0:
+        # Amostra igual à população: a proporção é exata
+        return p, p
+    inferior, superior = limites_wilson(p, n / fpc, z)
+    return float(inferior), float(superior)
+
+
+def estimar_proporcoes(valores, populacao, z):
+    """Proporção de cada categoria na amostra, erro padrão, intervalo de Wilson e total estimado"""
+    n = len(valores)
+    contagens = valores.astype(object).fillna(NAO_INFORMADO).value_counts()
+    tabela = pd.DataFrame({'n': contagens, 'proporcao': contagens / n})
+    tabela['erro_padrao'] = np.sqrt(tabela['proporcao'] * (1 - tabela['proporcao']) / n
+                                    * fator_correcao(n, populacao))
+    limites = [intervalo_wilson(k, n, populacao, z) for k in contagens]
+    tabela['ic_inferior'] = [inferior for inferior, _ in limites]
+    tabela['ic_superior'] = [superior for _, superior in limites]
+    tabela['estimativa'] = (tabela['proporcao'] * populacao).round().astype('int64')
+    return tabela
+
+
+def estimar_media(valores, populacao, z):
+    """Média amostral com intervalo normal e correção para população finita (NaN são ignorados)"""
+    validos = valores.dropna()
+    n = len(validos)
+    # Valores ausentes reduzem a amostra; a população com valor é estimada na mesma razão
+    populacao_valida = populacao * n / len(valores) if len(valores) else 0
+    media = validos.mean()
+    erro = validos.std() / np.sqrt(n) * np.sqrt(fator_correcao(n, populacao_valida)) if n > 1 else np.nan
+    return pd.Series({'n': n, 'populacao': populacao_valida, 'media': media, 'erro_padrao': erro,
+                      'ic_inferior': media - z * erro, 'ic_superior': media + z * erro})
+
+
+def combinar_estratos(tabelas, populacoes, z):
+    """Proporções no total: média dos estratos ponderada por N, com intervalo de Wilson estratificado"""
+    total = sum(populacoes.values())
+    pesos = {nome: populacoes[nome] / total for nome in tabelas}
+    indice = pd.Index(sorted(set().union(*(tabela.index for tabela in tabelas.values())), key=str))
+    proporcao = sum(tabela['proporcao'].reindex(indice, fill_value=0) * pesos[nome]
+                    for nome, tabela in tabelas.items())
+    # Variância da proporção estratificada: variâncias dos estratos somadas com peso ao quadrado
+    variancia = sum((tabela['erro_padrao'].reindex(indice, fill_value=0) * pesos[nome]) ** 2
+                    for nome, tabela in tabelas.items())
+
+    # Wilson com n efetivo = p(1 - p) / variância, o n de uma amostra simples com a mesma precisão.
+    # Se a variância estimada é zero (todos os estratos com proporção 0 ou 1), vale o n efetivo do
+    # desenho para uma proporção comum aos estratos, 1 / soma(W² fpc / n), e o intervalo não colapsa
+    desenho = sum(pesos[nome] ** 2 * fator_correcao(tabela['n'].sum(), populacoes[nome]) / tabela['n'].sum()
+                  for nome, tabela in tabelas.items())
+    n_desenho = 1 / desenho if desenho > 0 else np.inf
+    with np.errstate(divide='ignore', invalid='ignore'):
+        n_efetivo = np.where(variancia > 0, proporcao * (1 - proporcao) / variancia, n_desenho)
+    inferior, superior = limites_wilson(proporcao.to_numpy(), n_efetivo, z)
+    return pd.DataFrame({
+        'n': sum(tabela['n'].reindex(indice, fill_value=0) for tabela in tabelas.values()),
+        'proporcao': proporcao,
+        'erro_padrao': np.sqrt(variancia),
+        'ic_inferior': inferior,
+        'ic_superior': superior,
+        'estimativa': (proporcao * total).round().astype('int64'),
+    })
+
+
+def combinar_medias(medias, z):
+    """Média no total a partir das médias dos estratos, ponderadas pela população com valor"""
+    total = sum(m['populacao'] for m in medias.values())
+    media = sum(m['media'] * m['populacao'] / total for m in medias.values())
+    erro = np.sqrt(sum((m['erro_padrao'] * m['populacao'] / total) ** 2 for m in medias.values()))
+    return pd.Series({'n': sum(m['n'] for m in medias.values()), 'populacao': total, 'media': media,
+                      'erro_padrao': erro, 'ic_inferior': media - z * erro, 'ic_superior': media + z * erro})
+
+
+def ordenar(tabela, coluna):
+    """Faixas na ordem das faixas; demais dimensões da maior para a menor proporção"""
+    if coluna in ORDEM_DIMENSOES:
+        ordem = list(ORDEM_DIMENSOES[coluna]) + [NAO_INFORMADO]
+        return tabela.reindex([valor for valor in ordem if valor in tabela.index])
+    return tabela.sort_values('proporcao', ascending=False, kind='stable')
+
+
+def formatar(tabela, confianca):
+    """Proporções em porcentagem e intervalo de confiança em texto"""
+    rotulo = f"IC {confianca:.0%}"
+    return pd.DataFrame({
+        'n': tabela['n'].astype('int64'),
+        '%': (tabela['proporcao'] * 100).round(1),
+        rotulo: [f"[{inferior:.1%}, {superior:.1%}]"
+                 for inferior, superior in zip(tabela['ic_inferior'], tabela['ic_superior'])],
+        'estimativa': tabela['estimativa'],
+    }, index=tabela.index)
+
+
+def estimar(amostras, populacoes, confianca=CONFIANCA_PADRAO):
+    """Proporções e médias de cada estrato e, havendo mais de um, do total"""
+    z = NormalDist().inv_cdf(0.5 + confianca / 2)
+    resultados = {}
+    for coluna in ANALISES:
+        tabelas = {nome: estimar_proporcoes(amostra[coluna], populacoes[nome], z)
+                   for nome, amostra in amostras.items()}
+        if len(tabelas) > 1:
+            tabelas['Total'] = combinar_estratos(tabelas, populacoes, z).rename_axis(coluna)
+        resultados[coluna] = {nome: ordenar(tabela, coluna) for nome, tabela in tabelas.items()}
+    for coluna in MEDIAS:
+        medias = {nome: estimar_media(amostra[coluna], populacoes[nome], z) for nome, amostra in amostras.items()}
+        if len(medias) > 1:
+            medias['Total'] = combinar_medias(medias, z)
+        resultados[coluna] = pd.DataFrame(medias).T
+    return resultados
+
+
+def exibir_estimativas(resultados, amostras, populacoes, confianca=CONFIANCA_PADRAO):
+    """Imprime as estimativas com seus intervalos de confiança"""
+    print("\n===== Estimativas por amostragem =====")
+    for nome, amostra in amostras.items():
+        print(f"{nome}: amostra de {len(amostra)} de {populacoes[nome]} registros")
+
+    for coluna, titulo in ANALISES.items():
+        for nome, tabela in resultados[coluna].items():
+            print(f"\n{titulo} ({nome}):")
+            print(formatar(tabela, confianca).head(MAXIMO_LINHAS))
+            if len(tabela) > MAXIMO_LINHAS:
+                print(f"... e mais {len(tabela) - MAXIMO_LINHAS} categorias")
+
+    for coluna, titulo in MEDIAS.items():
+        print(f"\n{titulo}, com IC {confianca:.0%}:")
+        print(resultados[coluna][['n', 'media', 'erro_padrao', 'ic_inferior', 'ic_superior']]
+              .astype({'n': 'int64'}).round(2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Análises de plano, cidade, PF/PJ, idade e tempo sobre uma amostra, "
+                                                 "com intervalos de confiança")
+    parser.add_argument('arquivo', nargs='?', default='z_raw_data.csv',
+                        help="CSV de entrada (padrão: z_raw_data.csv)")
+    parser.add_argument('--ativos', default=ARQUIVO_ATIVOS,
+                        help=f"arquivo de usuários ativos, para estratificar por status (padrão: {ARQUIVO_ATIVOS})")
+    parser.add_argument('--simples', action='store_true',
+                        help="amostra aleatória simples, sem estratificar por status")
+    parser.add_argument('--tamanho', type=int, default=TAMANHO_AMOSTRA_PADRAO,
+                        help=f"linhas sorteadas por estrato (padrão: {TAMANHO_AMOSTRA_PADRAO})")
+    parser.add_argument('--confianca', type=float, default=CONFIANCA_PADRAO,
+                        help=f"nível de confiança dos intervalos (padrão: {CONFIANCA_PADRAO})")
+    parser.add_argument('--semente', type=int, default=None, help="semente do sorteio, para repetir a amostra")
+    parser.add_argument('--chunk', type=int, default=TAMANHO_CHUNK_PADRAO,
+                        help=f"linhas por bloco no leitor do pandas, sem pyarrow (padrão: {TAMANHO_CHUNK_PADRAO})")
+    args = parser.parse_args(argv)
+
+    if not 0 < args.confianca < 1 or args.tamanho < 2:
+        print("ERRO: use --confianca entre 0 e 1 e --tamanho de pelo menos 2")
+        sys.exit(1)
+    arquivos = [args.arquivo] if args.simples else [args.arquivo, args.ativos]
+    for arquivo in arquivos:
+        if not os.path.exists(arquivo):
+            print(f"ERRO: Arquivo {arquivo} não encontrado!")
+            sys.exit(1)
+
+    inicio = time.perf_counter()
+    indice = None if args.simples else carregar_indice(args.ativos)
+    try:
+        amostras, populacoes = amostrar(args.arquivo, args.tamanho, indice, args.semente, args.chunk)
+    except ValueError as e:
+        print(f"ERRO: {str(e)}")
+        sys.exit(1)
+    if not amostras:
+        print(f"ERRO: nenhum registro em {args.arquivo}")
+        sys.exit(1)
+    amostras = derivar_amostras(amostras)
+
+    resultados = estimar(amostras, populacoes, args.confianca)
+    exibir_estimativas(resultados, amostras, populacoes, args.confianca)
+    print(f"\nAnálise por amostragem concluída em {time.perf_counter() - inicio:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+import pandas as pd
+import numpy as np
+import argparse
+import os
+import sys
+from carregador import carregar_csv
+from datas import converter_coluna_data
+from esquema import colunas_para
+from indice_ativos import ARQUIVO_ATIVOS, carregar_indice, pertence
+from instrumentacao import medir
+from renderizacao import renderizar, adicionar_argumentos, aplicar_argumentos
+from normalizacao import normalizar_cidades
+from pf_pj import classificar_pf_pj
+from distribuicao_idade import idade_em_anos, categorizar_idade, labels as LABELS_IDADE
+from tempo_plataforma import tempo_em_anos, categorizar_tempo, LABELS_TEMPO
+
+STATUS = ['Ativo', 'Inativo']
+
+# Dimensões agregadas por status: coluna derivada -> título no relatório
+DIMENSOES = {
+    'tipo_pessoa': 'Classificação PF/PJ',
+    'tipo_plano': 'Distribuição por tipo de plano',
+    'cidade': 'Distribuição por cidade',
+    'faixa_etaria': 'Distribuição por faixa etária',
+    'tempo_categoria': 'Distribuição por categoria de tempo (anos)',
+}
+
+# Dimensões em faixas mantêm a ordem das faixas (inclusive as vazias)
+ORDEM_DIMENSOES = {'faixa_etaria': LABELS_IDADE, 'tempo_categoria': LABELS_TEMPO}
+NAO_INFORMADO = 'Não informado'
+
+
+def marcar_status(df, indice):
+    """Marca cada registro como Ativo ou Inativo a partir do índice de logins ativos"""
+    ativo = pertence(df['login'], indice)
+    df['status'] = pd.Categorical(np.where(ativo, 'Ativo', 'Inativo'), categories=STATUS)
+    return df
+
+
+def derivar_dimensoes(df):
+    """Calcula, para todas as linhas, tipo de pessoa, cidade normalizada, faixa etária e tempo de plataforma"""
+    df = classificar_pf_pj(df)
+    df['cidade'] = normalizar_cidades(df['cidade'])
+
+    converter_coluna_data(df, 'data_nascimento')
+    df['idade'] = idade_em_anos(df['data_nascimento'])
+    df['faixa_etaria'] = categorizar_idade(df['idade'])
+
+    converter_coluna_data(df, 'data_cadastro')
+    df['tempo_plataforma'] = tempo_em_anos(df['data_cadastro'])
+    # Como em calcular_tempo_plataforma: as estatísticas usam todos os tempos, mas tempos negativos
+    # (cadastro após a data de referência) ficam fora das categorias
+    df['tempo_categoria'] = categorizar_tempo(df['tempo_plataforma'])
+    return df
+
+
+def contagem_por_status(df, coluna):
+    """Tabela coluna x status (Ativo, Inativo e Total) a partir de um único groupby"""
+    tabela = (df.groupby([coluna, 'status'], observed=True, dropna=False)
+                .size()
+                .unstack('status', fill_value=0)
+                .reindex(columns=STATUS, fill_value=0))
+    tabela.index = pd.Index(tabela.index.astype(object)).fillna(NAO_INFORMADO)
+    tabela['Total'] = tabela.sum(axis=1)
+
+    if coluna in ORDEM_DIMENSOES:
+        ordem = list(ORDEM_DIMENSOES[coluna])
+        if NAO_INFORMADO in tabela.index:
+            ordem.append(NAO_INFORMADO)
+        return tabela.reindex(ordem, fill_value=0)
+    return tabela.sort_values('Total', ascending=False)
+
+
+def estatisticas_por_status(df, coluna):
+    """Contagem, média, mediana, variância e desvio padrão por status e no total"""
+    por_status = df.groupby('status', observed=False)[coluna].agg(['count', 'mean', 'median', 'var', 'std'])
+    total = df[coluna].agg(['count', 'mean', 'median', 'var', 'std']).rename('Total')
+    return pd.concat([por_status, total.to_frame().T])
+
+
+@medir('analise_por_status')
+def analisar_por_status(df, indice):
+    """Calcula os agregados de ativos, inativos e total sobre o dump completo, sem CSV intermediário"""
+    df = marcar_status(df, indice)
+    df = derivar_dimensoes(df)
+
+    resultados = {'total_por_status': df['status'].value_counts().reindex(STATUS)}
+    for coluna in DIMENSOES:
+        resultados[coluna] = contagem_por_status(df, coluna)
+    resultados['estatisticas_idade'] = estatisticas_por_status(df, 'idade')
+    resultados['estatisticas_tempo'] = estatisticas_por_status(df, 'tempo_plataforma')
+    resultados['cadastros_por_ano'] = (df.groupby([df['data_cadastro'].dt.year, 'status'], observed=False)
+                                         .size().unstack('status', fill_value=0))
+    return resultados
+
+
+def exibir_relatorio(resultados):
+    """Imprime os agregados de ativos, inativos e total"""
+    print("\n===== Relatório por status =====")
+    print(resultados['total_por_status'])
+    for coluna, titulo in DIMENSOES.items():
+        print(f"\n{titulo}:")
+        print(resultados[coluna])
+    print("\nEstatísticas da idade:")
+    print(resultados['estatisticas_idade'])
+    print("\nEstatísticas do tempo de plataforma (anos):")
+    print(resultados['estatisticas_tempo'])
+
+
+def grafico_pf_pj_por_status(tabela):
+    """Gráfico de barras agrupadas da classificação PF/PJ para ativos e inativos"""
+    import matplotlib.pyplot as plt
+    tabela[STATUS].plot(kind='bar', figsize=(10, 6), edgecolor='black')
+    plt.title('Pessoas Físicas e Jurídicas: Ativos e Inativos', fontsize=14)
+    plt.xlabel('Tipo de Pessoa', fontsize=12)
+    plt.ylabel('Número de Logins', fontsize=12)
+    plt.xticks(rotation=0)
+    plt.tight_layout()
+    plt.savefig('grafico_pf_pj_ativos_e_inativos.png')
+    plt.close()
+    print("Gráfico salvo como 'grafico_pf_pj_ativos_e_inativos.png'")
+
+
+def grafico_cadastros_por_ano_por_status(cadastros_por_ano):
+    """Gráfico de linhas dos cadastros por ano, separando ativos e inativos"""
+    import matplotlib.pyplot as plt
+    cadastros_por_ano.plot(kind='line', marker='o', linewidth=2, figsize=(14, 7))
+    plt.title('Número de Cadastros por Ano: Ativos e Inativos', fontsize=16)
+    plt.xlabel('Ano de Cadastro', fontsize=14)
+    plt.ylabel('Número de Cadastros', fontsize=14)
+    plt.grid(True)
+    plt.tight_layout()
+    plt.savefig('cadastros_por_ano_ativos_e_inativos.png')
+    plt.close()
+    print("Gráfico salvo como 'cadastros_por_ano_ativos_e_inativos.png'")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Agregados de ativos, inativos e total em uma única passada")
+    parser.add_argument('arquivo', nargs='?', default='z_raw_data.csv',
+                        help="dump completo (padrão: z_raw_data.csv)")
+    parser.add_argument('--ativos', default=ARQUIVO_ATIVOS,
+                        help=f"arquivo de usuários ativos (padrão: {ARQUIVO_ATIVOS})")
+    adicionar_argumentos(parser)
+    args = parser.parse_args(argv)
+    aplicar_argumentos(args)
+
+    print("Iniciando análise por status (ativos e inativos)...")
+    if not os.path.exists(args.arquivo):
+        print(f"ERRO: Arquivo {args.arquivo} não encontrado!")
+        sys.exit(1)
+
+    indice = carregar_indice(args.ativos)
+    df = carregar_csv(args.arquivo, colunas=colunas_para('planos', 'cidades', 'pf_pj', 'idade', 'tempo'))
+    print(f"Total de registros carregados: {len(df)}")
+
+    resultados = analisar_por_status(df, indice)
+    exibir_relatorio(resultados)
+
+    if not args.sem_graficos:
+        renderizar([
+            (grafico_pf_pj_por_status, (resultados['tipo_pessoa'],)),
+            (grafico_cadastros_por_ano_por_status, (resultados['cadastros_por_ano'],)),
+        ], args.paralelo, args.processos)
+
+    print("\nAnálise concluída!")
+
+
+if __name__ == "__main__":
+    main()
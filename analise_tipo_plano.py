@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
 import os
+import argparse
+from carregador import carregar_csv
+from renderizacao import exibir_e_fechar, agrupar_outros, adicionar_argumentos, aplicar_argumentos
+from instrumentacao import medir
+from esquema import colunas_para
 
 def carregar_dados():
     """Carrega os dados do arquivo CSV de usuários ativos"""
@@ -14,17 +18,8 @@ def carregar_dados():
             print("ERRO: Arquivo z_raw_data_active.csv não encontrado!")
             return None
 
-        # Identificar os nomes das colunas - sabemos que o tipo_plano é o 13º campo
-        colunas = [
-            'login', 'nome_completo', 'razao_social', 'endereco', 'bairro',
-            'cidade', 'estado', 'cep', 'telefone1', 'telefone2',
-            'data_cadastro', 'data_nascimento', 'tipo_plano', 'forma_pagamento',
-            'cartao', 'validade_cartao', 'titular_cartao', 'campo17', 'campo18', 'senha',
-            'cpf_cnpj', 'campo21', 'campo22', 'observacoes', 'campo24', 'campo25', 'campo26', 'col_0'
-        ]
-
-        # Carregar o CSV
-        df = pd.read_csv('z_raw_data_active.csv', names=colunas, header=None)
+        # Carregar apenas as colunas usadas, com os nomes do cabeçalho gravado por filtrar_ativos.py
+        df = carregar_csv('z_raw_data_active.csv', colunas=colunas_para('planos'))
         print(f"Total de registros carregados: {len(df)}")
 
         return df
@@ -32,6 +27,7 @@ def carregar_dados():
         print(f"ERRO ao carregar os dados: {str(e)}")
         return None
 
+@medir('agregar_planos')
 def analisar_tipos_plano(df):
     """Analisa a distribuição dos tipos de plano"""
     print("Analisando distribuição por tipo de plano...")
@@ -43,6 +39,8 @@ def analisar_tipos_plano(df):
 
     # Contar a quantidade de cada tipo de plano
     contagem_planos = df['tipo_plano'].value_counts()
+    # Em colunas categóricas, categorias sem nenhum registro aparecem com contagem zero
+    contagem_planos = contagem_planos[contagem_planos > 0]
 
     # Substituir valores vazios por "Não informado"
     if '' in contagem_planos.index:
@@ -59,6 +57,7 @@ def analisar_tipos_plano(df):
 
 def gerar_grafico_pizza(contagem_planos):
     """Gera um gráfico de pizza da distribuição por tipo de plano"""
+    import matplotlib.pyplot as plt
     print("Gerando gráfico de pizza para tipos de plano...")
 
     # Definir cores para o gráfico
@@ -67,17 +66,8 @@ def gerar_grafico_pizza(contagem_planos):
     # Configurar o gráfico
     plt.figure(figsize=(12, 8))
 
-    # Se houver muitos tipos de plano, agrupar os menores
-    if len(contagem_planos) > 10:
-        # Ordenar por frequência
-        contagem_ordenada = contagem_planos.sort_values(ascending=False)
-
-        # Pegar os 9 maiores e agrupar o restante como "Outros"
-        principais = contagem_ordenada.head(9)
-        outros = pd.Series({'Outros': contagem_ordenada[9:].sum()})
-        contagem_final = pd.concat([principais, outros])
-    else:
-        contagem_final = contagem_planos
+    # Se houver muitos tipos de plano, manter os 9 maiores e agrupar o restante como "Outros"
+    contagem_final = agrupar_outros(contagem_planos, maximo=10)
 
     # Gerar o gráfico
     patches, texts, autotexts = plt.pie(
@@ -109,10 +99,15 @@ def gerar_grafico_pizza(contagem_planos):
     plt.savefig('grafico_tipo_plano.png')
     print("Gráfico salvo como 'grafico_tipo_plano.png'")
 
-    # Mostrar o gráfico
-    plt.show()
+    # Mostrar o gráfico (apenas em modo interativo) e liberar a figura
+    exibir_e_fechar()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distribuição de usuários ativos por tipo de plano")
+    adicionar_argumentos(parser)
+    args = parser.parse_args(argv)
+    aplicar_argumentos(args)
 
-def main():
     print("Iniciando análise de distribuição por tipo de plano...")
 
     # Carregar dados
@@ -128,7 +123,8 @@ def main():
         return
 
     # Gerar gráfico
-    gerar_grafico_pizza(contagem_planos)
+    if not args.sem_graficos:
+        gerar_grafico_pizza(contagem_planos)
 
     print("Análise concluída!")
 
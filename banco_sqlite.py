@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+import pandas as pd
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from datas import converter_datas
+from ingestao import ler_em_blocos
+from indice_ativos import ARQUIVO_ATIVOS, LINHAS_POR_BLOCO
+from instrumentacao import etapa
+from normalizacao import tabela_normalizacao, ABREVIACOES_CIDADES
+from pf_pj import classificar_documentos
+from tempo_plataforma import DATA_ATUAL
+
+ARQUIVO_BANCO = 'z_raw_data.sqlite'
+
+# Linhas do CSV inseridas por transação na importação
+TAMANHO_CHUNK_IMPORTACAO = 100_000
+
+# Colunas indexadas na tabela de clientes
+COLUNAS_INDEXADAS = ['login', 'cpf_cnpj', 'cidade', 'tipo_plano', 'data_cadastro']
+
+# Colunas de data gravadas em ISO (AAAA-MM-DD), que ordena e compara corretamente como texto
+COLUNAS_DATA = ['data_cadastro', 'data_nascimento']
+
+# Categorias de tempo de plataforma, com a mesma semântica de pd.cut (intervalos fechados à direita)
+CASO_TEMPO = """CASE
+    WHEN tempo <= 0 THEN NULL
+    WHEN tempo <= 5 THEN '0-5'
+    WHEN tempo <= 10 THEN '5-10'
+    WHEN tempo <= 15 THEN '10-15'
+    WHEN tempo <= 20 THEN '15-20'
+    WHEN tempo <= 25 THEN '20-25'
+    WHEN tempo <= 30 THEN '25-30'
+    ELSE '30+' END"""
+
+FILTRO_ATIVOS = "EXISTS (SELECT 1 FROM ativos a WHERE a.login = c.login)"
+
+
+def conectar(banco=ARQUIVO_BANCO):
+    """Abre o banco SQLite, encerrando com erro se ele ainda não foi importado"""
+    if not os.path.exists(banco):
+        print(f"ERRO: Banco {banco} não encontrado! Execute a importação primeiro.")
+        sys.exit(1)
+    return sqlite3.connect(banco)
+
+
+def _preparar_chunk(chunk):
+    """Acrescenta o tipo de pessoa e converte as datas para ISO antes da inserção"""
+    limpos = chunk['cpf_cnpj'].fillna('').str.replace(r'[^0-9]', '', regex=True)
+    chunk['tipo_pessoa'] = classificar_documentos(limpos.to_numpy())
+    for coluna in COLUNAS_DATA:
+        if coluna in chunk.columns:
+            datas, _ = converter_datas(chunk[coluna])
+            chunk[coluna] = datas.dt.strftime('%Y-%m-%d')
+    return chunk.astype(object).where(chunk.notna(), None)
+
+
+def _importar_clientes(conexao, caminho_csv, tamanho_chunk):
+    total = 0
+    # Mesma detecção de codificação e cabeçalho (e quarentena de linhas malformadas) das análises
+    for numero, chunk in enumerate(ler_em_blocos(caminho_csv, tamanho_chunk)):
+        chunk = _preparar_chunk(chunk)
+        if numero == 0:
+            faltando = [col for col in COLUNAS_INDEXADAS if col not in chunk.columns]
+            if faltando:
+                raise ValueError(f"colunas ausentes no CSV: {', '.join(faltando)}")
+            definicao = ', '.join(f'"{col}" TEXT' for col in chunk.columns)
+            conexao.execute(f"CREATE TABLE clientes ({definicao})")
+            insercao = (f"INSERT INTO clientes VALUES ({', '.join('?' * len(chunk.columns))})")
+        conexao.executemany(insercao, chunk.itertuples(index=False, name=None))
+        total += len(chunk)
+        print(f"  {total} registros importados", flush=True)
+    return total
+
+
+def _importar_ativos(conexao, caminho_ativos):
+    conexao.execute("CREATE TABLE ativos (login TEXT PRIMARY KEY) WITHOUT ROWID")
+    with open(caminho_ativos, 'r') as f:
+        lote = []
+        for linha in f:
+            # Formato passwd: o login é a parte antes do primeiro ':'
+            login = linha.strip().split(':', 1)[0]
+            if login:
+                lote.append((login,))
+            if len(lote) >= LINHAS_POR_BLOCO:
+                conexao.executemany("INSERT OR IGNORE INTO ativos VALUES (?)", lote)
+                lote = []
+        conexao.executemany("INSERT OR IGNORE INTO ativos VALUES (?)", lote)
+    return conexao.execute("SELECT COUNT(*) FROM ativos").fetchone()[0]
+
+
+def _criar_normalizacao_cidades(conexao):
+    """Tabela de consulta cidade bruta -> nome normalizado, calculada sobre as cidades distintas"""
+    distintas = conexao.execute(
+        "SELECT cidade, COUNT(*) FROM clientes WHERE cidade IS NOT NULL GROUP BY cidade").fetchall()
+    tabela = tabela_normalizacao([cidade for cidade, _ in distintas], [n for _, n in distintas],
+                                 ABREVIACOES_CIDADES)
+    conexao.execute("CREATE TABLE cidades_normalizadas (cidade TEXT PRIMARY KEY, nome TEXT) WITHOUT ROWID")
+    conexao.executemany("INSERT INTO cidades_normalizadas VALUES (?, ?)",
+                        [(cidade, nome) for cidade, nome in tabela.items() if isinstance(nome, str)])
+
+
+def importar(caminho_csv='z_raw_data.csv', caminho_ativos=ARQUIVO_ATIVOS, banco=ARQUIVO_BANCO,
+             tamanho_chunk=TAMANHO_CHUNK_IMPORTACAO):
+    """Importa o dump e a lista de ativos para um banco SQLite indexado (recriado do zero)"""
+    for caminho in (caminho_csv, caminho_ativos):
+        if not os.path.exists(caminho):
+            print(f"ERRO: Arquivo {caminho} não encontrado!")
+            sys.exit(1)
+
+    with etapa('importar_sqlite', arquivo=caminho_csv) as registro:
+        inicio = time.perf_counter()
+        temporario = f"{banco}.tmp"
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+        print(f"Importando {caminho_csv} e {caminho_ativos} para {banco}...", flush=True)
+        conexao = sqlite3.connect(temporario)
+        try:
+            # Carga em lote: sem diário nem fsync; o banco só substitui o anterior ao final
+            conexao.execute("PRAGMA journal_mode = OFF")
+            conexao.execute("PRAGMA synchronous = OFF")
+            with conexao:
+                total = _importar_clientes(conexao, caminho_csv, tamanho_chunk)
+                ativos = _importar_ativos(conexao, caminho_ativos)
+
+            # Índices criados depois da carga: mais rápido do que mantê-los a cada inserção
+            print("Criando índices...", flush=True)
+            with conexao:
+                for coluna in COLUNAS_INDEXADAS:
+                    conexao.execute(f"CREATE INDEX idx_clientes_{coluna} ON clientes ({coluna})")
+                conexao.execute("CREATE INDEX idx_clientes_tipo_pessoa ON clientes (tipo_pessoa)")
+                _criar_normalizacao_cidades(conexao)
+            conexao.execute("ANALYZE")
+        finally:
+            conexao.close()
+        os.replace(temporario, banco)
+        registro['linhas'] = total
+
+    print(f"{total} registros e {ativos} logins ativos importados em {time.perf_counter() - inicio:.1f}s")
+
+
+def _onde(somente_ativos, *condicoes):
+    condicoes = [c for c in condicoes if c] + ([FILTRO_ATIVOS] if somente_ativos else [])
+    return f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+
+
+def _serie(conexao, sql, parametros=(), nome='count'):
+    linhas = conexao.execute(sql, parametros).fetchall()
+    return pd.Series({chave: n for chave, n in linhas}, name=nome, dtype='int64')
+
+
+def contar_planos(conexao, somente_ativos=True):
+    """Distribuição por tipo de plano"""
+    return _serie(conexao, f"""SELECT COALESCE(NULLIF(tipo_plano, ''), 'Não informado'), COUNT(*)
+        FROM clientes c {_onde(somente_ativos)} GROUP BY 1 ORDER BY 2 DESC""")
+
+
+def contar_cidades(conexao, somente_ativos=True):
+    """Distribuição por cidade, com as grafias unificadas pela tabela de normalização"""
+    return _serie(conexao, f"""SELECT n.nome, SUM(t.total) FROM
+        (SELECT cidade, COUNT(*) AS total FROM clientes c {_onde(somente_ativos)} GROUP BY cidade) t
+        JOIN cidades_normalizadas n ON n.cidade = t.cidade
+        GROUP BY n.nome ORDER BY 2 DESC""")
+
+
+def contar_pf_pj(conexao, somente_ativos=True):
+    """Classificação PF/PJ (calculada na importação, com validação dos dígitos verificadores)"""
+    return _serie(conexao, f"""SELECT tipo_pessoa, COUNT(*) FROM clientes c {_onde(somente_ativos)}
+        GROUP BY tipo_pessoa ORDER BY 2 DESC""")
+
+
+def logins_duplicados(conexao):
+    """Logins com mais de um registro e o número de ocorrências (varredura do índice de login)"""
+    return _serie(conexao, """SELECT login, COUNT(*) FROM clientes WHERE login IS NOT NULL
+        GROUP BY login HAVING COUNT(*) > 1 ORDER BY 2 DESC, login""")
+
+
+def _mediana_tempo(conexao, n, referencia, somente_ativos):
+    # O tempo decresce com a data de cadastro: a mediana sai do índice ordenado de data_cadastro
+    if n == 0:
+        return float('nan')
+    sql = f"""SELECT (julianday(?) - julianday(data_cadastro)) / 365.25 FROM clientes c
+        {_onde(somente_ativos, 'data_cadastro IS NOT NULL')} ORDER BY data_cadastro LIMIT ? OFFSET ?"""
+    meio = conexao.execute(sql, (referencia, 2 - n % 2, (n - 1) // 2)).fetchall()
+    return sum(valor for valor, in meio) / len(meio)
+
+
+def estatisticas_tempo(conexao, data_referencia=DATA_ATUAL, somente_ativos=True):
+    """Média, mediana, variância, desvio padrão, distribuição e cadastros por ano do tempo de plataforma"""
+    referencia = data_referencia.strftime('%Y-%m-%d')
+    tempos = f"""SELECT (julianday(?) - julianday(data_cadastro)) / 365.25 AS tempo, data_cadastro
+        FROM clientes c {_onde(somente_ativos, 'data_cadastro IS NOT NULL')}"""
+
+    n, media = conexao.execute(f"SELECT COUNT(*), AVG(tempo) FROM ({tempos})", (referencia,)).fetchone()
+    # Segunda passada sobre os desvios em relação à média: numericamente estável
+    soma_quadrados, = conexao.execute(f"SELECT SUM((tempo - ?) * (tempo - ?)) FROM ({tempos})",
+                                      (media, media, referencia)).fetchone()
+    variancia = soma_quadrados / (n - 1) if n > 1 else float('nan')
+
+    distribuicao = _serie(conexao, f"SELECT {CASO_TEMPO} AS categoria, COUNT(*) FROM ({tempos}) "
+                                   "WHERE tempo > 0 GROUP BY categoria", (referencia,))
+    por_ano = _serie(conexao, f"""SELECT CAST(substr(data_cadastro, 1, 4) AS INTEGER), COUNT(*)
+        FROM clientes c {_onde(somente_ativos, 'data_cadastro IS NOT NULL')} GROUP BY 1 ORDER BY 1""")
+    return {
+        'total': n,
+        'media': media,
+        'mediana': _mediana_tempo(conexao, n, referencia, somente_ativos),
+        'variancia': variancia,
+        'desvio_padrao': variancia ** 0.5,
+        'distribuicao': distribuicao.reindex(['0-5', '5-10', '10-15', '15-20', '20-25', '25-30', '30+'],
+                                             fill_value=0),
+        'freq_por_ano': por_ano,
+    }
+
+
+def consultar_login(conexao, login):
+    """Registros de um login (busca pelo índice) e se ele está ativo"""
+    registros = pd.read_sql_query("SELECT * FROM clientes WHERE login = ?", conexao, params=(login,))
+    ativo = conexao.execute("SELECT 1 FROM ativos WHERE login = ?", (login,)).fetchone() is not None
+    return registros, ativo
+
+
+def contar(conexao, somente_ativos=False, **filtros):
+    """Contagem filtrada por igualdade em colunas (por exemplo cidade, tipo_plano, tipo_pessoa)"""
+    condicoes = [f'"{coluna}" = ?' for coluna in filtros]
+    sql = f"SELECT COUNT(*) FROM clientes c {_onde(somente_ativos, *condicoes)}"
+    return conexao.execute(sql, tuple(filtros.values())).fetchone()[0]
+
+
+def exibir_relatorio(conexao, somente_ativos=True):
+    """Imprime as análises de planos, cidades, PF/PJ, duplicados e tempo de plataforma"""
+    publico = "usuários ativos" if somente_ativos else "todos os registros"
+    print(f"\n===== Relatório SQLite ({publico}) =====")
+    print("\nDistribuição por tipo de plano:")
+    print(contar_planos(conexao, somente_ativos))
+    print("\nDistribuição por cidade:")
+    print(contar_cidades(conexao, somente_ativos))
+    print("\nClassificação PF/PJ:")
+    print(contar_pf_pj(conexao, somente_ativos))
+
+    duplicados = logins_duplicados(conexao)
+    print(f"\nLogins repetidos (todos os registros): {len(duplicados)}")
+    if len(duplicados):
+        print(duplicados.head(20))
+
+    tempo = estatisticas_tempo(conexao, somente_ativos=somente_ativos)
+    print("\nTempo de plataforma (anos):")
+    print(f"Média: {tempo['media']:.2f}")
+    print(f"Mediana: {tempo['mediana']:.2f}")
+    print(f"Variância: {tempo['variancia']:.2f}")
+    print(f"Desvio padrão: {tempo['desvio_padrao']:.2f}")
+    print("\nDistribuição por categoria de tempo (anos):")
+    print(tempo['distribuicao'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banco SQLite indexado como alternativa aos CSVs")
+    parser.add_argument('--banco', default=ARQUIVO_BANCO, help=f"arquivo do banco (padrão: {ARQUIVO_BANCO})")
+    acoes = parser.add_subparsers(dest='acao', required=True)
+
+    importacao = acoes.add_parser('importar', help="importa o dump e a lista de ativos")
+    importacao.add_argument('--csv', default='z_raw_data.csv', help="dump completo (padrão: z_raw_data.csv)")
+    importacao.add_argument('--ativos', default=ARQUIVO_ATIVOS,
+                            help=f"arquivo de usuários ativos (padrão: {ARQUIVO_ATIVOS})")
+    importacao.add_argument('--chunk', type=int, default=TAMANHO_CHUNK_IMPORTACAO,
+                            help=f"linhas por transação (padrão: {TAMANHO_CHUNK_IMPORTACAO})")
+
+    relatorio = acoes.add_parser('relatorio', help="análises como agregados SQL")
+    relatorio.add_argument('--todos', action='store_true', help="considera todos os registros, não só os ativos")
+
+    consulta = acoes.add_parser('login', help="registros de um login")
+    consulta.add_argument('login')
+    args = parser.parse_args(argv)
+
+    if args.acao == 'importar':
+        try:
+            importar(args.csv, args.ativos, args.banco, args.chunk)
+        except ValueError as e:
+            print(f"ERRO: {str(e)}")
+            sys.exit(1)
+        return
+
+    conexao = conectar(args.banco)
+    try:
+        if args.acao == 'relatorio':
+            with etapa('relatorio_sqlite'):
+                exibir_relatorio(conexao, somente_ativos=not args.todos)
+        else:
+            registros, ativo = consultar_login(conexao, args.login)
+            if registros.empty:
+                print(f"Login '{args.login}' não encontrado.")
+            else:
+                print(f"Login '{args.login}' ({'ativo' if ativo else 'inativo'}):")
+                print(registros.T)
+    finally:
+        conexao.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+# Onde os resultados de cada execução são acumulados, uma linha JSON por etapa
+ARQUIVO_RESULTADOS = os.path.join('benchmarks', 'resultados.jsonl')
+
+# Variação de tempo, em relação à execução anterior, a partir da qual a etapa é sinalizada
+LIMITE_REGRESSAO = 0.20
+
+# Etapas mais rápidas que isso (nas duas execuções) são dominadas por ruído e não são sinalizadas
+TEMPO_MINIMO_COMPARACAO = 0.05
+
+
+def _commit_atual():
+    """Retorna o hash curto do commit atual, se o diretório for um repositório git"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def etapas_pipeline():
+    """Define as etapas medidas: (nome, preparação, execução)"""
+    import pandas as pd
+    import filtrar_ativos
+    import indice_ativos
+    import pf_pj
+    import tempo_plataforma
+    import distribuicao_idade
+    import analise_tipo_plano
+    import grafico_pizza_cidades
+    import login_repetido
+    import regras_observacoes
+    import motor_analise
+    from carregador import carregar_csv
+
+    # A preparação roda fora da medição e entrega à execução uma cópia nova dos dados
+    def dados_brutos():
+        return carregar_csv('z_raw_data.csv').copy()
+
+    def sem_dados():
+        return None
+
+    def limpar_cache():
+        shutil.rmtree('.cache', ignore_errors=True)
+
+    return [
+        ('extrair_ativos', sem_dados, lambda _: filtrar_ativos.extrair_logins_ativos()),
+        ('indice_ativos_frio', limpar_cache, lambda _: indice_ativos.carregar_indice()),
+        ('indice_ativos_quente', sem_dados, lambda _: indice_ativos.carregar_indice()),
+        ('carregar_csv', limpar_cache, lambda _: pd.read_csv('z_raw_data.csv')),
+        ('carregar_cache_frio', limpar_cache, lambda _: carregar_csv('z_raw_data.csv')),
+        ('carregar_cache_quente', sem_dados, lambda _: carregar_csv('z_raw_data.csv')),
+        ('filtrar_indice', lambda: indice_ativos.carregar_indice(),
+         lambda indice: filtrar_ativos.filtrar_trabalho_csv(indice)),
+        ('filtrar', lambda: filtrar_ativos.extrair_logins_ativos(),
+         lambda ativos: filtrar_ativos.filtrar_trabalho_csv(ativos)),
+        ('filtrar_streaming', lambda: filtrar_ativos.extrair_logins_ativos(),
+         lambda ativos: filtrar_ativos.filtrar_trabalho_csv(ativos, filtrar_ativos.TAMANHO_CHUNK_PADRAO)),
+        ('pf_pj', dados_brutos, pf_pj.classificar_pf_pj),
+        ('tempo_plataforma', dados_brutos, tempo_plataforma.calcular_tempo_plataforma),
+        ('idade', dados_brutos, distribuicao_idade.calcular_idades),
+        ('planos', dados_brutos, analise_tipo_plano.analisar_tipos_plano),
+        ('cidades', dados_brutos, grafico_pizza_cidades.contar_cidades),
+        ('duplicados', dados_brutos, login_repetido.encontrar_duplicados),
+        ('quase_duplicados', dados_brutos, login_repetido.encontrar_quase_duplicados),
+        ('observacoes', dados_brutos, regras_observacoes.extrair_eventos),
+        ('relatorio', dados_brutos, motor_analise.analisar_tudo),
+    ]
+
+
+def medir_etapa(preparar, executar, medir_memoria):
+    """Mede o tempo de uma execução e, opcionalmente, o pico de memória de outra"""
+    silencio = io.StringIO()
+    with contextlib.redirect_stdout(silencio):
+        entrada = preparar()
+        inicio = time.perf_counter()
+        executar(entrada)
+        segundos = time.perf_counter() - inicio
+
+        pico_mb = None
+        if medir_memoria:
+            # O tracemalloc deixa a execução mais lenta, por isso o tempo vem da rodada anterior
+            entrada = preparar()
+            tracemalloc.start()
+            executar(entrada)
+            pico_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+    return segundos, pico_mb
+
+
+def executar_benchmark(tamanhos, medir_memoria=True, semente=42):
+    """Gera dados sintéticos de cada tamanho e mede todas as etapas do pipeline"""
+    from gerar_dados_sinteticos import gerar_dados
+
+    resultados = []
+    data = datetime.datetime.now().isoformat(timespec='seconds')
+    commit = _commit_atual()
+    diretorio_original = os.getcwd()
+
+    for linhas in tamanhos:
+        with tempfile.TemporaryDirectory(prefix='benchmark_') as diretorio:
+            with contextlib.redirect_stdout(io.StringIO()):
+                gerar_dados(linhas, diretorio, semente)
+            os.chdir(diretorio)
+            try:
+                for nome, preparar, executar in etapas_pipeline():
+                    segundos, pico_mb = medir_etapa(preparar, executar, medir_memoria)
+                    resultado = {
+                        'data': data,
+                        'commit': commit,
+                        'linhas': linhas,
+                        'etapa': nome,
+                        'segundos': round(segundos, 4),
+                        'pico_memoria_mb': round(pico_mb, 1) if pico_mb is not None else None,
+                    }
+                    resultados.append(resultado)
+                    print(f"{linhas:>10} linhas  {nome:<22} {segundos:9.3f} s"
+                          + (f"  {pico_mb:9.1f} MB" if pico_mb is not None else ""), flush=True)
+            finally:
+                os.chdir(diretorio_original)
+
+    return resultados
+
+
+def carregar_historico(caminho=ARQUIVO_RESULTADOS):
+    """Lê os resultados de execuções anteriores"""
+    if not os.path.exists(caminho):
+        return []
+    with open(caminho, 'r') as f:
+        return [json.loads(linha) for linha in f if linha.strip()]
+
+
+def salvar_resultados(resultados, caminho=ARQUIVO_RESULTADOS):
+    """Acrescenta os resultados desta execução ao histórico"""
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, 'a') as f:
+        for resultado in resultados:
+            f.write(json.dumps(resultado) + '\n')
+    print(f"Resultados gravados em '{caminho}'")
+
+
+def comparar_com_anterior(resultados, historico):
+    """Compara cada etapa com a última execução registrada para o mesmo tamanho"""
+    anteriores = {}
+    for registro in historico:
+        anteriores[(registro['linhas'], registro['etapa'])] = registro
+
+    regressoes = []
+    print("\nComparação com a execução anterior:")
+    for resultado in resultados:
+        anterior = anteriores.get((resultado['linhas'], resultado['etapa']))
+        if anterior is None or not anterior['segundos']:
+            continue
+        variacao = resultado['segundos'] / anterior['segundos'] - 1
+        relevante = max(resultado['segundos'], anterior['segundos']) >= TEMPO_MINIMO_COMPARACAO
+        marcador = "  <-- REGRESSÃO" if relevante and variacao > LIMITE_REGRESSAO else ""
+        print(f"{resultado['linhas']:>10} linhas  {resultado['etapa']:<22} "
+              f"{anterior['segundos']:9.3f} s -> {resultado['segundos']:9.3f} s ({variacao:+.0%}){marcador}")
+        if marcador:
+            regressoes.append(resultado)
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede tempo e memória de cada etapa do pipeline com dados sintéticos")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help="quantidades de registros a gerar (padrão: 10000 100000 1000000)")
+    parser.add_argument('--sem-memoria', action='store_true',
+                        help="não mede o pico de memória (execução mais rápida)")
+    parser.add_argument('--semente', type=int, default=42, help="semente do gerador de dados")
+    parser.add_argument('--saida', default=ARQUIVO_RESULTADOS,
+                        help=f"arquivo de histórico de resultados (padrão: {ARQUIVO_RESULTADOS})")
+    args = parser.parse_args(argv)
+
+    # As etapas rodam dentro de um diretório temporário: o caminho de saída é resolvido antes
+    caminho_saida = os.path.abspath(args.saida)
+    historico = carregar_historico(caminho_saida)
+
+    resultados = executar_benchmark(args.tamanhos, not args.sem_memoria, args.semente)
+    regressoes = comparar_com_anterior(resultados, historico)
+    salvar_resultados(resultados, caminho_saida)
+
+    if regressoes:
+        print(f"\nAVISO: {len(regressoes)} etapas ficaram mais de {LIMITE_REGRESSAO:.0%} mais lentas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+import pandas as pd
+import hashlib
+import json
+import os
+import sys
+from instrumentacao import etapa
+from esquema import tipos_colunas
+
+# Diretório onde ficam as cópias colunares (Parquet) dos CSVs
+DIRETORIO_CACHE = '.cache'
+
+
+def _assinatura_arquivo(caminho):
+    """Retorna tamanho e data de modificação do arquivo"""
+    info = os.stat(caminho)
+    return info.st_size, info.st_mtime_ns
+
+
+def _hash_arquivo(caminho, tamanho_bloco=1024 * 1024):
+    """Calcula o SHA-256 do conteúdo do arquivo"""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _caminhos_cache(caminho, opcoes_leitura):
+    """Monta os caminhos do arquivo Parquet e dos metadados para um CSV"""
+    # As opções de leitura fazem parte da chave: o mesmo CSV lido com
+    # header=None gera um DataFrame diferente do lido com cabeçalho
+    chave = json.dumps(opcoes_leitura, sort_keys=True, default=str)
+    sufixo = hashlib.sha256(chave.encode('utf-8')).hexdigest()[:12]
+    base = os.path.splitext(os.path.basename(caminho))[0]
+    prefixo = os.path.join(DIRETORIO_CACHE, f"{base}.{sufixo}")
+    return f"{prefixo}.parquet", f"{prefixo}.json"
+
+
+def _ler_metadados(caminho_meta):
+    try:
+        with open(caminho_meta, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def cache_valido(caminho, caminho_dados, caminho_meta):
+    """Verifica se um arquivo de cache ainda corresponde à origem (tamanho/mtime e, se preciso, hash)"""
+    meta = _ler_metadados(caminho_meta)
+    if meta is None or not os.path.exists(caminho_dados):
+        return False
+
+    tamanho, mtime_ns = _assinatura_arquivo(caminho)
+    if meta.get('tamanho') != tamanho:
+        return False
+    if meta.get('mtime_ns') == mtime_ns:
+        return True
+
+    # Mesmo tamanho, mas o arquivo foi tocado: confere o conteúdo antes de descartar
+    if meta.get('sha256') != _hash_arquivo(caminho):
+        return False
+    meta['mtime_ns'] = mtime_ns
+    with open(caminho_meta, 'w') as f:
+        json.dump(meta, f)
+    return True
+
+
+def _normalizar_colunas_objeto(df):
+    """Converte colunas de tipo misto para texto, para que possam ser gravadas em Parquet"""
+    for col in df.columns:
+        if df[col].dtype == object:
+            nao_nulos = df[col].dropna()
+            if not nao_nulos.map(type).eq(str).all():
+                df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def gravar_metadados(caminho, caminho_meta):
+    """Registra a assinatura do arquivo de origem de um cache"""
+    tamanho, mtime_ns = _assinatura_arquivo(caminho)
+    with open(caminho_meta, 'w') as f:
+        json.dump({
+            'arquivo': os.path.abspath(caminho),
+            'tamanho': tamanho,
+            'mtime_ns': mtime_ns,
+            'sha256': _hash_arquivo(caminho),
+        }, f)
+
+
+def hash_conteudo(caminho, caminho_meta):
+    """SHA-256 do arquivo, reaproveitando o valor registrado em caminho_meta enquanto a origem não muda"""
+    if not cache_valido(caminho, caminho_meta, caminho_meta):
+        os.makedirs(os.path.dirname(caminho_meta) or '.', exist_ok=True)
+        gravar_metadados(caminho, caminho_meta)
+    return _ler_metadados(caminho_meta)['sha256']
+
+
+def _gravar_cache(df, caminho, caminho_parquet, caminho_meta):
+    os.makedirs(DIRETORIO_CACHE, exist_ok=True)
+    df.to_parquet(caminho_parquet, index=False)
+    gravar_metadados(caminho, caminho_meta)
+
+
+def _ler_csv(caminho, colunas, opcoes_leitura):
+    """Lê o CSV diretamente, apenas com as colunas pedidas que existirem no arquivo"""
+    if colunas is not None:
+        pedidas = set(colunas)
+        opcoes_leitura = dict(opcoes_leitura, usecols=lambda col: col in pedidas)
+    return pd.read_csv(caminho, **opcoes_leitura)
+
+
+def _ler_parquet(caminho_parquet, colunas):
+    """Lê do cache apenas as colunas pedidas que existirem nele"""
+    if colunas is not None:
+        import pyarrow.parquet as pq
+        existentes = set(pq.read_schema(caminho_parquet).names)
+        colunas = [col for col in colunas if col in existentes]
+    return pd.read_parquet(caminho_parquet, columns=colunas)
+
+
+def carregar_csv(caminho, colunas=None, usar_cache=True, **opcoes_leitura):
+    """Carrega um CSV a partir do cache colunar, convertendo-o na primeira leitura"""
+    with etapa('carregar', arquivo=caminho) as registro:
+        df = _carregar_csv(caminho, colunas, usar_cache, **opcoes_leitura)
+        registro['linhas'] = len(df)
+        registro['colunas'] = len(df.columns)
+    return df
+
+
+def _carregar_csv(caminho, colunas, usar_cache, **opcoes_leitura):
+    # Tipos do esquema compartilhado: categóricos para campos de baixa cardinalidade
+    opcoes_leitura.setdefault('dtype', tipos_colunas())
+
+    if not usar_cache:
+        return _ler_csv(caminho, colunas, opcoes_leitura)
+
+    caminho_parquet, caminho_meta = _caminhos_cache(caminho, opcoes_leitura)
+
+    try:
+        if cache_valido(caminho, caminho_parquet, caminho_meta):
+            print(f"Carregando {caminho} a partir do cache colunar...", flush=True)
+            return _ler_parquet(caminho_parquet, colunas)
+    except ImportError:
+        print("AVISO: pyarrow não instalado; lendo o CSV diretamente.", flush=True)
+        return _ler_csv(caminho, colunas, opcoes_leitura)
+
+    # O cache guarda o arquivo completo; a projeção é aplicada depois. Com as opções padrão,
+    # a leitura passa pela ingestão robusta (codificação, cabeçalho e linhas malformadas)
+    if set(opcoes_leitura) == {'dtype'}:
+        from ingestao import ler_csv
+        try:
+            df = ler_csv(caminho, dtype=opcoes_leitura['dtype'])
+        except ValueError as e:
+            print(f"ERRO: {caminho}: {str(e)}")
+            sys.exit(1)
+    else:
+        df = pd.read_csv(caminho, **opcoes_leitura)
+
+    try:
+        df = _normalizar_colunas_objeto(df)
+        _gravar_cache(df, caminho, caminho_parquet, caminho_meta)
+        print(f"Cache colunar de {caminho} gravado em {caminho_parquet}", flush=True)
+    except ImportError:
+        print("AVISO: pyarrow não instalado; cache colunar desativado.", flush=True)
+    except Exception as e:
+        print(f"AVISO: não foi possível gravar o cache colunar: {str(e)}", flush=True)
+
+    if colunas is not None:
+        df = df[[col for col in colunas if col in df.columns]]
+    return df
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+import time
+
+_inicio = time.perf_counter()
+
+import argparse
+import importlib
+import sys
+import instrumentacao
+
+# Subcomando -> módulo que o implementa (importado apenas quando o subcomando é usado)
+SUBCOMANDOS = {
+    'filter': ('filtrar_ativos', "filtra z_raw_data.csv mantendo apenas os logins ativos"),
+    'duplicates': ('login_repetido', "detecta logins repetidos e quase repetidos"),
+    'pf-pj': ('pf_pj', "classifica os registros em pessoa física ou jurídica"),
+    'plans': ('analise_tipo_plano', "distribuição por tipo de plano"),
+    'cities': ('grafico_pizza_cidades', "distribuição por cidade"),
+    'age': ('distribuicao_idade', "distribuição por faixa etária"),
+    'tenure': ('tempo_plataforma', "tempo de plataforma"),
+    'report': ('motor_analise', "todas as análises com uma única leitura do dataset"),
+    'trend': ('tendencias', "faixa etária e tempo de plataforma em várias datas de referência"),
+    'parallel': ('processamento_paralelo', "todas as análises sobre vários CSVs ou fatias de um CSV, em paralelo"),
+    'sample': ('amostragem', "análises sobre uma amostra estratificada por status, com intervalos de confiança"),
+    'status': ('analise_por_status', "agregados de ativos, inativos e total em uma única passada"),
+    'incremental': ('incremental', "atualiza os agregados por status aplicando só as mudanças do novo dump"),
+    'ingest': ('ingestao', "valida um dump legado: codificação, cabeçalho e linhas malformadas"),
+    'pipeline': ('pipeline', "executa as análises como um DAG, refazendo apenas o que mudou"),
+    'cube': ('cubo_olap', "cubo de contagens por cidade, plano, PF/PJ, tempo, faixa e status, com fatias instantâneas"),
+    'sqlite': ('banco_sqlite', "importa a base para SQLite indexado e roda as análises em SQL"),
+    'serve': ('servico_consultas', "serviço HTTP local de consultas sobre a base em memória"),
+    'notes': ('regras_observacoes', "eventos de mudança de plano e de pagamento extraídos das observações"),
+    'synthetic': ('gerar_dados_sinteticos', "gera um dump sintético com o esquema da base"),
+    'benchmark': ('benchmark', "mede tempo e memória de cada etapa com dados sintéticos"),
+    'stream-stats': ('estatisticas_streaming', "estatísticas de idade e tempo em blocos, com memória limitada"),
+}
+
+# Meta de inicialização para os caminhos só de estatísticas (--sem-graficos): o pandas
+# sozinho leva cerca de 0,5 s para importar; matplotlib e seaborn somariam mais ~1 s
+META_INICIALIZACAO_S = 0.75
+
+
+def medir_inicializacao(subcomando):
+    """Informa o tempo gasto até o subcomando estar pronto e se a meta foi cumprida"""
+    decorrido = time.perf_counter() - _inicio
+    plotagem = sorted(m for m in ('matplotlib', 'seaborn') if m in sys.modules)
+    situacao = "dentro da meta" if decorrido <= META_INICIALIZACAO_S else "ACIMA da meta"
+    print(f"Inicialização de '{subcomando}': {decorrido:.3f} s "
+          f"(meta: {META_INICIALIZACAO_S:.2f} s, {situacao})", file=sys.stderr, flush=True)
+    if plotagem:
+        print(f"AVISO: bibliotecas de gráficos carregadas na inicialização: {plotagem}",
+              file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Análises da base de clientes",
+        epilog="Use '<subcomando> --help' para ver as opções de cada análise.")
+    parser.add_argument('--medir-inicializacao', action='store_true',
+                        help="mostra o tempo de inicialização do subcomando em relação à meta")
+    parser.add_argument('--metricas', metavar='ARQUIVO',
+                        help="grava tempo, linhas e pico de memória de cada etapa em JSON lines ('-' para stderr)")
+    parser.add_argument('--resumo-metricas', action='store_true',
+                        help="imprime ao final um resumo legível das etapas medidas")
+    subparsers = parser.add_subparsers(dest='subcomando', metavar='subcomando', required=True)
+    for nome, (_, descricao) in SUBCOMANDOS.items():
+        # As opções de cada subcomando são tratadas pelo parser do próprio módulo
+        subparsers.add_parser(nome, help=descricao, add_help=False)
+
+    args, resto = parser.parse_known_args(argv)
+
+    modulo = importlib.import_module(SUBCOMANDOS[args.subcomando][0])
+    if args.medir_inicializacao:
+        medir_inicializacao(args.subcomando)
+
+    instrumentacao.configurar(args.metricas)
+    try:
+        modulo.main(resto)
+    finally:
+        if args.resumo_metricas:
+            instrumentacao.imprimir_resumo()
+        instrumentacao.configurar(None)
+
+
+if __name__ == "__main__":
+    main()
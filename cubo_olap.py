@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+import pandas as pd
+import numpy as np
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import sys
+import time
+from functools import lru_cache
+from carregador import DIRETORIO_CACHE, carregar_csv, hash_conteudo
+from esquema import colunas_para
+from indice_ativos import ARQUIVO_ATIVOS, carregar_indice
+from instrumentacao import etapa
+from normalizacao import ABREVIACOES_POR_DIMENSAO, chave_canonica, chave_texto
+from analise_por_status import NAO_INFORMADO, ORDEM_DIMENSOES, marcar_status, derivar_dimensoes
+import analise_por_status
+import datas
+import distribuicao_idade
+import normalizacao
+import pf_pj
+import tempo_plataforma
+
+DIRETORIO_CUBO = os.path.join(DIRETORIO_CACHE, 'cubo')
+
+# Dimensões do cubo, na ordem das colunas gravadas
+DIMENSOES_CUBO = ['cidade', 'tipo_plano', 'tipo_pessoa', 'tempo_categoria', 'faixa_etaria', 'status']
+
+# Resultados de fatias e agregações guardados em memória (LRU)
+TAMANHO_CACHE = 1024
+
+# Código que define as dimensões: alterá-lo invalida o cubo gravado
+MODULOS_CUBO = [analise_por_status, datas, distribuicao_idade, normalizacao, pf_pj, tempo_plataforma]
+
+
+class Cubo:
+    """Contagens de todas as combinações observadas das dimensões, com fatias e agregações em memória"""
+
+    def __init__(self, tabela):
+        self.dimensoes = [dim for dim in DIMENSOES_CUBO if dim in tabela.columns]
+        self.categorias = {dim: tabela[dim].cat.categories for dim in self.dimensoes}
+        # Códigos em intp: indexar tabelas de consulta com int8 exigiria uma conversão a cada consulta
+        self.codigos = {dim: tabela[dim].cat.codes.to_numpy().astype(np.intp) for dim in self.dimensoes}
+        self.contagens = tabela['contagem'].to_numpy(dtype=np.int64)
+        # Valores procurados sem diferenciar caixa, acentos e espaços, como no serviço de consultas
+        self.chaves = {dim: {chave_texto(str(valor)): codigo for codigo, valor in enumerate(self.categorias[dim])}
+                       for dim in self.dimensoes}
+        self.consultar = lru_cache(maxsize=TAMANHO_CACHE)(self._consultar)
+
+    @property
+    def total(self):
+        return int(self.contagens.sum())
+
+    def _codigo(self, dim, valor):
+        return self.chaves[dim].get(chave_canonica(valor, ABREVIACOES_POR_DIMENSAO.get(dim)), -1)
+
+    def _consultar(self, filtros, por):
+        """Contagem (sem 'por') ou Series agregada por 'por' das células que atendem aos filtros"""
+        mascara = np.ones(len(self.contagens), dtype=bool)
+        for dim, codigos in filtros:
+            # Tabela de consulta por código: vários valores para a mesma dimensão são alternativas (OU)
+            permitidos = np.zeros(len(self.categorias[dim]), dtype=bool)
+            permitidos[[codigo for codigo in codigos if codigo >= 0]] = True
+            mascara &= permitidos[self.codigos[dim]]
+        contagens = self.contagens[mascara]
+        if not por:
+            return int(contagens.sum())
+
+        # Agregação: um código combinado das dimensões pedidas e um único bincount
+        tamanhos = [len(self.categorias[dim]) for dim in por]
+        combinados = np.ravel_multi_index([self.codigos[dim][mascara] for dim in por], tamanhos)
+        somas = np.bincount(combinados, weights=contagens, minlength=int(np.prod(tamanhos))).astype(np.int64)
+        ocupadas = np.flatnonzero(somas)
+        posicoes = np.unravel_index(ocupadas, tamanhos)
+        niveis = [self.categorias[dim].take(pos) for dim, pos in zip(por, posicoes)]
+        indice = niveis[0].rename(por[0]) if len(por) == 1 else pd.MultiIndex.from_arrays(niveis, names=list(por))
+        resultado = pd.Series(somas[ocupadas], index=indice, name='contagem')
+        if not any(dim in ORDEM_DIMENSOES for dim in por):
+            resultado = resultado.sort_values(ascending=False, kind='stable')
+        return resultado
+
+    def fatia(self, por=(), **filtros):
+        """Consulta por valores, por exemplo fatia(por=['tipo_pessoa'], cidade='Niterói', status='Ativo')"""
+        desconhecidas = [dim for dim in list(filtros) + list(por) if dim not in self.dimensoes]
+        if desconhecidas:
+            raise ValueError(f"dimensões desconhecidas: {', '.join(desconhecidas)} "
+                             f"(disponíveis: {', '.join(self.dimensoes)})")
+        chave = []
+        for dim, valores in sorted(filtros.items()):
+            valores = [valores] if isinstance(valores, str) else valores
+            chave.append((dim, tuple(sorted({self._codigo(dim, valor) for valor in valores}))))
+        # A mesma consulta com filtros em outra ordem reaproveita o resultado em cache
+        return self.consultar(tuple(chave), tuple(por))
+
+
+def construir_tabela(df):
+    """Agrega as linhas (já com status e dimensões derivadas) em um único groupby"""
+    colunas = {}
+    for dim in DIMENSOES_CUBO:
+        valores = df[dim].astype(object)
+        colunas[dim] = valores.where(valores.notna(), NAO_INFORMADO).to_numpy()
+    tabela = (pd.DataFrame(colunas).groupby(DIMENSOES_CUBO, sort=False).size()
+              .reset_index(name='contagem'))
+    tabela = tabela.astype({dim: 'category' for dim in DIMENSOES_CUBO} | {'contagem': 'int64'})
+    # Dimensões em faixas mantêm a ordem das faixas nos resultados
+    for dim, ordem in ORDEM_DIMENSOES.items():
+        tabela[dim] = tabela[dim].cat.set_categories(list(ordem) + [NAO_INFORMADO])
+    return tabela
+
+
+def _versao(arquivo, arquivo_ativos, diretorio):
+    h = hashlib.sha256()
+    for modulo in MODULOS_CUBO + [sys.modules[__name__]]:
+        h.update(inspect.getsource(modulo).encode('utf-8'))
+    for fonte in (arquivo, arquivo_ativos):
+        caminho_meta = os.path.join(diretorio, 'fontes', f"{os.path.basename(fonte)}.json")
+        h.update(hash_conteudo(fonte, caminho_meta).encode('utf-8'))
+    return h.hexdigest()
+
+
+def _caminhos_cubo(arquivo, diretorio):
+    prefixo = os.path.join(diretorio, os.path.splitext(os.path.basename(arquivo))[0])
+    return f"{prefixo}.cubo.parquet", f"{prefixo}.cubo.json"
+
+
+def carregar_cubo(arquivo, arquivo_ativos=ARQUIVO_ATIVOS, diretorio=DIRETORIO_CUBO, reconstruir=False):
+    """Cubo gravado, se ainda corresponder ao dump, aos ativos e ao código; senão, constrói e grava"""
+    caminho_parquet, caminho_meta = _caminhos_cubo(arquivo, diretorio)
+    versao = _versao(arquivo, arquivo_ativos, diretorio)
+    if not reconstruir:
+        try:
+            with open(caminho_meta, 'r') as f:
+                meta = json.load(f)
+            if meta.get('versao') == versao:
+                print(f"Carregando cubo de {caminho_parquet}...", flush=True)
+                return Cubo(pd.read_parquet(caminho_parquet))
+        except (OSError, ValueError):
+            pass
+
+    print("Construindo o cubo...", flush=True)
+    indice = carregar_indice(arquivo_ativos)
+    df = carregar_csv(arquivo, colunas=colunas_para('planos', 'cidades', 'pf_pj', 'idade', 'tempo'))
+    with etapa('cubo_olap', linhas=len(df)) as registro:
+        df = derivar_dimensoes(marcar_status(df, indice))
+        tabela = construir_tabela(df)
+        registro['celulas'] = len(tabela)
+
+    os.makedirs(diretorio, exist_ok=True)
+    tabela.to_parquet(caminho_parquet, index=False)
+    with open(caminho_meta, 'w') as f:
+        json.dump({'versao': versao, 'linhas': len(df), 'celulas': len(tabela)}, f)
+    print(f"Cubo com {len(tabela)} células ({len(df)} registros) gravado em {caminho_parquet}", flush=True)
+    return Cubo(tabela)
+
+
+def interpretar_filtros(textos):
+    """Converte 'dimensao=valor1,valor2' em {dimensao: [valores]}"""
+    filtros = {}
+    for texto in textos:
+        dim, sep, valores = texto.partition('=')
+        if not sep:
+            raise ValueError(f"filtro inválido: '{texto}' (use dimensao=valor)")
+        filtros.setdefault(dim.strip(), []).extend(valor.strip() for valor in valores.split(','))
+    return filtros
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cubo de contagens por cidade, plano, PF/PJ, tempo, faixa etária e status")
+    parser.add_argument('arquivo', nargs='?', default='z_raw_data.csv',
+                        help="dump completo (padrão: z_raw_data.csv)")
+    parser.add_argument('--ativos', default=ARQUIVO_ATIVOS,
+                        help=f"arquivo de usuários ativos (padrão: {ARQUIVO_ATIVOS})")
+    parser.add_argument('--filtro', action='append', default=[], metavar='DIMENSAO=VALOR[,VALOR]',
+                        help="restringe a consulta (repetível; vírgula separa alternativas)")
+    parser.add_argument('--por', action='append', default=[], metavar='DIMENSAO',
+                        help="dimensões do resultado (repetível); sem --por, mostra só o total")
+    parser.add_argument('--reconstruir', action='store_true', help="reconstrói o cubo mesmo se o gravado for válido")
+    args = parser.parse_args(argv)
+
+    for arquivo in (args.arquivo, args.ativos):
+        if not os.path.exists(arquivo):
+            print(f"ERRO: Arquivo {arquivo} não encontrado!")
+            sys.exit(1)
+
+    cubo = carregar_cubo(args.arquivo, args.ativos, reconstruir=args.reconstruir)
+    try:
+        filtros = interpretar_filtros(args.filtro)
+        inicio = time.perf_counter()
+        resultado = cubo.fatia(por=args.por, **filtros)
+        decorrido = time.perf_counter() - inicio
+    except ValueError as e:
+        print(f"ERRO: {str(e)}")
+        sys.exit(1)
+
+    descricao = ', '.join(f"{dim}={'|'.join(valores)}" for dim, valores in filtros.items()) or 'sem filtros'
+    print(f"\nConsulta ({descricao}) respondida em {decorrido * 1e6:.0f} µs sobre {len(cubo.contagens)} células:")
+    with pd.option_context('display.max_rows', 200):
+        print(resultado)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+import pandas as pd
+import numpy as np
+
+# Formatos aceitos, em ordem de prioridade. O primeiro é o padrão atual do sistema;
+# os demais aparecem em registros antigos.
+FORMATOS_DATA = [
+    '%d/%m/%Y',
+    '%d/%m/%Y %H:%M:%S',
+    '%d/%m/%Y %H:%M',
+    '%d-%m-%Y',
+    '%d.%m.%Y',
+    '%Y-%m-%d',
+    '%Y-%m-%d %H:%M:%S',
+    '%d/%m/%y',
+]
+
+
+def _converter_unicos(valores, formatos):
+    """Tenta cada formato apenas sobre os valores distintos que ainda não foram reconhecidos"""
+    convertidas = pd.Series(pd.NaT, index=range(len(valores)), dtype='datetime64[ns]')
+    textos = pd.Series(valores, dtype=object)
+
+    for formato in formatos:
+        pendentes = convertidas.isna()
+        if not pendentes.any():
+            break
+        tentativa = pd.to_datetime(textos[pendentes], format=formato, errors='coerce')
+        if '%y' in formato:
+            # Ano com dois dígitos: datas no futuro pertencem ao século anterior
+            futuras = tentativa > pd.Timestamp.now()
+            tentativa[futuras] = tentativa[futuras] - pd.DateOffset(years=100)
+        convertidas[pendentes] = tentativa
+
+    return convertidas.to_numpy()
+
+
+def converter_datas(serie, formatos=FORMATOS_DATA):
+    """Converte uma coluna de datas em texto, analisando cada valor distinto uma única vez"""
+    textos = serie.astype('string').str.strip()
+    textos = textos.mask(textos == '')
+
+    # Datas se repetem muito na base: converte só os valores distintos e mapeia de volta
+    codigos, unicos = pd.factorize(textos)
+    convertidas_unicas = _converter_unicos(np.asarray(unicos, dtype=object), formatos)
+
+    convertidas = np.full(len(serie), np.datetime64('NaT'), dtype='datetime64[ns]')
+    validos = codigos >= 0
+    convertidas[validos] = convertidas_unicas[codigos[validos]]
+
+    resultado = pd.Series(convertidas, index=serie.index, name=serie.name)
+    nao_reconhecidas = int((validos & resultado.isna().to_numpy()).sum())
+    return resultado, nao_reconhecidas
+
+
+def converter_coluna_data(df, coluna, formatos=FORMATOS_DATA):
+    """Converte no próprio DataFrame uma coluna de datas, caso ainda não tenha sido convertida"""
+    # Colunas já convertidas (por outra análise sobre o mesmo DataFrame) são reaproveitadas
+    if pd.api.types.is_datetime64_any_dtype(df[coluna]):
+        return 0
+
+    df[coluna], nao_reconhecidas = converter_datas(df[coluna], formatos)
+    ausentes = int(df[coluna].isna().sum()) - nao_reconhecidas
+    print(f"Coluna '{coluna}': {len(df) - ausentes - nao_reconhecidas} datas válidas, "
+          f"{ausentes} ausentes, {nao_reconhecidas} não reconhecidas")
+    return nao_reconhecidas
+
+
+def data_referencia(texto):
+    """Converte uma data informada na linha de comando (DD/MM/AAAA, AAAA-MM-DD ou outro formato aceito)"""
+    convertida, _ = converter_datas(pd.Series([texto]))
+    if pd.isna(convertida.iloc[0]):
+        raise ValueError(f"data não reconhecida: {texto}")
+    return convertida.iloc[0]
+
+
+def datas_referencia(texto, frequencia='MS'):
+    """Uma data ou um intervalo 'INICIO..FIM' percorrido na frequência indicada (padrão: início de cada mês)"""
+    if '..' not in texto:
+        return pd.DatetimeIndex([data_referencia(texto)])
+    inicio, fim = (data_referencia(parte) for parte in texto.split('..', 1))
+    if fim < inicio:
+        raise ValueError(f"intervalo invertido: {texto}")
+    return pd.date_range(inicio, fim, freq=frequencia)
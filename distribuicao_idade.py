@@ -1,63 +1,114 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 from datetime import datetime
 import numpy as np
 from pandas import DataFrame
+import argparse
+from carregador import carregar_csv
+from datas import converter_coluna_data, data_referencia as converter_data_referencia
+from renderizacao import exibir_e_fechar, adicionar_argumentos, aplicar_argumentos
+from instrumentacao import medir
+from esquema import colunas_para
 
 # Definir a data atual
 data_atual = datetime(2025, 6, 17)
 
-# Ler o arquivo CSV
-df = pd.read_csv('z_raw_data_active.csv')
+# Criar faixas etárias
+faixas_etarias = [0, 18, 30, 40, 50, 60, 70, 80, 90, 100, float('inf')]
+labels = ['0-17', '18-29', '30-39', '40-49', '50-59', '60-69', '70-79', '80-89', '90-99', '100+']
 
-# Converter a coluna de data_nascimento para datetime
-# O formato parece ser DD/MM/YYYY
-df['data_nascimento'] = pd.to_datetime(df['data_nascimento'], format='%d/%m/%Y', errors='coerce')
 
-# Filtrar apenas as linhas onde data_nascimento não é nula
-df_filtrado: DataFrame = df.dropna(subset=['data_nascimento'])
+def idade_em_anos(datas_nascimento, data_referencia=data_atual):
+    """Idade completa na data de referência (NaN quando a data de nascimento falta)"""
+    return np.trunc((data_referencia - datas_nascimento).dt.days / 365.25)
 
-# Calcular a idade em anos
-df_filtrado['idade'] = ((data_atual - df_filtrado['data_nascimento']).dt.days / 365.25).astype(int)
 
-# Criar faixas etárias
-faixas_etarias = [0, 18, 30, 40, 50, 60, 70, 80, 90, 100, float('inf')]
-labels = ['0-17', '18-29', '30-39', '40-49', '50-59', '60-69', '70-79', '80-89', '90-99', '100+']
+def categorizar_idade(idades):
+    """Agrupa idades nas faixas etárias"""
+    return pd.cut(idades, bins=faixas_etarias, labels=labels, right=False)
+
+
+@medir('agregar_idade')
+def calcular_idades(df, data_referencia=data_atual):
+    """Calcula idade e faixa etária dos clientes com data de nascimento válida"""
+    # Converter a coluna de data_nascimento para datetime
+    # O formato atual é DD/MM/YYYY; registros antigos usam outros formatos
+    converter_coluna_data(df, 'data_nascimento')
+
+    # Filtrar apenas as linhas onde data_nascimento não é nula
+    df_filtrado: DataFrame = df.dropna(subset=['data_nascimento']).copy()
+
+    # Calcular a idade em anos
+    df_filtrado['idade'] = idade_em_anos(df_filtrado['data_nascimento'], data_referencia).astype(int)
+
+    df_filtrado['faixa_etaria'] = categorizar_idade(df_filtrado['idade'])
+
+    return df_filtrado
+
+
+def distribuicao_faixas(df_filtrado):
+    """Calcula a distribuição de frequência por faixa etária"""
+    return df_filtrado['faixa_etaria'].value_counts().sort_index()
+
+
+def gerar_grafico(distribuicao):
+    """Cria gráfico de barras para visualização"""
+    import matplotlib.pyplot as plt
+    plt.figure(figsize=(12, 6))
+    distribuicao.plot(kind='bar', color='skyblue', edgecolor='black')
+    plt.title('Distribuição de Frequência por Faixa Etária', fontsize=14)
+    plt.xlabel('Faixa Etária', fontsize=12)
+    plt.ylabel('Quantidade de Clientes', fontsize=12)
+    plt.grid(axis='y', linestyle='--', alpha=0.7)
+
+    for i, v in enumerate(distribuicao):
+        plt.text(i, v + 0.1, str(v), ha='center', fontsize=10)
+
+    plt.tight_layout()
+    plt.savefig('distribuicao_idade.png')
+    exibir_e_fechar()
+
+
+def salvar_estatisticas(distribuicao, estatisticas, total_validos, total):
+    """Salva os resultados em um arquivo de texto"""
+    with open('estatisticas_idade.txt', 'w') as f:
+        f.write("Distribuição de frequência por faixa etária:\n")
+        f.write(str(distribuicao))
+        f.write("\n\nEstatísticas da idade:\n")
+        f.write(str(estatisticas))
+        f.write(f"\n\nTotal de clientes com data de nascimento válida: {total_validos}")
+        f.write(f"\nTotal de clientes sem data de nascimento: {total - total_validos}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distribuição de idade dos usuários ativos")
+    parser.add_argument('--data-referencia', type=converter_data_referencia, default=data_atual,
+                        help="data em que a idade é calculada (padrão: 17/06/2025)")
+    adicionar_argumentos(parser)
+    args = parser.parse_args(argv)
+    aplicar_argumentos(args)
+
+    # Ler o arquivo CSV
+    df = carregar_csv('z_raw_data_active.csv', colunas=colunas_para('idade'))
+
+    df_filtrado = calcular_idades(df, args.data_referencia)
+
+    # Calcular a distribuição de frequência
+    distribuicao = distribuicao_faixas(df_filtrado)
+
+    # Calcular estatísticas básicas
+    estatisticas = df_filtrado['idade'].describe()
+
+    # Exibir resultados
+    print("Distribuição de frequência por faixa etária:")
+    print(distribuicao)
+    print("\nEstatísticas da idade:")
+    print(estatisticas)
+
+    if not args.sem_graficos:
+        gerar_grafico(distribuicao)
+
+    salvar_estatisticas(distribuicao, estatisticas, len(df_filtrado), len(df))
+
 
-df_filtrado['faixa_etaria'] = pd.cut(df_filtrado['idade'], bins=faixas_etarias, labels=labels, right=False)
-
-# Calcular a distribuição de frequência
-distribuicao = df_filtrado['faixa_etaria'].value_counts().sort_index()
-
-# Calcular estatísticas básicas
-estatisticas = df_filtrado['idade'].describe()
-
-# Exibir resultados
-print("Distribuição de frequência por faixa etária:")
-print(distribuicao)
-print("\nEstatísticas da idade:")
-print(estatisticas)
-
-# Criar gráfico de barras para visualização
-plt.figure(figsize=(12, 6))
-distribuicao.plot(kind='bar', color='skyblue', edgecolor='black')
-plt.title('Distribuição de Frequência por Faixa Etária', fontsize=14)
-plt.xlabel('Faixa Etária', fontsize=12)
-plt.ylabel('Quantidade de Clientes', fontsize=12)
-plt.grid(axis='y', linestyle='--', alpha=0.7)
-
-for i, v in enumerate(distribuicao):
-    plt.text(i, v + 0.1, str(v), ha='center', fontsize=10)
-
-plt.tight_layout()
-plt.savefig('distribuicao_idade.png')
-plt.show()
-
-# Salvar os resultados em um arquivo de texto
-with open('estatisticas_idade.txt', 'w') as f:
-    f.write("Distribuição de frequência por faixa etária:\n")
-    f.write(str(distribuicao))
-    f.write("\n\nEstatísticas da idade:\n")
-    f.write(str(estatisticas))
-    f.write(f"\n\nTotal de clientes com data de nascimento válida: {len(df_filtrado)}")
-    f.write(f"\nTotal de clientes sem data de nascimento: {len(df) - len(df_filtrado)}")
+if __name__ == "__main__":
+    main()
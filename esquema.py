@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+# Colunas do dump z_raw_data.csv, na ordem em que aparecem no arquivo
+COLUNAS = [
+    'login', 'nome_completo', 'razao_social', 'endereco', 'bairro',
+    'cidade', 'estado', 'cep', 'telefone1', 'telefone2',
+    'data_cadastro', 'data_nascimento', 'tipo_plano', 'forma_pagamento',
+    'cartao', 'validade_cartao', 'titular_cartao', 'campo17', 'campo18', 'senha',
+    'cpf_cnpj', 'campo21', 'campo22', 'observacoes', 'campo24', 'campo25', 'campo26'
+]
+
+# Campos com poucos valores distintos: armazenados como categóricos
+COLUNAS_CATEGORICAS = ['bairro', 'cidade', 'estado', 'tipo_plano', 'forma_pagamento']
+
+# Campos que precisam permanecer como texto (zeros à esquerda, pontuação, datas a converter)
+COLUNAS_TEXTO = ['login', 'cep', 'telefone1', 'telefone2', 'data_cadastro',
+                 'data_nascimento', 'cpf_cnpj']
+
+# Colunas que cada análise realmente lê (None = todas)
+COLUNAS_POR_ANALISE = {
+    'planos': ['login', 'tipo_plano'],
+    'cidades': ['login', 'cidade'],
+    'pf_pj': ['login', 'cpf_cnpj'],
+    'idade': ['login', 'data_nascimento'],
+    'tempo': ['login', 'data_cadastro'],
+    'observacoes': ['login', 'observacoes'],
+    'duplicados': None,
+    'filtrar': None,
+}
+
+
+def tipos_colunas():
+    """Tipos usados na leitura do CSV: categóricos para campos de baixa cardinalidade"""
+    tipos = {col: 'category' for col in COLUNAS_CATEGORICAS}
+    tipos.update({col: str for col in COLUNAS_TEXTO})
+    return tipos
+
+
+def colunas_para(*analises):
+    """União das colunas necessárias às análises indicadas, na ordem do arquivo (None = todas)"""
+    necessarias = set()
+    for analise in analises:
+        colunas = COLUNAS_POR_ANALISE[analise]
+        if colunas is None:
+            return None
+        necessarias.update(colunas)
+    return [col for col in COLUNAS if col in necessarias]
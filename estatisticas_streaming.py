@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+import pandas as pd
+import numpy as np
+import argparse
+import os
+import sys
+from datas import converter_datas
+from ingestao import ler_em_blocos
+from distribuicao_idade import idade_em_anos, faixas_etarias, labels as LABELS_IDADE
+from tempo_plataforma import tempo_em_anos, FAIXAS_TEMPO, LABELS_TEMPO
+
+# Linhas lidas por bloco no cálculo em streaming
+TAMANHO_CHUNK_PADRAO = 100_000
+
+# Compressão do t-digest: cerca de DELTA/2 centroides, erro relativo menor nas caudas
+DELTA_TDIGEST = 200
+
+
+class AcumuladorMomentos:
+    """Contagem, média, variância, mínimo e máximo em uma passada (Welford), mesclável entre shards"""
+
+    def __init__(self):
+        self.n = 0
+        self.media = 0.0
+        self.m2 = 0.0
+        self.minimo = np.inf
+        self.maximo = -np.inf
+
+    def atualizar(self, valores):
+        """Incorpora um bloco de valores (NaN são ignorados)"""
+        valores = np.asarray(valores, dtype=float)
+        valores = valores[~np.isnan(valores)]
+        if len(valores) == 0:
+            return self
+        bloco = AcumuladorMomentos()
+        bloco.n = len(valores)
+        bloco.media = float(valores.mean())
+        bloco.m2 = float(((valores - bloco.media) ** 2).sum())
+        bloco.minimo = float(valores.min())
+        bloco.maximo = float(valores.max())
+        return self.mesclar(bloco)
+
+    def mesclar(self, outro):
+        """Combina com outro acumulador (fórmula de Chan para a variância)"""
+        if outro.n == 0:
+            return self
+        n = self.n + outro.n
+        delta = outro.media - self.media
+        self.media += delta * outro.n / n
+        self.m2 += outro.m2 + delta ** 2 * self.n * outro.n / n
+        self.n = n
+        self.minimo = min(self.minimo, outro.minimo)
+        self.maximo = max(self.maximo, outro.maximo)
+        return self
+
+    def subtrair(self, outro):
+        """Remove a contribuição de um subconjunto já incorporado (inverso de mesclar)"""
+        # Mínimo e máximo não podem ser desfeitos: passam a ser apenas limites dos valores restantes
+        if outro.n == 0:
+            return self
+        n = self.n - outro.n
+        if n <= 0:
+            self.__init__()
+            return self
+        media = (self.n * self.media - outro.n * outro.media) / n
+        delta = outro.media - media
+        self.m2 = max(self.m2 - outro.m2 - delta ** 2 * n * outro.n / self.n, 0.0)
+        self.media = media
+        self.n = n
+        return self
+
+    @property
+    def variancia(self):
+        """Variância amostral (ddof=1, como no pandas)"""
+        return self.m2 / (self.n - 1) if self.n > 1 else np.nan
+
+    @property
+    def desvio_padrao(self):
+        return float(np.sqrt(self.variancia))
+
+
+class TDigest:
+    """Esboço mesclável para quantis aproximados com memória limitada"""
+
+    def __init__(self, delta=DELTA_TDIGEST):
+        self.delta = delta
+        self.medias = np.empty(0)
+        self.pesos = np.empty(0)
+        self.minimo = np.inf
+        self.maximo = -np.inf
+
+    def _comprimir(self, medias, pesos):
+        # Agrupa pontos ordenados cujo índice de escala k(q) cai na mesma unidade; a escala
+        # arco-seno deixa os centroides pequenos nas caudas e grandes perto da mediana
+        ordem = np.argsort(medias, kind='mergesort')
+        medias, pesos = medias[ordem], pesos[ordem]
+        acumulado = np.cumsum(pesos)
+        q = (acumulado - pesos / 2) / acumulado[-1]
+        k = np.floor(self.delta / (2 * np.pi) * np.arcsin(2 * q - 1))
+        inicios = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+        novos_pesos = np.add.reduceat(pesos, inicios)
+        self.medias = np.add.reduceat(medias * pesos, inicios) / novos_pesos
+        self.pesos = novos_pesos
+
+    def atualizar(self, valores):
+        """Incorpora um bloco de valores (NaN são ignorados)"""
+        valores = np.asarray(valores, dtype=float)
+        valores = valores[~np.isnan(valores)]
+        if len(valores) == 0:
+            return self
+        self.minimo = min(self.minimo, float(valores.min()))
+        self.maximo = max(self.maximo, float(valores.max()))
+        self._comprimir(np.concatenate([self.medias, valores]),
+                        np.concatenate([self.pesos, np.ones(len(valores))]))
+        return self
+
+    def mesclar(self, outro):
+        """Combina com outro esboço"""
+        if len(outro.pesos) == 0:
+            return self
+        self.minimo = min(self.minimo, outro.minimo)
+        self.maximo = max(self.maximo, outro.maximo)
+        self._comprimir(np.concatenate([self.medias, outro.medias]),
+                        np.concatenate([self.pesos, outro.pesos]))
+        return self
+
+    def quantil(self, q):
+        """Quantil aproximado (q entre 0 e 1)"""
+        if len(self.pesos) == 0:
+            return np.nan
+        acumulado = np.cumsum(self.pesos)
+        centros = (acumulado - self.pesos / 2) / acumulado[-1]
+        pontos = np.r_[0.0, centros, 1.0]
+        valores = np.r_[self.minimo, self.medias, self.maximo]
+        return float(np.interp(q, pontos, valores))
+
+
+class HistogramaFixo:
+    """Contagens em faixas fixas, com a mesma semântica de pd.cut, mescláveis entre shards"""
+
+    def __init__(self, bordas, rotulos, fechado_a_direita=True):
+        self.bordas = np.asarray(bordas, dtype=float)
+        self.rotulos = list(rotulos)
+        self.fechado_a_direita = fechado_a_direita
+        self.contagens = np.zeros(len(rotulos), dtype=np.int64)
+        self.fora = 0
+
+    def atualizar(self, valores):
+        """Incorpora um bloco de valores; NaN e valores fora das faixas vão para 'fora'"""
+        valores = np.asarray(valores, dtype=float)
+        # (a, b] quando fechado à direita, [a, b) caso contrário
+        lado = 'left' if self.fechado_a_direita else 'right'
+        faixa = np.searchsorted(self.bordas, valores, side=lado) - 1
+        validos = ~np.isnan(valores) & (faixa >= 0) & (faixa < len(self.rotulos))
+        self.contagens += np.bincount(faixa[validos], minlength=len(self.rotulos))
+        self.fora += int((~validos).sum())
+        return self
+
+    def mesclar(self, outro):
+        """Combina com outro histograma de mesmas faixas"""
+        self.contagens += outro.contagens
+        self.fora += outro.fora
+        return self
+
+    def como_serie(self):
+        return pd.Series(self.contagens, index=self.rotulos, name='count')
+
+
+class EstatisticasColuna:
+    """Momentos, quantis e histograma de uma coluna numérica"""
+
+    def __init__(self, bordas, rotulos, fechado_a_direita=True):
+        self.momentos = AcumuladorMomentos()
+        self.quantis = TDigest()
+        self.histograma = HistogramaFixo(bordas, rotulos, fechado_a_direita)
+
+    def atualizar(self, valores):
+        self.momentos.atualizar(valores)
+        self.quantis.atualizar(valores)
+        self.histograma.atualizar(valores)
+        return self
+
+    def mesclar(self, outro):
+        self.momentos.mesclar(outro.momentos)
+        self.quantis.mesclar(outro.quantis)
+        self.histograma.mesclar(outro.histograma)
+        return self
+
+    def descrever(self):
+        """Resumo no formato de Series.describe()"""
+        m = self.momentos
+        return pd.Series({
+            'count': float(m.n),
+            'mean': m.media if m.n else np.nan,
+            'std': m.desvio_padrao,
+            'min': m.minimo if m.n else np.nan,
+            '25%': self.quantis.quantil(0.25),
+            '50%': self.quantis.quantil(0.50),
+            '75%': self.quantis.quantil(0.75),
+            'max': m.maximo if m.n else np.nan,
+        })
+
+
+def novas_estatisticas():
+    """Acumuladores vazios de idade e tempo de plataforma"""
+    return {
+        'idade': EstatisticasColuna(faixas_etarias, LABELS_IDADE, fechado_a_direita=False),
+        'tempo_plataforma': EstatisticasColuna(FAIXAS_TEMPO, LABELS_TEMPO, fechado_a_direita=True),
+    }
+
+
+def atualizar_estatisticas(estatisticas, chunk):
+    """Incorpora um bloco do CSV (colunas de data ainda em texto) aos acumuladores"""
+    nascimento, _ = converter_datas(chunk['data_nascimento'])
+    cadastro, _ = converter_datas(chunk['data_cadastro'])
+    estatisticas['idade'].atualizar(idade_em_anos(nascimento).to_numpy())
+    estatisticas['tempo_plataforma'].atualizar(tempo_em_anos(cadastro).to_numpy())
+    return estatisticas
+
+
+def mesclar_estatisticas(parciais):
+    """Combina os acumuladores calculados em vários shards"""
+    total = novas_estatisticas()
+    for parcial in parciais:
+        for coluna, acumulador in parcial.items():
+            total[coluna].mesclar(acumulador)
+    return total
+
+
+def estatisticas_em_chunks(caminho, tamanho_chunk=TAMANHO_CHUNK_PADRAO):
+    """Calcula as estatísticas de idade e tempo de um CSV lendo-o em blocos"""
+    print(f"Calculando estatísticas de {caminho} em blocos de {tamanho_chunk} linhas...", flush=True)
+    estatisticas = novas_estatisticas()
+    # Dumps legados (sem cabeçalho, cp1252/latin-1) são aceitos como nas demais leituras
+    for chunk in ler_em_blocos(caminho, tamanho_chunk, colunas=['data_nascimento', 'data_cadastro']):
+        atualizar_estatisticas(estatisticas, chunk)
+    return estatisticas
+
+
+def exibir_estatisticas(estatisticas):
+    """Imprime as distribuições e os resumos calculados"""
+    print("\nDistribuição de frequência por faixa etária:")
+    print(estatisticas['idade'].histograma.como_serie())
+    print("\nEstatísticas da idade:")
+    print(estatisticas['idade'].descrever())
+
+    tempo = estatisticas['tempo_plataforma']
+    print("\nDistribuição por categoria de tempo (anos):")
+    print(tempo.histograma.como_serie())
+    print("\nEstatísticas do tempo de plataforma (anos):")
+    print(tempo.descrever())
+    print(f"Variância: {tempo.momentos.variancia:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estatísticas de idade e tempo de plataforma com memória limitada")
+    parser.add_argument('arquivos', nargs='*', default=['z_raw_data_active.csv'],
+                        help="um ou mais CSVs (shards), combinados no resultado final")
+    parser.add_argument('--chunk', type=int, default=TAMANHO_CHUNK_PADRAO,
+                        help=f"linhas por bloco (padrão: {TAMANHO_CHUNK_PADRAO})")
+    args = parser.parse_args(argv)
+
+    for arquivo in args.arquivos:
+        if not os.path.exists(arquivo):
+            print(f"ERRO: Arquivo {arquivo} não encontrado!")
+            sys.exit(1)
+
+    try:
+        parciais = [estatisticas_em_chunks(arquivo, args.chunk) for arquivo in args.arquivos]
+    except ValueError as e:
+        print(f"ERRO: {str(e)}")
+        sys.exit(1)
+    exibir_estatisticas(mesclar_estatisticas(parciais))
+
+
+if __name__ == "__main__":
+    main()
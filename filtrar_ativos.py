@@ -1,7 +1,19 @@
 #!/usr/bin/env python3
-import pandas as pd
+import numpy as np
 import sys
 import os
+import argparse
+from carregador import carregar_csv
+from ingestao import ler_em_blocos
+from instrumentacao import etapa
+from indice_ativos import carregar_indice, pertence
+
+# Dump completo e arquivo gerado apenas com os logins ativos
+ARQUIVO_ENTRADA = 'z_raw_data.csv'
+ARQUIVO_SAIDA = 'z_raw_data_active.csv'
+
+# Quantidade de linhas lidas por bloco no modo de streaming
+TAMANHO_CHUNK_PADRAO = 100_000
 
 def extrair_logins_ativos():
     """Extrair logins do arquivo z_active_users.txt"""
@@ -29,22 +41,87 @@ def extrair_logins_ativos():
         print(f"ERRO ao extrair logins: {str(e)}", flush=True)
         sys.exit(1)
 
-def filtrar_trabalho_csv(logins_ativos):
-    """Filtrar z_raw_data.csv para incluir apenas logins ativos"""
-    print("Carregando arquivo z_raw_data.csv...", flush=True)
+def mascara_ativos(logins, logins_ativos):
+    """Marca os logins ativos, usando o índice de hashes ou um conjunto de logins"""
+    if isinstance(logins_ativos, np.ndarray):
+        return pertence(logins, logins_ativos)
+    return logins.isin(logins_ativos)
+
+def filtrar_trabalho_csv_em_chunks(logins_ativos, tamanho_chunk=TAMANHO_CHUNK_PADRAO,
+                                   caminho=ARQUIVO_ENTRADA, caminho_saida=ARQUIVO_SAIDA):
+    """Filtrar o dump em blocos, gravando o arquivo de ativos incrementalmente"""
+    print(f"Filtrando {caminho} em blocos de {tamanho_chunk} linhas...", flush=True)
+    try:
+        if not os.path.exists(caminho):
+            print(f"ERRO: Arquivo {caminho} não encontrado!", flush=True)
+            sys.exit(1)
+
+        tamanho_mb = os.path.getsize(caminho) / (1024 * 1024)
+        print(f"Tamanho do arquivo {caminho}: {tamanho_mb:.2f} MB", flush=True)
+
+        total_registros = 0
+        registros_filtrados = 0
+        primeiro_bloco = True
+
+        # Apenas um bloco fica em memória por vez; o resultado é anexado ao arquivo de saída.
+        # A leitura detecta codificação e cabeçalho e separa linhas malformadas, como a leitura completa,
+        # e traz tudo como texto para que a inferência de tipos não varie entre blocos.
+        for numero, chunk in enumerate(ler_em_blocos(caminho, tamanho_chunk), start=1):
+            if primeiro_bloco and 'login' not in chunk.columns:
+                print(f"ERRO: Coluna 'login' não encontrada no CSV. Colunas disponíveis: {chunk.columns.tolist()}", flush=True)
+                sys.exit(1)
+
+            filtrado = chunk[mascara_ativos(chunk['login'], logins_ativos)]
+            filtrado.to_csv(caminho_saida, index=False,
+                            mode='w' if primeiro_bloco else 'a', header=primeiro_bloco)
+            primeiro_bloco = False
+
+            total_registros += len(chunk)
+            registros_filtrados += len(filtrado)
+            print(f"Bloco {numero}: {total_registros} registros lidos, {registros_filtrados} mantidos", flush=True)
+
+        print(f"Total de registros em {caminho}: {total_registros}", flush=True)
+        print(f"Registros filtrados (com logins ativos): {registros_filtrados}", flush=True)
+        print(f"Registros removidos: {total_registros - registros_filtrados}", flush=True)
+
+        if os.path.exists(caminho_saida):
+            tamanho_mb = os.path.getsize(caminho_saida) / (1024 * 1024)
+            print(f"Tamanho do arquivo {caminho_saida}: {tamanho_mb:.2f} MB", flush=True)
+        else:
+            print(f"ERRO: O arquivo {caminho_saida} não foi criado!", flush=True)
+
+        return registros_filtrados
+    except Exception as e:
+        print(f"ERRO ao processar o arquivo CSV em blocos: {str(e)}", flush=True)
+        import traceback
+        traceback.print_exc()
+        return 0
+
+def filtrar_trabalho_csv(logins_ativos, tamanho_chunk=None, caminho=ARQUIVO_ENTRADA, caminho_saida=ARQUIVO_SAIDA):
+    """Filtrar o dump para incluir apenas logins ativos"""
+    with etapa('filtrar', streaming=bool(tamanho_chunk)) as registro:
+        if tamanho_chunk:
+            registros_filtrados = filtrar_trabalho_csv_em_chunks(logins_ativos, tamanho_chunk, caminho, caminho_saida)
+        else:
+            registros_filtrados = _filtrar_trabalho_csv_completo(logins_ativos, caminho, caminho_saida)
+        registro['linhas'] = registros_filtrados
+    return registros_filtrados
+
+def _filtrar_trabalho_csv_completo(logins_ativos, caminho, caminho_saida):
+    print(f"Carregando arquivo {caminho}...", flush=True)
     try:
-        if not os.path.exists('z_raw_data.csv'):
-            print("ERRO: Arquivo z_raw_data.csv não encontrado!", flush=True)
+        if not os.path.exists(caminho):
+            print(f"ERRO: Arquivo {caminho} não encontrado!", flush=True)
             sys.exit(1)
 
         # Verificar o tamanho do arquivo
-        tamanho_mb = os.path.getsize('z_raw_data.csv') / (1024 * 1024)
-        print(f"Tamanho do arquivo z_raw_data.csv: {tamanho_mb:.2f} MB", flush=True)
+        tamanho_mb = os.path.getsize(caminho) / (1024 * 1024)
+        print(f"Tamanho do arquivo {caminho}: {tamanho_mb:.2f} MB", flush=True)
 
         # Carregar o CSV com todos os registros
-        df = pd.read_csv('z_raw_data.csv')
+        df = carregar_csv(caminho)
         total_registros = len(df)
-        print(f"Total de registros em z_raw_data.csv: {total_registros}", flush=True)
+        print(f"Total de registros em {caminho}: {total_registros}", flush=True)
 
         # Verificar se a coluna login existe
         if 'login' not in df.columns:
@@ -52,7 +129,7 @@ def filtrar_trabalho_csv(logins_ativos):
             sys.exit(1)
 
         # Filtrar apenas os registros com login ativo
-        df_filtrado = df[df['login'].isin(logins_ativos)]
+        df_filtrado = df[mascara_ativos(df['login'], logins_ativos)]
         registros_filtrados = len(df_filtrado)
         print(f"Registros filtrados (com logins ativos): {registros_filtrados}", flush=True)
         print(f"Registros removidos: {total_registros - registros_filtrados}", flush=True)
@@ -62,15 +139,15 @@ def filtrar_trabalho_csv(logins_ativos):
         print(df_filtrado.head(2), flush=True)
 
         # Salvar o resultado filtrado
-        df_filtrado.to_csv('z_raw_data_active.csv', index=False)
-        print("\nArquivo z_raw_data_active.csv criado com sucesso!", flush=True)
+        df_filtrado.to_csv(caminho_saida, index=False)
+        print(f"\nArquivo {caminho_saida} criado com sucesso!", flush=True)
 
         # Verificar se o arquivo foi criado
-        if os.path.exists('z_raw_data_active.csv'):
-            tamanho_mb = os.path.getsize('z_raw_data_active.csv') / (1024 * 1024)
-            print(f"Tamanho do arquivo z_raw_data_active.csv: {tamanho_mb:.2f} MB", flush=True)
+        if os.path.exists(caminho_saida):
+            tamanho_mb = os.path.getsize(caminho_saida) / (1024 * 1024)
+            print(f"Tamanho do arquivo {caminho_saida}: {tamanho_mb:.2f} MB", flush=True)
         else:
-            print("ERRO: O arquivo z_raw_data_active.csv não foi criado!", flush=True)
+            print(f"ERRO: O arquivo {caminho_saida} não foi criado!", flush=True)
 
         return registros_filtrados
     except Exception as e:
@@ -79,21 +156,35 @@ def filtrar_trabalho_csv(logins_ativos):
         traceback.print_exc()
         return 0
 
-def main():
-    print("Iniciando filtragem de z_raw_data.csv com base em z_active_users.txt...", flush=True)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Filtra o dump completo mantendo apenas os logins ativos")
+    parser.add_argument('arquivo', nargs='?', default=ARQUIVO_ENTRADA,
+                        help=f"dump completo (padrão: {ARQUIVO_ENTRADA})")
+    parser.add_argument('--streaming', action='store_true',
+                        help="lê o CSV em blocos, com memória constante")
+    parser.add_argument('--chunk', type=int, default=TAMANHO_CHUNK_PADRAO,
+                        help=f"linhas por bloco no modo de streaming (padrão: {TAMANHO_CHUNK_PADRAO})")
+    parser.add_argument('--sem-indice', action='store_true',
+                        help="monta o conjunto de logins ativos em memória em vez de usar o índice em disco")
+    args = parser.parse_args(argv)
+
+    print(f"Iniciando filtragem de {args.arquivo} com base em z_active_users.txt...", flush=True)
     print(f"Diretório atual: {os.getcwd()}", flush=True)
 
     # Listar arquivos no diretório para verificação
     arquivos = os.listdir('.')
     print(f"Arquivos no diretório: {arquivos}", flush=True)
 
-    # Extrair logins ativos
-    logins_ativos = extrair_logins_ativos()
+    # Extrair logins ativos (índice em disco, reconstruído apenas quando o arquivo muda)
+    if args.sem_indice:
+        logins_ativos = extrair_logins_ativos()
+    else:
+        logins_ativos = carregar_indice()
 
-    # Filtrar z_raw_data.csv
-    if logins_ativos:
-        registros_filtrados = filtrar_trabalho_csv(logins_ativos)
-        print(f"Processo concluído! {registros_filtrados} registros foram salvos em z_raw_data_active.csv", flush=True)
+    # Filtrar o dump completo
+    if len(logins_ativos):
+        registros_filtrados = filtrar_trabalho_csv(logins_ativos, args.chunk if args.streaming else None, args.arquivo)
+        print(f"Processo concluído! {registros_filtrados} registros foram salvos em {ARQUIVO_SAIDA}", flush=True)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+import pandas as pd
+import numpy as np
+import argparse
+import os
+from esquema import COLUNAS
+from pf_pj import PESOS_CPF_DV1, PESOS_CPF_DV2, PESOS_CNPJ_DV1, PESOS_CNPJ_DV2
+
+# Distribuição de planos aproximada pela base real de usuários ativos (ver README)
+PLANOS = ['M', 'X', 'G', 'W', 'C', 'H', 'Z', 'O', 'N', 'P', 'S', 'E', 'R', 'F', 'B', 'T']
+PESOS_PLANOS = [162, 148, 136, 84, 64, 48, 38, 35, 16, 10, 8, 7, 6, 5, 3, 2]
+
+# Cidades com as variações de grafia encontradas nos dumps antigos
+CIDADES = ['Rio de Janeiro', 'RIO DE JANEIRO', 'Rio de Janeiro ', 'rio de janeiro', 'RJ',
+           'Niterói', 'NITEROI', 'São Paulo', 'Sao Paulo', 'Porto Alegre', 'Petrópolis',
+           'Nova Friburgo', 'Belo Horizonte', 'Campinas', 'Teresópolis']
+PESOS_CIDADES = [40, 12, 4, 2, 2, 8, 2, 5, 2, 2, 2, 1, 1, 1, 1]
+ESTADO_POR_CIDADE = {'São Paulo': 'SP', 'Sao Paulo': 'SP', 'Campinas': 'SP',
+                     'Porto Alegre': 'RS', 'Belo Horizonte': 'MG'}
+BAIRROS = ['Copacabana', 'COPACABANA', 'Ipanema', 'Leblon', 'Botafogo', 'Flamengo', 'Tijuca',
+           'Barra da Tijuca', 'Icaraí', 'Icarai', 'Centro', 'Laranjeiras', 'Gávea', 'Jardim Botânico']
+
+NOMES = ['Maria', 'José', 'Ana', 'João', 'Antônio', 'Francisca', 'Carlos', 'Paulo', 'Lucia',
+         'Luiz', 'Marcos', 'Fernanda', 'Ricardo', 'Juliana', 'Roberto', 'Patrícia']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Ferreira', 'Costa',
+              'Rodrigues', 'Almeida', 'Nascimento', 'Carvalho', 'Gomes', 'Martins']
+FORMAS_PAGAMENTO = ['Boleto', 'Visa', 'Mastercard', 'American Express', 'Débito em conta']
+OBSERVACOES = [
+    '', '', '', '', '', '',
+    'Cliente migrou para o plano Gold Mensal',
+    'Alterado de Gold para Silver a pedido do cliente',
+    'Conta hibernando por inatividade',
+    'Trocou cartão Visa por Mastercard',
+    'Forma de pagamento alterada de cartão para boleto',
+    'Passou a pagar com cartão de crédito, antes boleto',
+    'Pop gratuita vinculada ao pacote Virtua pl G',
+    'Webmail Silver',
+]
+
+
+def digitos_verificadores_cpf(base):
+    """Acrescenta os dois dígitos verificadores a uma matriz de bases de CPF (n x 9)"""
+    dv1 = (base @ PESOS_CPF_DV1 * 10) % 11 % 10
+    parcial = np.column_stack([base, dv1])
+    dv2 = (parcial @ PESOS_CPF_DV2 * 10) % 11 % 10
+    return np.column_stack([parcial, dv2])
+
+
+def digitos_verificadores_cnpj(base):
+    """Acrescenta os dois dígitos verificadores a uma matriz de bases de CNPJ (n x 12)"""
+    resto1 = (base @ PESOS_CNPJ_DV1) % 11
+    parcial = np.column_stack([base, np.where(resto1 < 2, 0, 11 - resto1)])
+    resto2 = (parcial @ PESOS_CNPJ_DV2) % 11
+    return np.column_stack([parcial, np.where(resto2 < 2, 0, 11 - resto2)])
+
+
+def formatar_documentos(digitos, mascara):
+    """Formata uma matriz de dígitos segundo a máscara (ex.: '###.###.###-##')"""
+    n = len(digitos)
+    saida = np.empty((n, len(mascara)), dtype=np.uint8)
+    coluna_digito = 0
+    for posicao, caractere in enumerate(mascara):
+        if caractere == '#':
+            saida[:, posicao] = digitos[:, coluna_digito] + ord('0')
+            coluna_digito += 1
+        else:
+            saida[:, posicao] = ord(caractere)
+    return saida.view(f'S{len(mascara)}').ravel().astype(str)
+
+
+def gerar_documentos(rng, n):
+    """Gera CPFs (~74%), CNPJs (~23%) e vazios (~3%), com ~1% de dígitos verificadores errados"""
+    tipo = rng.choice(3, size=n, p=[0.74, 0.23, 0.03])
+    documentos = np.full(n, '', dtype=object)
+
+    indices_cpf = np.flatnonzero(tipo == 0)
+    cpfs = digitos_verificadores_cpf(rng.integers(0, 10, size=(len(indices_cpf), 9)))
+    documentos[indices_cpf] = formatar_documentos(cpfs, '###.###.###-##')
+
+    indices_cnpj = np.flatnonzero(tipo == 1)
+    base_cnpj = rng.integers(0, 10, size=(len(indices_cnpj), 12))
+    base_cnpj[:, 8:12] = [0, 0, 0, 1]
+    cnpjs = digitos_verificadores_cnpj(base_cnpj)
+    documentos[indices_cnpj] = formatar_documentos(cnpjs, '##.###.###/####-##')
+
+    # Corrompe o último dígito de uma pequena parte dos documentos
+    corrompidos = np.flatnonzero((tipo < 2) & (rng.random(n) < 0.01))
+    documentos[corrompidos] = [d[:-1] + str((int(d[-1]) + 1) % 10) for d in documentos[corrompidos]]
+    return documentos
+
+
+def gerar_datas(rng, n, inicio, fim, fracao_vazia):
+    """Sorteia datas DD/MM/YYYY entre inicio e fim, formatando apenas os dias distintos"""
+    dias = pd.date_range(inicio, fim, freq='D')
+    textos = np.asarray(dias.strftime('%d/%m/%Y'), dtype=object)
+    datas = textos[rng.integers(0, len(dias), size=n)]
+    datas[rng.random(n) < fracao_vazia] = ''
+    return datas
+
+
+def gerar_bloco(rng, inicio, n):
+    """Gera um bloco de n registros com o esquema de 27 colunas do dump"""
+    logins = np.char.add('user', np.arange(inicio, inicio + n).astype(str)).astype(object)
+    nomes = np.char.add(np.char.add(rng.choice(NOMES, n), ' '), rng.choice(SOBRENOMES, n))
+    cidades = rng.choice(CIDADES, n, p=np.array(PESOS_CIDADES) / sum(PESOS_CIDADES))
+
+    dados = {col: np.full(n, '', dtype=object) for col in COLUNAS}
+    dados.update({
+        'login': logins,
+        'nome_completo': nomes,
+        'endereco': np.char.add('Rua ', rng.choice(SOBRENOMES, n)),
+        'bairro': rng.choice(BAIRROS, n),
+        'cidade': cidades,
+        'estado': pd.Series(cidades).map(ESTADO_POR_CIDADE).fillna('RJ').to_numpy(dtype=object),
+        'cep': np.char.zfill(rng.integers(20000000, 28999999, n).astype(str), 8),
+        'telefone1': np.char.add('21', rng.integers(20000000, 99999999, n).astype(str)),
+        'data_cadastro': gerar_datas(rng, n, '1995-01-01', '2025-06-01', 0.0),
+        'data_nascimento': gerar_datas(rng, n, '1920-01-01', '2004-12-31', 0.1),
+        'tipo_plano': rng.choice(PLANOS, n, p=np.array(PESOS_PLANOS) / sum(PESOS_PLANOS)),
+        'forma_pagamento': rng.choice(FORMAS_PAGAMENTO, n),
+        'senha': np.char.add('pw', rng.integers(0, 10 ** 8, n).astype(str)),
+        'cpf_cnpj': gerar_documentos(rng, n),
+        'observacoes': rng.choice(OBSERVACOES, n),
+    })
+    dados['razao_social'] = np.where(np.char.str_len(dados['cpf_cnpj'].astype(str)) == 18,
+                                     np.char.add(dados['nome_completo'], ' Ltda'), '')
+    return pd.DataFrame(dados, columns=COLUNAS)
+
+
+def gerar_dados(linhas, diretorio='.', semente=42, fracao_ativos=0.05, tamanho_bloco=500_000):
+    """Grava z_raw_data.csv e z_active_users.txt sintéticos no diretório indicado"""
+    rng = np.random.default_rng(semente)
+    os.makedirs(diretorio, exist_ok=True)
+    caminho_csv = os.path.join(diretorio, 'z_raw_data.csv')
+    caminho_ativos = os.path.join(diretorio, 'z_active_users.txt')
+
+    print(f"Gerando {linhas} registros sintéticos em {caminho_csv}...", flush=True)
+    with open(caminho_ativos, 'w') as arquivo_ativos:
+        for inicio in range(0, linhas, tamanho_bloco):
+            n = min(tamanho_bloco, linhas - inicio)
+            bloco = gerar_bloco(rng, inicio, n)
+
+            # Algumas contas aparecem duplicadas no dump
+            repetidos = rng.random(n) < 0.001
+            bloco.loc[repetidos, 'login'] = bloco['login'].shift(1)[repetidos].fillna(bloco['login'])
+
+            bloco.to_csv(caminho_csv, index=False, mode='w' if inicio == 0 else 'a', header=inicio == 0)
+
+            # Usuários ativos no formato do passwd: login:x:uid:gid::/home/login:/bin/false
+            ativos = bloco['login'][rng.random(n) < fracao_ativos]
+            for uid, login in enumerate(ativos, start=inicio + 1000):
+                arquivo_ativos.write(f"{login}:x:{uid}:100::/home/{login}:/bin/false\n")
+
+    print(f"Arquivos gerados: {caminho_csv}, {caminho_ativos}", flush=True)
+    return caminho_csv, caminho_ativos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera um dump sintético com o esquema de z_raw_data.csv")
+    parser.add_argument('--linhas', type=int, default=10_000, help="quantidade de registros (padrão: 10000)")
+    parser.add_argument('--saida', default='.', help="diretório de saída (padrão: diretório atual)")
+    parser.add_argument('--semente', type=int, default=42, help="semente do gerador aleatório")
+    parser.add_argument('--fracao-ativos', type=float, default=0.05,
+                        help="fração de logins listados em z_active_users.txt (padrão: 0.05)")
+    args = parser.parse_args(argv)
+
+    gerar_dados(args.linhas, args.saida, args.semente, args.fracao_ativos)
+
+
+if __name__ == "__main__":
+    main()
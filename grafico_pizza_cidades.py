@@ -1,32 +1,69 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import pandas as pd
-import matplotlib.pyplot as plt
+import argparse
+from carregador import carregar_csv
+from renderizacao import exibir_e_fechar, agrupar_outros, adicionar_argumentos, aplicar_argumentos
+from instrumentacao import medir
+from esquema import colunas_para
+from normalizacao import normalizar_cidades
 
-# Carregar o arquivo CSV
-df = pd.read_csv('z_raw_data_active.csv')
+# Número máximo de fatias no gráfico; as demais cidades são somadas em "Outros"
+MAXIMO_FATIAS = 10
 
-# Contar o número de ocorrências de cada cidade
-contagem_cidades = df['cidade'].value_counts()
 
-# Configurar o gráfico de pizza
-plt.figure(figsize=(12, 8))
-plt.pie(contagem_cidades.values, labels=contagem_cidades.index, autopct='%1.1f%%',
-        shadow=True, startangle=90)
-plt.axis('equal')  # Para garantir que o gráfico seja um círculo
-plt.title('Distribuição de Usuários por Cidade')
+@medir('agregar_cidades')
+def contar_cidades(df):
+    """Conta o número de ocorrências de cada cidade, unificando grafias diferentes da mesma cidade"""
+    contagem = normalizar_cidades(df['cidade']).value_counts()
+    # Em colunas categóricas, categorias sem nenhum registro aparecem com contagem zero
+    return contagem[contagem > 0]
 
-# Adicionar legenda se houver muitas cidades
-if len(contagem_cidades) > 5:
-    plt.legend(contagem_cidades.index, loc="best", bbox_to_anchor=(1, 0.5))
 
-# Salvar o gráfico como arquivo de imagem
-plt.savefig('grafico_pizza_cidades.png', bbox_inches='tight')
+def gerar_grafico_pizza(contagem_cidades, maximo_fatias=MAXIMO_FATIAS):
+    """Gera o gráfico de pizza da distribuição de usuários por cidade"""
+    import matplotlib.pyplot as plt
+    # Manter as maiores cidades e agrupar o restante como "Outros"
+    contagem_cidades = agrupar_outros(contagem_cidades, maximo=maximo_fatias)
 
-# Exibir o gráfico na tela
-plt.show()
+    # Configurar o gráfico de pizza
+    plt.figure(figsize=(12, 8))
+    plt.pie(contagem_cidades.values, labels=contagem_cidades.index, autopct='%1.1f%%',
+            shadow=True, startangle=90)
+    plt.axis('equal')  # Para garantir que o gráfico seja um círculo
+    plt.title('Distribuição de Usuários por Cidade')
 
-# Imprimir estatísticas
-print("Distribuição de usuários por cidade:")
-print(contagem_cidades)
+    # Adicionar legenda se houver muitas cidades
+    if len(contagem_cidades) > 5:
+        plt.legend(contagem_cidades.index, loc="best", bbox_to_anchor=(1, 0.5))
+
+    # Salvar o gráfico como arquivo de imagem
+    plt.savefig('grafico_pizza_cidades.png', bbox_inches='tight')
+
+    # Exibir o gráfico na tela (apenas em modo interativo) e liberar a figura
+    exibir_e_fechar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distribuição de usuários ativos por cidade")
+    parser.add_argument('--fatias', type=int, default=MAXIMO_FATIAS,
+                        help=f"número máximo de fatias do gráfico (padrão: {MAXIMO_FATIAS})")
+    adicionar_argumentos(parser)
+    args = parser.parse_args(argv)
+    aplicar_argumentos(args)
+
+    # Carregar o arquivo CSV
+    df = carregar_csv('z_raw_data_active.csv', colunas=colunas_para('cidades'))
+
+    contagem_cidades = contar_cidades(df)
+
+    if not args.sem_graficos:
+        gerar_grafico_pizza(contagem_cidades, args.fatias)
+
+    # Imprimir estatísticas
+    print("Distribuição de usuários por cidade:")
+    print(contagem_cidades)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+import pandas as pd
+import numpy as np
+import argparse
+import hashlib
+import inspect
+import os
+import pickle
+import sys
+from carregador import DIRETORIO_CACHE, carregar_csv
+from esquema import colunas_para
+from indice_ativos import ARQUIVO_ATIVOS, carregar_indice
+from instrumentacao import etapa
+from normalizacao import chave_texto
+from estatisticas_streaming import AcumuladorMomentos
+from analise_por_status import (STATUS, DIMENSOES, ORDEM_DIMENSOES, NAO_INFORMADO,
+                                marcar_status, derivar_dimensoes)
+import analise_por_status
+import datas
+import distribuicao_idade
+import normalizacao
+import pf_pj
+import tempo_plataforma
+
+# Estado persistido entre dumps: impressões e contribuições por linha + agregados
+DIRETORIO_INCREMENTAL = os.path.join(DIRETORIO_CACHE, 'incremental')
+
+# Colunas brutas que entram na impressão de cada linha (além do status de ativo)
+COLUNAS_IMPRESSAO = colunas_para('planos', 'cidades', 'pf_pj', 'idade', 'tempo')
+
+# Colunas numéricas com momentos mantidos por status
+COLUNAS_MOMENTOS = ['idade', 'tempo_plataforma']
+
+# Módulos cujo código define as colunas derivadas: se mudarem, o estado é recalculado do zero
+MODULOS_CALCULO = [analise_por_status, datas, distribuicao_idade, normalizacao, pf_pj, tempo_plataforma]
+
+
+def versao_calculo():
+    """Hash do código das derivações e das datas de referência usadas em idade e tempo"""
+    h = hashlib.sha256()
+    for modulo in MODULOS_CALCULO + [sys.modules[__name__]]:
+        h.update(inspect.getsource(modulo).encode('utf-8'))
+    h.update(str(distribuicao_idade.data_atual).encode('utf-8'))
+    h.update(str(tempo_plataforma.DATA_ATUAL).encode('utf-8'))
+    return h.hexdigest()
+
+
+def impressoes(df):
+    """Chave (login + ocorrência) e hash de cada linha, incluindo o status de ativo"""
+    # Logins repetidos são distinguidos pela ordem de aparição no dump
+    login = df['login'].astype(object).fillna('')
+    ocorrencia = login.groupby(login, sort=False).cumcount()
+    # A chave também é um hash de 64 bits: comparar inteiros é bem mais rápido que comparar textos
+    chave = pd.util.hash_pandas_object(pd.DataFrame({'login': login, 'ocorrencia': ocorrencia}), index=False)
+    impressao = pd.util.hash_pandas_object(df[COLUNAS_IMPRESSAO + ['status']], index=False)
+    return pd.DataFrame({'chave': chave.to_numpy(), 'impressao': impressao.to_numpy()})
+
+
+def _cidades_estaveis(cidades, nomes):
+    """Mantém o nome já adotado para cada cidade; cidades novas registram o próprio nome"""
+    # Um delta pequeno poderia eleger outra grafia como a mais frequente ("Sao Paulo")
+    traducao = {}
+    for nome in cidades.dropna().unique():
+        traducao[nome] = nomes.setdefault(chave_texto(nome), nome)
+    return cidades.astype(object).map(traducao)
+
+
+def contribuicoes(df, nomes_cidades):
+    """Valores derivados de cada linha, guardados para que ela possa ser subtraída no próximo dump"""
+    if df.empty:
+        return pd.DataFrame({coluna: pd.Series(dtype=object) for coluna in ['status'] + list(DIMENSOES)}
+                            | {coluna: pd.Series(dtype=float) for coluna in COLUNAS_MOMENTOS})
+    df = derivar_dimensoes(df)
+    df['cidade'] = _cidades_estaveis(df['cidade'], nomes_cidades)
+    contrib = pd.DataFrame({'status': df['status'].astype(object)})
+    for coluna in DIMENSOES:
+        contrib[coluna] = df[coluna].astype(object).fillna(NAO_INFORMADO).to_numpy()
+    for coluna in COLUNAS_MOMENTOS:
+        contrib[coluna] = df[coluna].to_numpy(dtype=float)
+    return contrib
+
+
+def agregar(contrib):
+    """Contagens (valor, status) por dimensão e momentos por status de um conjunto de linhas"""
+    contagens = {coluna: contrib.groupby([coluna, 'status']).size() for coluna in DIMENSOES}
+    momentos = {}
+    for coluna in COLUNAS_MOMENTOS:
+        for status in STATUS:
+            valores = contrib.loc[contrib['status'] == status, coluna]
+            momentos[(coluna, status)] = AcumuladorMomentos().atualizar(valores)
+    return {'contagens': contagens, 'momentos': momentos}
+
+
+def aplicar_delta(agregados, removidas, adicionadas):
+    """Subtrai as contribuições das linhas removidas e soma as das adicionadas"""
+    delta_removido = agregar(removidas)
+    delta_adicionado = agregar(adicionadas)
+    for coluna in DIMENSOES:
+        contagem = (agregados['contagens'][coluna]
+                    .sub(delta_removido['contagens'][coluna], fill_value=0)
+                    .add(delta_adicionado['contagens'][coluna], fill_value=0))
+        agregados['contagens'][coluna] = contagem[contagem > 0].astype('int64')
+    for chave, acumulador in agregados['momentos'].items():
+        acumulador.subtrair(delta_removido['momentos'][chave]).mesclar(delta_adicionado['momentos'][chave])
+    return agregados
+
+
+def _caminhos_estado(arquivo, diretorio):
+    base = os.path.splitext(os.path.basename(arquivo))[0]
+    prefixo = os.path.join(diretorio, base)
+    return f"{prefixo}.linhas.parquet", f"{prefixo}.agregados.pkl"
+
+
+def carregar_estado(arquivo, diretorio=DIRETORIO_INCREMENTAL):
+    """Estado gravado pela execução anterior, ou None se ausente, incompleto ou de outra versão"""
+    caminho_linhas, caminho_agregados = _caminhos_estado(arquivo, diretorio)
+    try:
+        with open(caminho_agregados, 'rb') as f:
+            agregados = pickle.load(f)
+        linhas = pd.read_parquet(caminho_linhas)
+    except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+        return None
+    if agregados.get('versao') != versao_calculo() or agregados.get('linhas') != len(linhas):
+        return None
+    return linhas, agregados
+
+
+def gravar_estado(arquivo, linhas, agregados, diretorio=DIRETORIO_INCREMENTAL):
+    """Grava o estado em arquivos temporários e os move para o lugar no final"""
+    os.makedirs(diretorio, exist_ok=True)
+    caminho_linhas, caminho_agregados = _caminhos_estado(arquivo, diretorio)
+    agregados['versao'] = versao_calculo()
+    agregados['linhas'] = len(linhas)
+    # Colunas de texto repetitivas ocupam pouco em disco como categóricas
+    linhas = linhas.astype({coluna: 'category' for coluna in ['status'] + list(DIMENSOES)})
+    linhas.to_parquet(f"{caminho_linhas}.tmp", index=False)
+    with open(f"{caminho_agregados}.tmp", 'wb') as f:
+        pickle.dump(agregados, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f"{caminho_linhas}.tmp", caminho_linhas)
+    os.replace(f"{caminho_agregados}.tmp", caminho_agregados)
+
+
+def _como_objeto(linhas):
+    return linhas.astype({coluna: object for coluna in ['status'] + list(DIMENSOES)})
+
+
+def atualizar(arquivo, arquivo_ativos=ARQUIVO_ATIVOS, diretorio=DIRETORIO_INCREMENTAL, recalcular=False):
+    """Atualiza os agregados com o novo dump, recalculando só as linhas incluídas, removidas ou alteradas"""
+    indice = carregar_indice(arquivo_ativos)
+    df = carregar_csv(arquivo, colunas=COLUNAS_IMPRESSAO)
+    df = marcar_status(df, indice)
+
+    with etapa('incremental_impressoes', linhas=len(df)):
+        novas = impressoes(df)
+
+    estado = None if recalcular else carregar_estado(arquivo, diretorio)
+    if estado is None:
+        print("Estado anterior ausente ou incompatível: calculando todos os agregados...", flush=True)
+        nomes_cidades = {}
+        with etapa('incremental_completo', linhas=len(df)):
+            contrib = contribuicoes(df, nomes_cidades)
+            agregados = agregar(contrib)
+        agregados['nomes_cidades'] = nomes_cidades
+        linhas = pd.concat([novas, contrib], axis=1)
+        gravar_estado(arquivo, linhas, agregados, diretorio)
+        return agregados, {'completo': True, 'incluidas': len(df), 'removidas': 0, 'alteradas': 0}
+
+    linhas, agregados = estado
+    linhas = _como_objeto(linhas)
+    with etapa('incremental_delta', linhas=len(df)) as registro:
+        # Inclusões e remoções pela presença da chave; alterações pela impressão das chaves comuns
+        existentes = novas['chave'].isin(linhas['chave']).to_numpy()
+        mantidas = linhas['chave'].isin(novas['chave']).to_numpy()
+        comuns = novas.loc[existentes].merge(linhas.loc[mantidas, ['chave', 'impressao']], on='chave',
+                                             suffixes=('', '_anterior'))
+        alteradas = comuns.loc[comuns['impressao'] != comuns['impressao_anterior'], 'chave']
+
+        # Linhas alteradas saem com os valores antigos e entram com os novos
+        entrando = ~existentes | novas['chave'].isin(alteradas).to_numpy()
+        antigas = ~mantidas | linhas['chave'].isin(alteradas).to_numpy()
+
+        contrib = contribuicoes(df.loc[entrando].reset_index(drop=True), agregados['nomes_cidades'])
+        aplicar_delta(agregados, linhas.loc[antigas], contrib)
+        linhas = pd.concat([linhas.loc[~antigas],
+                            pd.concat([novas.loc[entrando].reset_index(drop=True), contrib], axis=1)],
+                           ignore_index=True)
+        registro['recalculadas'] = int(entrando.sum())
+
+    gravar_estado(arquivo, linhas, agregados, diretorio)
+    return agregados, {'completo': False, 'incluidas': int((~existentes).sum()),
+                       'removidas': int((~mantidas).sum()), 'alteradas': len(alteradas)}
+
+
+def tabela_dimensao(contagem, coluna):
+    """Tabela valor x status (Ativo, Inativo e Total), no formato de analise_por_status"""
+    tabela = contagem.unstack('status', fill_value=0).reindex(columns=STATUS, fill_value=0)
+    tabela['Total'] = tabela.sum(axis=1)
+    if coluna in ORDEM_DIMENSOES:
+        ordem = list(ORDEM_DIMENSOES[coluna])
+        if NAO_INFORMADO in tabela.index:
+            ordem.append(NAO_INFORMADO)
+        return tabela.reindex(ordem, fill_value=0)
+    return tabela.sort_values('Total', ascending=False)
+
+
+def tabela_momentos(agregados, coluna):
+    """Contagem, média, variância e desvio padrão por status e no total"""
+    linhas = {}
+    total = AcumuladorMomentos()
+    for status in STATUS:
+        acumulador = agregados['momentos'][(coluna, status)]
+        total.mesclar(acumulador)
+        linhas[status] = acumulador
+    linhas['Total'] = total
+    return pd.DataFrame({nome: {'count': m.n, 'mean': m.media if m.n else np.nan,
+                                'var': m.variancia, 'std': m.desvio_padrao}
+                         for nome, m in linhas.items()}).T
+
+
+def exibir_relatorio(agregados, resumo):
+    """Imprime o resumo das mudanças e os agregados atualizados"""
+    if resumo['completo']:
+        print(f"\nCálculo completo: {resumo['incluidas']} linhas")
+    else:
+        print(f"\nMudanças desde o dump anterior: {resumo['incluidas']} incluídas, "
+              f"{resumo['removidas']} removidas, {resumo['alteradas']} alteradas")
+
+    print("\n===== Relatório por status (incremental) =====")
+    for coluna, titulo in DIMENSOES.items():
+        print(f"\n{titulo}:")
+        print(tabela_dimensao(agregados['contagens'][coluna], coluna))
+    # Medianas e quantis não admitem subtração; use 'status' ou 'stream-stats' para obtê-los
+    print("\nEstatísticas da idade:")
+    print(tabela_momentos(agregados, 'idade'))
+    print("\nEstatísticas do tempo de plataforma (anos):")
+    print(tabela_momentos(agregados, 'tempo_plataforma'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Agregados por status mantidos incrementalmente entre dumps")
+    parser.add_argument('arquivo', nargs='?', default='z_raw_data.csv',
+                        help="dump completo (padrão: z_raw_data.csv)")
+    parser.add_argument('--ativos', default=ARQUIVO_ATIVOS,
+                        help=f"arquivo de usuários ativos (padrão: {ARQUIVO_ATIVOS})")
+    parser.add_argument('--estado', default=DIRETORIO_INCREMENTAL,
+                        help=f"diretório do estado persistido (padrão: {DIRETORIO_INCREMENTAL})")
+    parser.add_argument('--recalcular', action='store_true',
+                        help="descarta o estado anterior e recalcula tudo")
+    args = parser.parse_args(argv)
+
+    for arquivo in (args.arquivo, args.ativos):
+        if not os.path.exists(arquivo):
+            print(f"ERRO: Arquivo {arquivo} não encontrado!")
+            sys.exit(1)
+
+    agregados, resumo = atualizar(args.arquivo, args.ativos, args.estado, args.recalcular)
+    exibir_relatorio(agregados, resumo)
+
+
+if __name__ == "__main__":
+    main()
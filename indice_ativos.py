@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+import pandas as pd
+import numpy as np
+import itertools
+import os
+import sys
+from carregador import DIRETORIO_CACHE, cache_valido, gravar_metadados
+from instrumentacao import etapa
+
+ARQUIVO_ATIVOS = 'z_active_users.txt'
+
+# Linhas do arquivo de usuários processadas por vez na construção do índice
+LINHAS_POR_BLOCO = 1_000_000
+
+
+def hash_logins(logins):
+    """Converte logins em hashes de 64 bits (determinísticos entre execuções)"""
+    # Com 64 bits, a chance de colisão é desprezível mesmo com milhões de contas de cada lado
+    return pd.util.hash_array(np.asarray(logins, dtype=object))
+
+
+def _caminhos_indice(caminho):
+    base = os.path.splitext(os.path.basename(caminho))[0]
+    prefixo = os.path.join(DIRETORIO_CACHE, f"{base}.indice")
+    return f"{prefixo}.npy", f"{prefixo}.json"
+
+
+def construir_indice(caminho=ARQUIVO_ATIVOS):
+    """Lê o arquivo de usuários (formato passwd) e gera o array ordenado de hashes dos logins"""
+    print(f"Construindo índice de logins ativos a partir de {caminho}...", flush=True)
+    blocos = []
+    with open(caminho, 'r') as f:
+        while True:
+            linhas = list(itertools.islice(f, LINHAS_POR_BLOCO))
+            if not linhas:
+                break
+            # O login é a parte antes do primeiro ':'
+            logins = [linha.strip().split(':', 1)[0] for linha in linhas]
+            blocos.append(hash_logins([login for login in logins if login]))
+
+    if not blocos:
+        return np.empty(0, dtype=np.uint64)
+    # Ordenado e sem repetições, para permitir busca binária vetorizada
+    return np.unique(np.concatenate(blocos))
+
+
+def carregar_indice(caminho=ARQUIVO_ATIVOS):
+    """Carrega o índice de logins ativos do disco (mapeado em memória), reconstruindo se necessário"""
+    if not os.path.exists(caminho):
+        print(f"ERRO: Arquivo {caminho} não encontrado!", flush=True)
+        sys.exit(1)
+
+    with etapa('indice_ativos', arquivo=caminho) as registro:
+        caminho_indice, caminho_meta = _caminhos_indice(caminho)
+        if cache_valido(caminho, caminho_indice, caminho_meta):
+            print(f"Usando índice de logins ativos em {caminho_indice}", flush=True)
+            indice = np.load(caminho_indice, mmap_mode='r')
+        else:
+            indice = construir_indice(caminho)
+            os.makedirs(DIRETORIO_CACHE, exist_ok=True)
+            np.save(caminho_indice, indice)
+            gravar_metadados(caminho, caminho_meta)
+            print(f"Índice com {len(indice)} logins ativos gravado em {caminho_indice}", flush=True)
+        registro['linhas'] = len(indice)
+    return indice
+
+
+def pertence(logins, indice):
+    """Testa, de forma vetorizada, quais logins estão no índice de ativos"""
+    hashes = hash_logins(logins)
+    if len(indice) == 0:
+        return np.zeros(len(hashes), dtype=bool)
+    posicoes = np.searchsorted(indice, hashes)
+    posicoes[posicoes == len(indice)] = 0
+    return np.asarray(indice)[posicoes] == hashes
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+import pandas as pd
+import argparse
+import codecs
+import csv
+import os
+import sys
+import time
+from esquema import COLUNAS, tipos_colunas
+from instrumentacao import etapa
+
+# Bytes lidos do início do arquivo para detectar codificação e cabeçalho
+TAMANHO_AMOSTRA = 4 * 1024 * 1024
+
+# Bytes sem caractere definido em cp1252: se aparecerem, o arquivo só pode ser latin-1
+_INDEFINIDOS_CP1252 = {0x81, 0x8D, 0x8F, 0x90, 0x9D}
+
+_MARCAS_BOM = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+def detectar_codificacao(caminho, tamanho_amostra=TAMANHO_AMOSTRA):
+    """Detecta a codificação do arquivo: BOM, UTF-8 válido, cp1252 ou latin-1"""
+    with open(caminho, 'rb') as f:
+        amostra = f.read(tamanho_amostra)
+    for marca, codificacao in _MARCAS_BOM:
+        if amostra.startswith(marca):
+            return codificacao
+
+    try:
+        # final=False tolera um caractere multibyte cortado no fim da amostra
+        codecs.getincrementaldecoder('utf-8')().decode(amostra, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+
+    # Sistemas legados gravam em Windows-1252 (superconjunto prático do latin-1 para português)
+    if _INDEFINIDOS_CP1252.isdisjoint(amostra):
+        return 'cp1252'
+    return 'latin-1'
+
+
+def ler_primeira_linha(caminho, codificacao):
+    """Campos da primeira linha do arquivo (respeitando aspas)"""
+    with open(caminho, 'r', encoding=codificacao, newline='') as f:
+        return next(csv.reader(f), [])
+
+
+def tem_cabecalho(campos, colunas_esperadas=COLUNAS):
+    """Indica se a linha é um cabeçalho: a maioria dos campos são nomes de colunas do esquema"""
+    conhecidos = sum(1 for campo in campos if campo.strip().lower() in colunas_esperadas)
+    return conhecidos > len(campos) / 2
+
+
+def validar_colunas(campos, possui_cabecalho, colunas_esperadas=COLUNAS):
+    """Confere as colunas da primeira linha com o esquema e retorna os nomes usados na leitura"""
+    if possui_cabecalho:
+        nomes = [campo.strip().lower() or f"col_{i}" for i, campo in enumerate(campos)]
+        desconhecidas = [nome for nome in nomes if nome not in colunas_esperadas]
+        if desconhecidas:
+            print(f"AVISO: colunas fora do esquema no cabeçalho: {', '.join(desconhecidas)}", flush=True)
+        ausentes = [col for col in colunas_esperadas if col not in nomes]
+        if ausentes:
+            print(f"AVISO: colunas do esquema ausentes no cabeçalho: {', '.join(ausentes)}", flush=True)
+        return nomes
+
+    # Sem cabeçalho, as colunas são identificadas pela posição: faltar alguma desalinharia todas
+    if len(campos) < len(colunas_esperadas):
+        raise ValueError(f"o arquivo tem {len(campos)} colunas, mas o esquema define {len(colunas_esperadas)}")
+    extras = [f"col_{i}" for i in range(len(colunas_esperadas), len(campos))]
+    if extras:
+        # Colunas a mais no fim (por exemplo, a vírgula final de alguns dumps) são lidas e ignoradas
+        print(f"AVISO: o arquivo tem {len(campos)} colunas, mas o esquema define {len(colunas_esperadas)}; "
+              f"as excedentes foram lidas como {', '.join(extras)}", flush=True)
+    return list(colunas_esperadas) + extras
+
+
+def detectar_formato(caminho, colunas_esperadas=COLUNAS):
+    """Codificação, presença de cabeçalho e nomes das colunas de um dump do sistema legado"""
+    codificacao = detectar_codificacao(caminho)
+    campos = ler_primeira_linha(caminho, codificacao)
+    possui_cabecalho = tem_cabecalho(campos, colunas_esperadas)
+    nomes = validar_colunas(campos, possui_cabecalho, colunas_esperadas)
+    return codificacao, possui_cabecalho, nomes
+
+
+def gravar_quarentena(linhas_invalidas, caminho_quarentena):
+    """Grava as linhas descartadas (colunas esperadas/encontradas e texto) em um arquivo à parte"""
+    pd.DataFrame(linhas_invalidas, columns=['colunas_esperadas', 'colunas_encontradas', 'texto']) \
+        .to_csv(caminho_quarentena, index=False)
+    print(f"AVISO: {len(linhas_invalidas)} linhas malformadas separadas em '{caminho_quarentena}'", flush=True)
+
+
+def caminho_quarentena_padrao(caminho):
+    return f"{os.path.splitext(caminho)[0]}.quarentena.csv"
+
+
+def _ler_pyarrow(caminho, codificacao, nomes, possui_cabecalho, linhas_invalidas):
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    # Com newlines_in_values, o pyarrow não informa o número da linha (linha.number é sempre None)
+    def tratar_linha_invalida(linha):
+        linhas_invalidas.append((linha.expected_columns, linha.actual_columns, linha.text))
+        return 'skip'
+
+    # O leitor do pyarrow divide o arquivo em blocos e os analisa em paralelo (use_threads)
+    tabela = pacsv.read_csv(
+        caminho,
+        read_options=pacsv.ReadOptions(encoding=codificacao, use_threads=True, column_names=nomes,
+                                       skip_rows=1 if possui_cabecalho else 0),
+        parse_options=pacsv.ParseOptions(invalid_row_handler=tratar_linha_invalida, newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(column_types={nome: pa.string() for nome in nomes},
+                                             strings_can_be_null=True),
+    )
+    return tabela.to_pandas()
+
+
+def _ler_pandas(caminho, codificacao, nomes, possui_cabecalho, linhas_invalidas):
+    # O motor Python do pandas aceita uma função para linhas com colunas a mais
+    # (linhas com colunas a menos são completadas com nulos, como no read_csv padrão)
+    def tratar_linha_invalida(campos):
+        linhas_invalidas.append((len(nomes), len(campos), ','.join(campos)))
+        return None
+
+    return pd.read_csv(caminho, encoding=codificacao, header=None, names=nomes,
+                       skiprows=1 if possui_cabecalho else 0, dtype=str, engine='python',
+                       on_bad_lines=tratar_linha_invalida)
+
+
+def _blocos_pyarrow(caminho, codificacao, nomes, possui_cabecalho, colunas, tamanho_chunk, linhas_invalidas):
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    def tratar_linha_invalida(linha):
+        linhas_invalidas.append((linha.expected_columns, linha.actual_columns, linha.text))
+        return 'skip'
+
+    # Leitor em fluxo: os lotes do pyarrow (por bytes) são reagrupados em blocos de tamanho_chunk linhas
+    leitor = pacsv.open_csv(
+        caminho,
+        read_options=pacsv.ReadOptions(encoding=codificacao, column_names=nomes,
+                                       skip_rows=1 if possui_cabecalho else 0),
+        parse_options=pacsv.ParseOptions(invalid_row_handler=tratar_linha_invalida, newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(include_columns=colunas,
+                                             column_types={nome: pa.string() for nome in colunas},
+                                             strings_can_be_null=True),
+    )
+    pendente = None
+    for lote in leitor:
+        tabela = pa.Table.from_batches([lote])
+        if pendente is not None:
+            tabela = pa.concat_tables([pendente, tabela])
+        while tabela.num_rows >= tamanho_chunk:
+            yield tabela.slice(0, tamanho_chunk).to_pandas()
+            tabela = tabela.slice(tamanho_chunk)
+        pendente = tabela
+    if pendente is not None and pendente.num_rows:
+        yield pendente.to_pandas()
+
+
+def _blocos_pandas(caminho, codificacao, nomes, possui_cabecalho, colunas, tamanho_chunk, linhas_invalidas):
+    def tratar_linha_invalida(campos):
+        linhas_invalidas.append((len(nomes), len(campos), ','.join(campos)))
+        return None
+
+    with pd.read_csv(caminho, encoding=codificacao, header=None, names=nomes,
+                     skiprows=1 if possui_cabecalho else 0, usecols=colunas, dtype=str, engine='python',
+                     on_bad_lines=tratar_linha_invalida, chunksize=tamanho_chunk) as leitor:
+        yield from leitor
+
+
+def _ler_blocos(caminho, codificacao, nomes, possui_cabecalho, colunas, tamanho_chunk, caminho_quarentena):
+    linhas_invalidas = []
+    try:
+        import pyarrow.csv  # noqa: F401
+        blocos = _blocos_pyarrow(caminho, codificacao, nomes, possui_cabecalho, colunas, tamanho_chunk,
+                                 linhas_invalidas)
+    except ImportError:
+        print("AVISO: pyarrow não instalado; usando o leitor em blocos do pandas.", flush=True)
+        blocos = _blocos_pandas(caminho, codificacao, nomes, possui_cabecalho, colunas, tamanho_chunk,
+                                linhas_invalidas)
+    yield from blocos
+    if linhas_invalidas:
+        gravar_quarentena(linhas_invalidas, caminho_quarentena or caminho_quarentena_padrao(caminho))
+
+
+def ler_em_blocos(caminho, tamanho_chunk, colunas=None, caminho_quarentena=None, colunas_esperadas=COLUNAS):
+    """Lê um dump do sistema legado em blocos de linhas (texto), com a mesma detecção e quarentena de ler_csv"""
+    # A detecção roda já na chamada, para que erros de formato apareçam antes da primeira leitura
+    codificacao, possui_cabecalho, nomes = detectar_formato(caminho, colunas_esperadas)
+    colunas = nomes if colunas is None else [col for col in colunas if col in nomes]
+    print(f"Lendo {caminho} em blocos de {tamanho_chunk} linhas (codificação {codificacao}, "
+          f"{'com' if possui_cabecalho else 'sem'} cabeçalho)...", flush=True)
+    return _ler_blocos(caminho, codificacao, nomes, possui_cabecalho, colunas, tamanho_chunk, caminho_quarentena)
+
+
+def ler_csv(caminho, dtype=None, caminho_quarentena=None, colunas_esperadas=COLUNAS):
+    """Lê um dump do sistema legado detectando codificação e cabeçalho e separando linhas malformadas"""
+    with etapa('ingestao', arquivo=caminho) as registro:
+        codificacao, possui_cabecalho, nomes = detectar_formato(caminho, colunas_esperadas)
+        print(f"Lendo {caminho} (codificação {codificacao}, "
+              f"{'com' if possui_cabecalho else 'sem'} cabeçalho)...", flush=True)
+
+        linhas_invalidas = []
+        try:
+            df = _ler_pyarrow(caminho, codificacao, nomes, possui_cabecalho, linhas_invalidas)
+        except ImportError:
+            print("AVISO: pyarrow não instalado; usando o leitor do pandas (uma thread).", flush=True)
+            df = _ler_pandas(caminho, codificacao, nomes, possui_cabecalho, linhas_invalidas)
+
+        if linhas_invalidas:
+            gravar_quarentena(linhas_invalidas, caminho_quarentena or caminho_quarentena_padrao(caminho))
+
+        # Todas as colunas chegam como texto; os tipos do esquema são aplicados depois
+        if dtype:
+            df = df.astype({col: tipo for col, tipo in dtype.items() if col in df.columns})
+
+        registro['linhas'] = len(df)
+        registro['codificacao'] = codificacao
+        registro['cabecalho'] = possui_cabecalho
+        registro['quarentena'] = len(linhas_invalidas)
+    return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Valida e lê um dump legado (codificação, cabeçalho e linhas malformadas)")
+    parser.add_argument('arquivo', nargs='?', default='z_raw_data.csv', help="CSV de entrada (padrão: z_raw_data.csv)")
+    parser.add_argument('--quarentena', default=None,
+                        help="arquivo para as linhas malformadas (padrão: <arquivo>.quarentena.csv)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.arquivo):
+        print(f"ERRO: Arquivo {args.arquivo} não encontrado!")
+        sys.exit(1)
+
+    inicio = time.perf_counter()
+    try:
+        df = ler_csv(args.arquivo, tipos_colunas(), args.quarentena)
+    except ValueError as e:
+        print(f"ERRO: {str(e)}")
+        sys.exit(1)
+    print(f"{len(df)} registros e {len(df.columns)} colunas lidos em {time.perf_counter() - inicio:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
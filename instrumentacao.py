@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+import functools
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Destino das linhas JSON (None = não emitir) e etapas registradas nesta execução
+_destino = None
+_registros = []
+
+
+def configurar(arquivo=None):
+    """Define para onde as métricas são emitidas ('-' para stderr, None para desativar)"""
+    global _destino
+    if _destino not in (None, sys.stderr):
+        _destino.close()
+    if arquivo is None:
+        _destino = None
+    elif arquivo == '-':
+        _destino = sys.stderr
+    else:
+        _destino = open(arquivo, 'a')
+
+
+def pico_rss_mb():
+    """Pico de memória residente do processo até agora, em MB"""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+
+def _emitir(registro):
+    _registros.append(registro)
+    if _destino is not None:
+        _destino.write(json.dumps(registro, ensure_ascii=False, default=str) + '\n')
+        _destino.flush()
+
+
+@contextmanager
+def etapa(nome, linhas=None, **detalhes):
+    """Mede tempo, linhas processadas e pico de RSS de uma etapa do pipeline"""
+    # Quem chama pode preencher registro['linhas'] quando a contagem só é conhecida no fim
+    registro = {'etapa': nome, 'linhas': linhas, **detalhes}
+    pico_inicial = pico_rss_mb()
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    except BaseException as e:
+        registro['erro'] = type(e).__name__
+        raise
+    finally:
+        registro['segundos'] = round(time.perf_counter() - inicio, 4)
+        pico_final = pico_rss_mb()
+        if pico_final is not None:
+            registro['pico_rss_mb'] = round(pico_final, 1)
+            registro['aumento_pico_rss_mb'] = round(pico_final - pico_inicial, 1)
+        _emitir(registro)
+
+
+def medir(nome):
+    """Decorador que mede a função como uma etapa, contando as linhas do DataFrame recebido"""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envoltorio(df, *args, **kwargs):
+            with etapa(nome, linhas=len(df)):
+                return funcao(df, *args, **kwargs)
+        return envoltorio
+    return decorador
+
+
+def registros():
+    """Etapas medidas até agora nesta execução"""
+    return list(_registros)
+
+
+def imprimir_resumo(arquivo=sys.stderr):
+    """Imprime uma tabela legível com as etapas medidas"""
+    if not _registros:
+        return
+    print("\nResumo das etapas:", file=arquivo)
+    print(f"{'etapa':<28} {'segundos':>10} {'linhas':>12} {'pico RSS (MB)':>14}", file=arquivo)
+    for registro in _registros:
+        linhas = registro.get('linhas')
+        pico = registro.get('pico_rss_mb')
+        print(f"{registro['etapa']:<28} {registro['segundos']:>10.3f} "
+              f"{linhas if linhas is not None else '-':>12} "
+              f"{pico if pico is not None else '-':>14}", file=arquivo)
+    arquivo.flush()
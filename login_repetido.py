@@ -1,25 +1,90 @@
-import pandas as pd
-
-# Carregar o arquivo CSV
-df = pd.read_csv('z_raw_data.csv')
-
-# Verificar se existem logins repetidos
-duplicados = df['login'].duplicated().any()
-
-if duplicados:
-    # Contagem de ocorrências de cada login
-    contagem_login = df['login'].value_counts()
-    # Filtrar apenas os logins que aparecem mais de uma vez
-    logins_repetidos = contagem_login[contagem_login > 1]
-
-    print(f"Existem {len(logins_repetidos)} logins repetidos no arquivo:")
-    print(logins_repetidos)
-else:
-    print("Não existem logins repetidos no arquivo.")
-
-# Opcional: mostrar os registros completos de logins duplicados
-if duplicados:
-    print("\nRegistros com logins repetidos:")
-    for login in logins_repetidos.index:
-        print(f"\nLogin: {login}")
-        print(df[df['login'] == login])
\ No newline at end of file
+import argparse
+import unicodedata
+from carregador import carregar_csv
+from instrumentacao import medir
+
+
+def normalizar_login(login):
+    """Gera a chave de comparação de um login (sem caixa, acentos ou espaços)"""
+    texto = unicodedata.normalize('NFKD', str(login).casefold())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ''.join(texto.split())
+
+
+@medir('duplicados')
+def encontrar_duplicados(df, coluna='login'):
+    """Agrupa, em uma única passada, os registros que compartilham o mesmo valor da coluna"""
+    repetidos = df[df[coluna].notna() & df[coluna].duplicated(keep=False)]
+
+    # Ordenação estável: os registros de um mesmo grupo ficam contíguos e na ordem original
+    repetidos = repetidos.sort_values(coluna, kind='stable')
+    repetidos.insert(0, 'grupo_id', repetidos.groupby(coluna, sort=False).ngroup())
+    return repetidos
+
+
+@medir('quase_duplicados')
+def encontrar_quase_duplicados(df, coluna='login'):
+    """Agrupa logins que diferem apenas por caixa, acentos ou espaços"""
+    # A normalização roda apenas sobre os valores distintos e é mapeada de volta
+    distintos = df[coluna].dropna().unique()
+    mapa = {valor: normalizar_login(valor) for valor in distintos}
+
+    df = df.assign(chave_normalizada=df[coluna].map(mapa))
+    variantes = df.groupby('chave_normalizada')[coluna].transform('nunique')
+
+    # Só interessam chaves com mais de uma grafia; duplicatas exatas já estão no outro relatório
+    quase = df[variantes > 1]
+    quase = quase.sort_values('chave_normalizada', kind='stable')
+    quase.insert(0, 'grupo_id', quase.groupby('chave_normalizada', sort=False).ngroup())
+    return quase
+
+
+def salvar_grupos(grupos, nome_base, formato):
+    """Salva os grupos encontrados em CSV ou JSON"""
+    caminho = f"{nome_base}.{formato}"
+    if formato == 'json':
+        grupos.to_json(caminho, orient='records', force_ascii=False, indent=2)
+    else:
+        grupos.to_csv(caminho, index=False)
+    print(f"Grupos salvos em '{caminho}'")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detecta logins repetidos em z_raw_data.csv")
+    parser.add_argument('--formato', choices=['csv', 'json'], default='csv',
+                        help="formato dos arquivos de saída (padrão: csv)")
+    parser.add_argument('--detalhes', action='store_true',
+                        help="imprime os registros completos de cada login repetido")
+    args = parser.parse_args(argv)
+
+    # Carregar o arquivo CSV
+    df = carregar_csv('z_raw_data.csv')
+
+    duplicados = encontrar_duplicados(df)
+
+    if len(duplicados):
+        # Contagem de ocorrências de cada login repetido
+        logins_repetidos = duplicados['login'].value_counts()
+
+        print(f"Existem {len(logins_repetidos)} logins repetidos no arquivo:")
+        print(logins_repetidos)
+        salvar_grupos(duplicados, 'logins_duplicados', args.formato)
+    else:
+        print("Não existem logins repetidos no arquivo.")
+
+    quase_duplicados = encontrar_quase_duplicados(df)
+    if len(quase_duplicados):
+        print(f"\nExistem {quase_duplicados['grupo_id'].nunique()} grupos de logins quase idênticos "
+              "(diferença de caixa, acento ou espaço)")
+        salvar_grupos(quase_duplicados, 'logins_quase_duplicados', args.formato)
+
+    # Opcional: mostrar os registros completos de logins duplicados
+    if args.detalhes and len(duplicados):
+        print("\nRegistros com logins repetidos:")
+        for login, grupo in duplicados.groupby('login', sort=False):
+            print(f"\nLogin: {login}")
+            print(grupo)
+
+
+if __name__ == "__main__":
+    main()
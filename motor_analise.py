@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+import sys
+import os
+import argparse
+from carregador import carregar_csv
+from renderizacao import renderizar, adicionar_argumentos, aplicar_argumentos
+from instrumentacao import medir
+from esquema import colunas_para
+import analise_tipo_plano
+import grafico_pizza_cidades
+import pf_pj
+import distribuicao_idade
+import tempo_plataforma
+
+
+@medir('relatorio')
+def analisar_tudo(df):
+    """Calcula todos os agregados das análises sobre um único DataFrame já carregado"""
+    print(f"Calculando agregados sobre {len(df)} registros...", flush=True)
+    resultados = {'total_registros': len(df)}
+
+    # Tipo de plano e cidade
+    resultados['planos'] = analise_tipo_plano.analisar_tipos_plano(df)
+    resultados['cidades'] = grafico_pizza_cidades.contar_cidades(df)
+
+    # PF/PJ (adiciona as colunas cpf_cnpj_limpo e tipo_pessoa ao DataFrame)
+    df = pf_pj.classificar_pf_pj(df)
+    resultados['pf_pj'] = df['tipo_pessoa'].value_counts()
+
+    # Faixas etárias
+    df_idade = distribuicao_idade.calcular_idades(df)
+    resultados['faixas_etarias'] = distribuicao_idade.distribuicao_faixas(df_idade)
+    resultados['estatisticas_idade'] = df_idade['idade'].describe()
+    resultados['total_com_nascimento'] = len(df_idade)
+
+    # Tempo de plataforma (por último, pois converte data_cadastro e descarta linhas inválidas)
+    df_tempo, media, mediana, variancia, desvio_padrao = tempo_plataforma.calcular_tempo_plataforma(df)
+    distribuicao, freq_por_ano = tempo_plataforma.analisar_distribuicao(df_tempo, media, mediana, variancia, desvio_padrao)
+    resultados['tempo'] = {
+        'media': media,
+        'mediana': mediana,
+        'variancia': variancia,
+        'desvio_padrao': desvio_padrao,
+        'distribuicao': distribuicao,
+        'freq_por_ano': freq_por_ano,
+        'tempos': df_tempo['tempo_plataforma'],
+    }
+
+    return resultados
+
+
+def exibir_relatorio(resultados):
+    """Imprime um resumo de todos os agregados calculados"""
+    print("\n===== Relatório consolidado =====")
+    print(f"Total de registros: {resultados['total_registros']}")
+
+    print("\nDistribuição por tipo de plano:")
+    print(resultados['planos'])
+
+    print("\nDistribuição de usuários por cidade:")
+    print(resultados['cidades'])
+
+    print("\nClassificação PF/PJ:")
+    print(resultados['pf_pj'])
+
+    print("\nDistribuição de frequência por faixa etária:")
+    print(resultados['faixas_etarias'])
+    print("\nEstatísticas da idade:")
+    print(resultados['estatisticas_idade'])
+    print(f"Total de clientes com data de nascimento válida: {resultados['total_com_nascimento']}")
+
+    tempo = resultados['tempo']
+    print("\nTempo de plataforma:")
+    print(f"Média: {tempo['media']:.2f} anos")
+    print(f"Mediana: {tempo['mediana']:.2f} anos")
+    print(f"Variância: {tempo['variancia']:.2f}")
+    print(f"Desvio Padrão: {tempo['desvio_padrao']:.2f}")
+
+
+def tarefas_graficos(resultados):
+    """Lista todos os gráficos do relatório como tarefas independentes de renderização"""
+    tempo = resultados['tempo']
+    tarefas = [
+        (analise_tipo_plano.gerar_grafico_pizza, (resultados['planos'],)),
+        (grafico_pizza_cidades.gerar_grafico_pizza, (resultados['cidades'],)),
+        (pf_pj.grafico_pizza_pf_pj, (resultados['pf_pj'],)),
+        (distribuicao_idade.gerar_grafico, (resultados['faixas_etarias'],)),
+    ]
+    tarefas += tempo_plataforma.tarefas_graficos(
+        tempo['tempos'], tempo['distribuicao'], tempo['freq_por_ano'],
+        tempo['media'], tempo['mediana'], tempo['variancia'], tempo['desvio_padrao'])
+    return tarefas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calcula todas as análises com uma única leitura do dataset")
+    parser.add_argument('arquivo', nargs='?', default='z_raw_data_active.csv',
+                        help="CSV a analisar (padrão: z_raw_data_active.csv)")
+    adicionar_argumentos(parser)
+    args = parser.parse_args(argv)
+    aplicar_argumentos(args)
+
+    print("Iniciando análise consolidada...")
+    print(f"Diretório de trabalho: {os.getcwd()}")
+
+    arquivo = args.arquivo
+    if not os.path.exists(arquivo):
+        print(f"ERRO: Arquivo {arquivo} não encontrado!")
+        sys.exit(1)
+
+    # Uma única leitura alimenta todas as análises
+    df = carregar_csv(arquivo, colunas=colunas_para('planos', 'cidades', 'pf_pj', 'idade', 'tempo'))
+    print(f"Total de registros carregados: {len(df)}")
+
+    resultados = analisar_tudo(df)
+    exibir_relatorio(resultados)
+
+    if not args.sem_graficos:
+        renderizar(tarefas_graficos(resultados), args.paralelo, args.processos)
+
+    print("\nAnálise concluída!")
+
+
+if __name__ == "__main__":
+    main()
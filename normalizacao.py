@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+import pandas as pd
+import numpy as np
+import re
+import unicodedata
+from functools import lru_cache
+
+# Abreviações e apelidos conhecidos, já na forma de chave (ver chave_texto) -> nome canônico
+ABREVIACOES_CIDADES = {
+    'rj': 'Rio de Janeiro',
+    'rio': 'Rio de Janeiro',
+    'rio de janeiro rj': 'Rio de Janeiro',
+    'sp': 'São Paulo',
+    'sampa': 'São Paulo',
+    'bh': 'Belo Horizonte',
+    'poa': 'Porto Alegre',
+    'nit': 'Niterói',
+}
+
+ABREVIACOES_BAIRROS = {
+    'copa': 'Copacabana',
+    'jd botanico': 'Jardim Botânico',
+    'jardim botanico': 'Jardim Botânico',
+    'barra': 'Barra da Tijuca',
+}
+
+# Abreviações aplicadas a cada coluna normalizada, também na busca por valores (cubo e serviço de consultas)
+ABREVIACOES_POR_DIMENSAO = {
+    'cidade': ABREVIACOES_CIDADES,
+    'bairro': ABREVIACOES_BAIRROS,
+}
+
+_SEPARADORES = re.compile(r'[\s\-/]+')
+
+
+def remover_acentos(texto):
+    """Remove acentos e cedilhas, mantendo as letras base"""
+    # Atalho para o caso mais comum: texto puramente ASCII não tem o que remover
+    if texto.isascii():
+        return texto
+    return ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c))
+
+
+@lru_cache(maxsize=None)
+def chave_texto(valor):
+    """Chave de comparação: sem acentos, caixa e espaços extras, e sem pontuação de abreviação"""
+    sem_acentos = remover_acentos(valor)
+    # Pontos de abreviação são descartados ("R.J." -> "rj"); hífens e barras viram espaço
+    return _SEPARADORES.sub(' ', sem_acentos.casefold().replace('.', '')).strip()
+
+
+def chave_canonica(valor, abreviacoes=None):
+    """Chave de comparação de um valor, com abreviações conhecidas trocadas pela chave do nome canônico"""
+    chave = chave_texto(str(valor))
+    if abreviacoes and chave in abreviacoes:
+        return chave_texto(abreviacoes[chave])
+    return chave
+
+
+def _nome_exibicao(valor):
+    """Remove espaços nas pontas e repetidos, preservando acentos e caixa originais"""
+    return ' '.join(valor.split())
+
+
+def tabela_normalizacao(valores, contagens, abreviacoes=None):
+    """Monta o mapeamento valor bruto -> nome normalizado a partir dos valores distintos"""
+    # Variantes com a mesma chave recebem o nome da grafia mais frequente
+    # (por exemplo, "São Paulo" vence "Sao Paulo"), salvo se houver um nome canônico
+    abreviacoes = abreviacoes or {}
+    canonicos = {chave_texto(nome): nome for nome in abreviacoes.values()}
+
+    chaves = {valor: chave_canonica(valor, abreviacoes) for valor in valores}
+
+    nomes = {}
+    for valor, contagem in sorted(zip(valores, contagens), key=lambda par: -par[1]):
+        chave = chaves[valor]
+        if chave and chave not in nomes:
+            nomes[chave] = canonicos.get(chave, _nome_exibicao(str(valor)))
+    # Valores vazios ou só com espaços ficam sem nome (NaN)
+    return {valor: nomes.get(chave, np.nan) for valor, chave in chaves.items()}
+
+
+def normalizar_coluna(serie, abreviacoes=None):
+    """Normaliza uma coluna de texto processando apenas os valores distintos; o resultado é categórico"""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos, unicos = serie.cat.codes.to_numpy(), serie.cat.categories
+    else:
+        codigos, unicos = pd.factorize(serie)
+    contagens = np.bincount(codigos[codigos >= 0], minlength=len(unicos))
+    tabela = tabela_normalizacao(list(unicos), contagens, abreviacoes)
+
+    # Tradução pelos códigos: o custo por linha é apenas uma indexação no array
+    novos_codigos, categorias = pd.factorize(pd.Series([tabela[valor] for valor in unicos], dtype=object))
+    # O -1 acrescentado no fim faz os nulos (código -1) continuarem nulos
+    codigos_finais = np.append(novos_codigos, -1)[codigos]
+    return pd.Series(pd.Categorical.from_codes(codigos_finais, categories=categorias),
+                     index=serie.index, name=serie.name)
+
+
+def normalizar_cidades(serie):
+    """Unifica grafias de cidades (caixa, acentos, espaços e abreviações como RJ/Rio)"""
+    return normalizar_coluna(serie, ABREVIACOES_CIDADES)
+
+
+def normalizar_bairros(serie):
+    """Unifica grafias de bairros (caixa, acentos, espaços e abreviações conhecidas)"""
+    return normalizar_coluna(serie, ABREVIACOES_BAIRROS)
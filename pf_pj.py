@@ -1,18 +1,19 @@
 #!/usr/bin/env python3
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
 import sys
 import os
-
-# Define os nomes das colunas baseados na análise do arquivo
-colunas = [
-    'login', 'nome_completo', 'razao_social', 'endereco', 'bairro',
-    'cidade', 'estado', 'cep', 'telefone1', 'telefone2',
-    'data_cadastro', 'data_nascimento', 'tipo_plano', 'forma_pagamento',
-    'cartao', 'validade_cartao', 'titular_cartao', 'campo17', 'campo18', 'senha',
-    'cpf_cnpj', 'campo21', 'campo22', 'observacoes', 'campo24', 'campo25', 'campo26'
-]
+import argparse
+from carregador import carregar_csv
+from renderizacao import adicionar_argumentos, aplicar_argumentos
+from instrumentacao import medir
+from esquema import colunas_para
+
+# Pesos oficiais para o cálculo dos dígitos verificadores
+PESOS_CPF_DV1 = np.arange(10, 1, -1)
+PESOS_CPF_DV2 = np.arange(11, 1, -1)
+PESOS_CNPJ_DV1 = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+PESOS_CNPJ_DV2 = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
 
 def carregar_dados():
     """Carrega os dados do arquivo CSV"""
@@ -24,13 +25,59 @@ def carregar_dados():
             sys.exit(1)
 
         # Lê o arquivo CSV
-        df = pd.read_csv('z_raw_data_active.csv')
+        df = carregar_csv('z_raw_data_active.csv', colunas=colunas_para('pf_pj'))
         print(f"Total de registros carregados: {len(df)}")
         return df
     except Exception as e:
         print(f"ERRO ao carregar o arquivo CSV: {str(e)}")
         sys.exit(1)
 
+def matriz_digitos(documentos, largura):
+    """Converte documentos numéricos de mesma largura em uma matriz (registros x dígitos)"""
+    if len(documentos) == 0:
+        return np.empty((0, largura), dtype=np.int64)
+    buffer = ''.join(documentos).encode('ascii')
+    return (np.frombuffer(buffer, dtype=np.uint8).reshape(-1, largura) - ord('0')).astype(np.int64)
+
+def validar_cpfs(digitos):
+    """Valida os dígitos verificadores de uma matriz de CPFs (n x 11)"""
+    # DV = (soma ponderada * 10) mod 11, com resto 10 tratado como 0
+    dv1 = (digitos[:, :9] @ PESOS_CPF_DV1 * 10) % 11 % 10
+    dv2 = (digitos[:, :10] @ PESOS_CPF_DV2 * 10) % 11 % 10
+    # Sequências de um único dígito (111.111.111-11) passam no cálculo, mas não são válidas
+    repetidos = (digitos == digitos[:, :1]).all(axis=1)
+    return (dv1 == digitos[:, 9]) & (dv2 == digitos[:, 10]) & ~repetidos
+
+def validar_cnpjs(digitos):
+    """Valida os dígitos verificadores de uma matriz de CNPJs (n x 14)"""
+    # DV = 11 - (soma ponderada mod 11), com restos 0 e 1 resultando em 0
+    resto1 = (digitos[:, :12] @ PESOS_CNPJ_DV1) % 11
+    resto2 = (digitos[:, :13] @ PESOS_CNPJ_DV2) % 11
+    dv1 = np.where(resto1 < 2, 0, 11 - resto1)
+    dv2 = np.where(resto2 < 2, 0, 11 - resto2)
+    repetidos = (digitos == digitos[:, :1]).all(axis=1)
+    return (dv1 == digitos[:, 12]) & (dv2 == digitos[:, 13]) & ~repetidos
+
+def classificar_documentos(documentos_limpos):
+    """Classifica documentos já limpos em PF, PJ, CPF/CNPJ inválido, formato inválido ou não informado"""
+    valores = np.asarray(documentos_limpos, dtype=object)
+    comprimentos = pd.Series(valores).str.len().fillna(0).to_numpy()
+
+    tipos = np.full(len(valores), 'Formato inválido', dtype=object)
+    tipos[comprimentos == 0] = 'Não informado'
+
+    # Cada tamanho é validado de uma vez, sobre a matriz de dígitos de todos os registros
+    indices_cpf = np.flatnonzero(comprimentos == 11)
+    cpf_valido = validar_cpfs(matriz_digitos(valores[indices_cpf], 11))
+    tipos[indices_cpf] = np.where(cpf_valido, 'PF', 'CPF inválido')
+
+    indices_cnpj = np.flatnonzero(comprimentos == 14)
+    cnpj_valido = validar_cnpjs(matriz_digitos(valores[indices_cnpj], 14))
+    tipos[indices_cnpj] = np.where(cnpj_valido, 'PJ', 'CNPJ inválido')
+
+    return tipos
+
+@medir('classificar_pf_pj')
 def classificar_pf_pj(df):
     """Classifica os registros como PF ou PJ com base no CPF/CNPJ"""
     try:
@@ -53,26 +100,15 @@ def classificar_pf_pj(df):
                 print("ERRO: Não foi possível encontrar coluna com CPF/CNPJ")
                 return df
 
-        # Limpar os dados - remover caracteres não numéricos
-        df['cpf_cnpj_limpo'] = df['cpf_cnpj'].astype(str).str.replace(r'[^0-9]', '', regex=True)
+        # Limpar os dados - remover caracteres não numéricos (valores ausentes ficam vazios)
+        df['cpf_cnpj_limpo'] = df['cpf_cnpj'].fillna('').astype(str).str.replace(r'[^0-9]', '', regex=True)
 
         # Exibe alguns valores para verificação
         print("Amostra de CPF/CNPJ após limpeza:")
         print(df['cpf_cnpj_limpo'].head())
 
-        # Classificar como PF ou PJ
-        def tipo_pessoa(cpf_cnpj):
-            if pd.isna(cpf_cnpj) or not cpf_cnpj or cpf_cnpj == 'nan':
-                return 'Não informado'
-            cpf_cnpj = str(cpf_cnpj).strip()
-            if len(cpf_cnpj) == 11:
-                return 'PF'
-            elif len(cpf_cnpj) == 14:
-                return 'PJ'
-            else:
-                return 'Formato inválido'
-
-        df['tipo_pessoa'] = df['cpf_cnpj_limpo'].apply(tipo_pessoa)
+        # Classificar como PF ou PJ, validando os dígitos verificadores
+        df['tipo_pessoa'] = classificar_documentos(df['cpf_cnpj_limpo'].to_numpy())
 
         # Exibe contagem de cada tipo
         print("Resultado da classificação:")
@@ -99,20 +135,31 @@ def gerar_grafico_pizza(df):
         print("Distribuição para o gráfico:")
         print(contagem)
 
-        # Configurar o gráfico
-        plt.figure(figsize=(10, 6))
-        plt.pie(contagem, labels=contagem.index, autopct='%1.1f%%', startangle=90, shadow=True)
-        plt.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
-        plt.title('Proporção de Pessoas Físicas e Jurídicas')
-
-        # Salvar o gráfico
-        plt.savefig('grafico_pf_pj_ativos.png')
-        print("Gráfico salvo como 'grafico_pf_pj_ativos.png'")
+        grafico_pizza_pf_pj(contagem)
 
     except Exception as e:
         print(f"ERRO ao gerar gráfico: {str(e)}")
 
-def main():
+def grafico_pizza_pf_pj(contagem):
+    """Desenha e salva o gráfico de pizza a partir da contagem por tipo de pessoa"""
+    import matplotlib.pyplot as plt
+    # Configurar o gráfico
+    plt.figure(figsize=(10, 6))
+    plt.pie(contagem, labels=contagem.index, autopct='%1.1f%%', startangle=90, shadow=True)
+    plt.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
+    plt.title('Proporção de Pessoas Físicas e Jurídicas')
+
+    # Salvar o gráfico
+    plt.savefig('grafico_pf_pj_ativos.png')
+    plt.close()
+    print("Gráfico salvo como 'grafico_pf_pj_ativos.png'")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Proporção de pessoas físicas e jurídicas entre os usuários ativos")
+    adicionar_argumentos(parser)
+    args = parser.parse_args(argv)
+    aplicar_argumentos(args)
+
     print("Iniciando análise de dados...")
     print(f"Diretório de trabalho: {os.getcwd()}")
 
@@ -127,7 +174,8 @@ def main():
     print(f"Total de registros: {len(df)}")
 
     # Gerar gráfico
-    gerar_grafico_pizza(df)
+    if not args.sem_graficos:
+        gerar_grafico_pizza(df)
 
     print("Análise concluída!")
 
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sys
+from carregador import DIRETORIO_CACHE, carregar_csv, hash_conteudo
+from esquema import colunas_para
+from indice_ativos import ARQUIVO_ATIVOS, carregar_indice, pertence
+from instrumentacao import etapa
+import analise_tipo_plano
+import grafico_pizza_cidades
+import pf_pj
+import distribuicao_idade
+import tempo_plataforma
+import renderizacao
+import esquema
+import normalizacao
+import datas
+import indice_ativos
+
+# Resultados e manifestos das etapas (um par de arquivos por etapa, sobrescrito a cada execução)
+DIRETORIO_PIPELINE = os.path.join(DIRETORIO_CACHE, 'pipeline')
+
+
+class Etapa:
+    """Passo do pipeline: função, dependências, arquivos lidos e gerados, parâmetros e código-fonte"""
+
+    def __init__(self, nome, funcao, dependencias=(), fontes=(), saidas=(), parametros=None,
+                 modulos=(), persistir=True):
+        self.nome = nome
+        self.funcao = funcao
+        self.dependencias = list(dependencias)
+        self.fontes = list(fontes)
+        self.saidas = list(saidas)
+        self.parametros = parametros or {}
+        # Módulos cujo código entra na chave: alterar a análise invalida o resultado
+        self.modulos = [sys.modules[funcao.__module__]] + list(modulos)
+        # Etapas não persistidas (leituras de dados brutos) são recalculadas quando alguém precisa delas
+        self.persistir = persistir
+
+
+class Pipeline:
+    """DAG de etapas com passagem de resultados em memória e cache por hash de conteúdo"""
+
+    def __init__(self, diretorio=DIRETORIO_PIPELINE):
+        self.diretorio = diretorio
+        self.etapas = {}
+        self.situacao = {}
+        self._chaves = {}
+        self._valores = {}
+        self._hash_modulos = {}
+        self._forcar = False
+
+    def adicionar(self, nome, funcao, **opcoes):
+        """Registra uma etapa; as dependências precisam ter sido registradas antes (o grafo fica acíclico)"""
+        for dependencia in opcoes.get('dependencias', ()):
+            if dependencia not in self.etapas:
+                raise ValueError(f"etapa '{nome}' depende de '{dependencia}', ainda não definida")
+        self.etapas[nome] = Etapa(nome, funcao, **opcoes)
+
+    def _hash_modulo(self, modulo):
+        if modulo.__name__ not in self._hash_modulos:
+            codigo = inspect.getsource(modulo).encode('utf-8')
+            self._hash_modulos[modulo.__name__] = hashlib.sha256(codigo).hexdigest()
+        return self._hash_modulos[modulo.__name__]
+
+    def chave(self, nome):
+        """Hash das fontes, parâmetros, código e chaves das dependências (sem executar nada)"""
+        if nome not in self._chaves:
+            definicao = self.etapas[nome]
+            h = hashlib.sha256(nome.encode('utf-8'))
+            h.update(json.dumps(definicao.parametros, sort_keys=True, default=str).encode('utf-8'))
+            for modulo in definicao.modulos:
+                h.update(self._hash_modulo(modulo).encode('utf-8'))
+            for fonte in definicao.fontes:
+                base = os.path.basename(fonte)
+                h.update(hash_conteudo(fonte, os.path.join(self.diretorio, 'fontes', f"{base}.json")).encode('utf-8'))
+            for dependencia in definicao.dependencias:
+                h.update(self.chave(dependencia).encode('utf-8'))
+            self._chaves[nome] = h.hexdigest()
+        return self._chaves[nome]
+
+    def _caminhos(self, nome):
+        prefixo = os.path.join(self.diretorio, nome)
+        return f"{prefixo}.pkl", f"{prefixo}.json"
+
+    def atualizada(self, nome):
+        """Indica se o resultado e os arquivos gerados pela etapa correspondem à chave atual"""
+        definicao = self.etapas[nome]
+        caminho_resultado, caminho_manifesto = self._caminhos(nome)
+        try:
+            with open(caminho_manifesto, 'r') as f:
+                manifesto = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if manifesto.get('chave') != self.chave(nome):
+            return False
+        if definicao.persistir and not os.path.exists(caminho_resultado):
+            return False
+        return all(os.path.exists(saida) for saida in definicao.saidas)
+
+    def valor(self, nome):
+        """Resultado da etapa: da memória, do cache em disco ou executando-a (e às dependências necessárias)"""
+        if nome in self._valores:
+            return self._valores[nome]
+
+        definicao = self.etapas[nome]
+        caminho_resultado, caminho_manifesto = self._caminhos(nome)
+        if not self._forcar and definicao.persistir and self.atualizada(nome):
+            with open(caminho_resultado, 'rb') as f:
+                self._valores[nome] = pickle.load(f)
+            self.situacao[nome] = 'carregada do cache'
+            return self._valores[nome]
+
+        # As dependências só são resolvidas aqui, quando a etapa realmente precisa rodar
+        argumentos = [self.valor(dependencia) for dependencia in definicao.dependencias]
+        print(f"\n--- Etapa '{nome}' ---", flush=True)
+        with etapa(f"pipeline_{nome}"):
+            resultado = definicao.funcao(*argumentos, **definicao.parametros)
+
+        os.makedirs(self.diretorio, exist_ok=True)
+        if definicao.persistir:
+            with open(caminho_resultado, 'wb') as f:
+                pickle.dump(resultado, f, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(caminho_manifesto, 'w') as f:
+            json.dump({'chave': self.chave(nome), 'saidas': definicao.saidas}, f)
+
+        self._valores[nome] = resultado
+        self.situacao[nome] = 'executada'
+        return resultado
+
+    def sumidouros(self, excluir=()):
+        """Etapas das quais nenhuma outra depende (desconsiderando as excluídas)"""
+        incluidas = [nome for nome in self.etapas if nome not in excluir]
+        usadas = {dep for nome in incluidas for dep in self.etapas[nome].dependencias}
+        return [nome for nome in incluidas if nome not in usadas]
+
+    def executar(self, alvos=None, forcar=False):
+        """Garante que os alvos estejam atualizados, executando apenas o que for afetado"""
+        self._forcar = forcar
+        for alvo in alvos or self.sumidouros():
+            if not forcar and alvo not in self._valores and self.atualizada(alvo):
+                self.situacao.setdefault(alvo, 'atualizada')
+            else:
+                self.valor(alvo)
+        return self.situacao
+
+
+def _carregar_dados(arquivo):
+    return carregar_csv(arquivo, colunas=colunas_para('planos', 'cidades', 'pf_pj', 'idade', 'tempo'))
+
+
+def _filtrar_ativos(df, indice):
+    """Mantém apenas os logins ativos, em memória (sem gravar z_raw_data_active.csv)"""
+    ativos = df[pertence(df['login'], indice)].reset_index(drop=True)
+    print(f"{len(ativos)} registros ativos de {len(df)}", flush=True)
+    return ativos
+
+
+def _classificar_pf_pj(df):
+    return pf_pj.classificar_pf_pj(df[['login', 'cpf_cnpj']].copy())['tipo_pessoa'].value_counts()
+
+
+def _calcular_idade(df, data_referencia):
+    df_filtrado = distribuicao_idade.calcular_idades(df[['login', 'data_nascimento']].copy(), data_referencia)
+    return {
+        'distribuicao': distribuicao_idade.distribuicao_faixas(df_filtrado),
+        'estatisticas': df_filtrado['idade'].describe(),
+        'total_validos': len(df_filtrado),
+        'total': len(df),
+    }
+
+
+def _salvar_estatisticas_idade(idade):
+    distribuicao_idade.salvar_estatisticas(idade['distribuicao'], idade['estatisticas'],
+                                           idade['total_validos'], idade['total'])
+
+
+def _grafico_idade(idade):
+    distribuicao_idade.gerar_grafico(idade['distribuicao'])
+
+
+def _calcular_tempo(df):
+    df_tempo, media, mediana, variancia, desvio_padrao = tempo_plataforma.calcular_tempo_plataforma(
+        df[['login', 'data_cadastro']].copy())
+    distribuicao, freq_por_ano = tempo_plataforma.analisar_distribuicao(df_tempo, media, mediana,
+                                                                        variancia, desvio_padrao)
+    return {'tempos': df_tempo['tempo_plataforma'], 'distribuicao': distribuicao, 'freq_por_ano': freq_por_ano,
+            'media': media, 'mediana': mediana, 'variancia': variancia, 'desvio_padrao': desvio_padrao}
+
+
+def _graficos_tempo(tempo):
+    renderizacao.renderizar(tempo_plataforma.tarefas_graficos(
+        tempo['tempos'], tempo['distribuicao'], tempo['freq_por_ano'],
+        tempo['media'], tempo['mediana'], tempo['variancia'], tempo['desvio_padrao']))
+
+
+GRAFICOS_TEMPO = ['histograma_tempo_plataforma.png', 'categorias_tempo_plataforma.png', 'cadastros_por_ano.png',
+                  'boxplot_tempo_plataforma.png', 'metricas_estatisticas.png']
+
+
+def definir_pipeline(arquivo='z_raw_data.csv', arquivo_ativos=ARQUIVO_ATIVOS,
+                     fatias=grafico_pizza_cidades.MAXIMO_FATIAS, data_referencia=distribuicao_idade.data_atual,
+                     diretorio=DIRETORIO_PIPELINE):
+    """Monta o DAG das análises de usuários ativos"""
+    p = Pipeline(diretorio)
+    # Leituras dos dados brutos: já têm cache próprio (índice e Parquet), então não são persistidas
+    p.adicionar('indice_ativos', carregar_indice, fontes=[arquivo_ativos],
+                parametros={'caminho': arquivo_ativos}, persistir=False)
+    p.adicionar('dados', _carregar_dados, fontes=[arquivo], parametros={'arquivo': arquivo},
+                modulos=[esquema], persistir=False)
+    p.adicionar('ativos', _filtrar_ativos, dependencias=['dados', 'indice_ativos'],
+                modulos=[indice_ativos])
+
+    p.adicionar('planos', analise_tipo_plano.analisar_tipos_plano, dependencias=['ativos'])
+    p.adicionar('grafico_planos', analise_tipo_plano.gerar_grafico_pizza, dependencias=['planos'],
+                saidas=['grafico_tipo_plano.png'], modulos=[renderizacao])
+
+    p.adicionar('cidades', grafico_pizza_cidades.contar_cidades, dependencias=['ativos'],
+                modulos=[normalizacao])
+    p.adicionar('grafico_cidades', grafico_pizza_cidades.gerar_grafico_pizza, dependencias=['cidades'],
+                saidas=['grafico_pizza_cidades.png'], parametros={'maximo_fatias': fatias}, modulos=[renderizacao])
+
+    p.adicionar('pf_pj', _classificar_pf_pj, dependencias=['ativos'], modulos=[pf_pj])
+    p.adicionar('grafico_pf_pj', pf_pj.grafico_pizza_pf_pj, dependencias=['pf_pj'],
+                saidas=['grafico_pf_pj_ativos.png'])
+
+    p.adicionar('idade', _calcular_idade, dependencias=['ativos'], parametros={'data_referencia': data_referencia},
+                modulos=[distribuicao_idade, datas])
+    p.adicionar('estatisticas_idade', _salvar_estatisticas_idade, dependencias=['idade'],
+                saidas=['estatisticas_idade.txt'], modulos=[distribuicao_idade])
+    p.adicionar('grafico_idade', _grafico_idade, dependencias=['idade'],
+                saidas=['distribuicao_idade.png'], modulos=[distribuicao_idade, renderizacao])
+
+    p.adicionar('tempo', _calcular_tempo, dependencias=['ativos'], modulos=[tempo_plataforma, datas])
+    p.adicionar('graficos_tempo', _graficos_tempo, dependencias=['tempo'], saidas=GRAFICOS_TEMPO,
+                modulos=[tempo_plataforma, renderizacao])
+    return p
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Executa as análises como um DAG, refazendo apenas o que mudou")
+    parser.add_argument('alvos', nargs='*', help="etapas a atualizar (padrão: todas as finais)")
+    parser.add_argument('--arquivo', default='z_raw_data.csv', help="dump completo (padrão: z_raw_data.csv)")
+    parser.add_argument('--ativos', default=ARQUIVO_ATIVOS,
+                        help=f"arquivo de usuários ativos (padrão: {ARQUIVO_ATIVOS})")
+    parser.add_argument('--fatias', type=int, default=grafico_pizza_cidades.MAXIMO_FATIAS,
+                        help="número máximo de fatias do gráfico de cidades")
+    parser.add_argument('--forcar', action='store_true', help="executa tudo, ignorando o cache")
+    parser.add_argument('--sem-graficos', action='store_true', help="atualiza apenas números e arquivos de texto")
+    parser.add_argument('--listar', action='store_true', help="mostra as etapas e se estão atualizadas, sem executar")
+    args = parser.parse_args(argv)
+
+    for caminho in (args.arquivo, args.ativos):
+        if not os.path.exists(caminho):
+            print(f"ERRO: Arquivo {caminho} não encontrado!")
+            sys.exit(1)
+
+    p = definir_pipeline(args.arquivo, args.ativos, args.fatias)
+    desconhecidas = [alvo for alvo in args.alvos if alvo not in p.etapas]
+    if desconhecidas:
+        print(f"ERRO: etapas desconhecidas: {', '.join(desconhecidas)} (disponíveis: {', '.join(p.etapas)})")
+        sys.exit(1)
+
+    if args.listar:
+        for nome, definicao in p.etapas.items():
+            estado = 'atualizada' if p.atualizada(nome) else 'pendente'
+            dependencias = f" <- {', '.join(definicao.dependencias)}" if definicao.dependencias else ''
+            print(f"{nome:20s} {estado:10s}{dependencias}")
+        return
+
+    graficos = {nome for nome, definicao in p.etapas.items() if any(s.endswith('.png') for s in definicao.saidas)}
+    alvos = args.alvos or p.sumidouros(excluir=graficos if args.sem_graficos else ())
+    if not graficos.isdisjoint(alvos):
+        # Execução em lote: os gráficos são apenas gravados em arquivo
+        renderizacao.configurar_backend_headless()
+
+    situacao = p.executar(alvos, forcar=args.forcar)
+
+    print("\n===== Pipeline =====")
+    for nome in p.etapas:
+        print(f"{nome:20s} {situacao.get(nome, 'não necessária')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+import pandas as pd
+import numpy as np
+import argparse
+import io
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datas import converter_datas
+from esquema import colunas_para
+from carregador import carregar_csv
+from ingestao import detectar_formato, gravar_quarentena, caminho_quarentena_padrao
+from instrumentacao import etapa
+from normalizacao import ABREVIACOES_CIDADES, tabela_normalizacao
+from renderizacao import renderizar, adicionar_argumentos, aplicar_argumentos
+from pf_pj import classificar_documentos
+from distribuicao_idade import idade_em_anos, categorizar_idade
+from tempo_plataforma import DATA_ATUAL, categorizar_tempo
+import motor_analise
+
+COLUNAS_ANALISES = colunas_para('planos', 'cidades', 'pf_pj', 'idade', 'tempo')
+
+
+class Fatia:
+    """Trecho de um CSV a processar: intervalo de bytes [inicio, fim) com linhas inteiras"""
+
+    def __init__(self, caminho, inicio, fim, nomes, codificacao):
+        self.caminho = caminho
+        self.inicio = inicio
+        self.fim = fim
+        self.nomes = nomes
+        self.codificacao = codificacao
+
+    def __repr__(self):
+        return f"Fatia({self.caminho!r}, {self.inicio}, {self.fim})"
+
+
+def dividir_arquivo(caminho, partes=1):
+    """Divide um CSV em até `partes` fatias alinhadas em quebras de linha, todas com o cabeçalho do arquivo"""
+    # As fronteiras são procuradas só pela quebra de linha: campos entre aspas com quebras
+    # de linha internas exigem partes=1 para esse arquivo
+    codificacao, possui_cabecalho, nomes = detectar_formato(caminho)
+
+    tamanho = os.path.getsize(caminho)
+    with open(caminho, 'rb') as f:
+        if possui_cabecalho:
+            f.readline()
+        inicio = f.tell()
+        fronteiras = [inicio]
+        for i in range(1, partes):
+            # Recuar um byte garante que uma linha iniciada exatamente no ponto de corte não seja pulada
+            f.seek(max(inicio + (tamanho - inicio) * i // partes - 1, inicio))
+            f.readline()
+            if f.tell() > fronteiras[-1]:
+                fronteiras.append(min(f.tell(), tamanho))
+        fronteiras.append(tamanho)
+    return [Fatia(caminho, a, b, nomes, codificacao) for a, b in zip(fronteiras, fronteiras[1:]) if b > a]
+
+
+def _ler_fatia_pyarrow(dados, fatia, colunas, linhas_invalidas):
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    def tratar_linha_invalida(linha):
+        linhas_invalidas.append((linha.expected_columns, linha.actual_columns, linha.text))
+        return 'skip'
+
+    # Mesmas opções de ingestao._ler_pyarrow, para descartar exatamente as mesmas linhas
+    tabela = pacsv.read_csv(
+        io.BytesIO(dados),
+        read_options=pacsv.ReadOptions(encoding=fatia.codificacao, column_names=fatia.nomes),
+        parse_options=pacsv.ParseOptions(invalid_row_handler=tratar_linha_invalida, newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(include_columns=colunas,
+                                             column_types={col: pa.string() for col in colunas},
+                                             strings_can_be_null=True),
+    )
+    return tabela.to_pandas()
+
+
+def _ler_fatia_pandas(dados, fatia, colunas, linhas_invalidas):
+    def tratar_linha_invalida(campos):
+        linhas_invalidas.append((len(fatia.nomes), len(campos), ','.join(campos)))
+        return None
+
+    return pd.read_csv(io.BytesIO(dados), header=None, names=fatia.nomes, usecols=colunas, dtype=str,
+                       encoding=fatia.codificacao, engine='python', on_bad_lines=tratar_linha_invalida)
+
+
+def ler_fatia(fatia, colunas=COLUNAS_ANALISES, linhas_invalidas=None):
+    """Lê apenas os bytes da fatia, descartando linhas malformadas como a ingestão de um arquivo inteiro"""
+    linhas_invalidas = [] if linhas_invalidas is None else linhas_invalidas
+    with open(fatia.caminho, 'rb') as f:
+        f.seek(fatia.inicio)
+        dados = f.read(fatia.fim - fatia.inicio)
+    colunas = [col for col in colunas if col in fatia.nomes]
+    try:
+        return _ler_fatia_pyarrow(dados, fatia, colunas, linhas_invalidas)
+    except ImportError:
+        return _ler_fatia_pandas(dados, fatia, colunas, linhas_invalidas)
+
+
+def agregados_parciais(df):
+    """Contagens mescláveis de uma fatia; valores contínuos viram contagens por valor exato"""
+    parciais = {'linhas': len(df)}
+    parciais['planos'] = df['tipo_plano'].value_counts()
+    # Cidades seguem brutas: a grafia vencedora de cada cidade depende das contagens de todas as fatias
+    parciais['cidades'] = df['cidade'].value_counts()
+
+    cpf_cnpj_limpo = df['cpf_cnpj'].fillna('').astype(str).str.replace(r'[^0-9]', '', regex=True)
+    parciais['pf_pj'] = pd.Series(classificar_documentos(cpf_cnpj_limpo.to_numpy())).value_counts()
+
+    nascimento, _ = converter_datas(df['data_nascimento'])
+    idades = idade_em_anos(nascimento)
+    parciais['idades'] = idades.dropna().astype(int).value_counts()
+
+    # Tempo em dias inteiros: as contagens por dia reproduzem exatamente média, quantis e categorias
+    cadastro, _ = converter_datas(df['data_cadastro'])
+    dias = (DATA_ATUAL - cadastro).dt.days
+    parciais['dias_plataforma'] = dias.dropna().astype(int).value_counts()
+    parciais['cadastros_por_ano'] = cadastro[dias >= 0].dt.year.value_counts()
+    return parciais
+
+
+def processar_fatia(fatia):
+    """Tarefa executada em cada processo do pool: agregados parciais e linhas malformadas da fatia"""
+    linhas_invalidas = []
+    df = ler_fatia(fatia, linhas_invalidas=linhas_invalidas)
+    return agregados_parciais(df), linhas_invalidas
+
+
+def mesclar_parciais(parciais):
+    """Soma as contagens de todas as fatias"""
+    total = {'linhas': sum(parcial['linhas'] for parcial in parciais)}
+    for chave in parciais[0]:
+        if chave != 'linhas':
+            series = [parcial[chave] for parcial in parciais if len(parcial[chave])]
+            total[chave] = (pd.concat(series).groupby(level=0, dropna=False).sum() if series
+                            else pd.Series(dtype='int64'))
+    return total
+
+
+def quantil_contagens(contagens, q):
+    """Quantil com interpolação linear (como Series.quantile) a partir de contagens por valor"""
+    valores = contagens.index.to_numpy(dtype=float)
+    acumulado = np.cumsum(contagens.to_numpy())
+    posicao = (acumulado[-1] - 1) * q
+    abaixo, acima = (valores[np.searchsorted(acumulado, k, side='right')]
+                     for k in (np.floor(posicao), np.ceil(posicao)))
+    return abaixo + (acima - abaixo) * (posicao - np.floor(posicao))
+
+
+def descrever_contagens(contagens):
+    """Resumo no formato de Series.describe() a partir de contagens por valor"""
+    contagens = contagens[contagens > 0].sort_index()
+    n = int(contagens.sum())
+    if n == 0:
+        return pd.Series({'count': 0.0, 'mean': np.nan, 'std': np.nan, 'min': np.nan,
+                          '25%': np.nan, '50%': np.nan, '75%': np.nan, 'max': np.nan})
+    valores = contagens.index.to_numpy(dtype=float)
+    pesos = contagens.to_numpy(dtype=float)
+    media = float((valores * pesos).sum() / n)
+    variancia = float((pesos * (valores - media) ** 2).sum() / (n - 1)) if n > 1 else np.nan
+    return pd.Series({
+        'count': float(n),
+        'mean': media,
+        'std': float(np.sqrt(variancia)),
+        'min': valores[0],
+        '25%': quantil_contagens(contagens, 0.25),
+        '50%': quantil_contagens(contagens, 0.50),
+        '75%': quantil_contagens(contagens, 0.75),
+        'max': valores[-1],
+    })
+
+
+def _contar_por_faixa(contagens, categorizar, nome):
+    # Agrupar pelo categórico mantém a ordem das faixas e as faixas vazias, como value_counts().sort_index()
+    faixas = categorizar(pd.Series(contagens.index.to_numpy(dtype=float))).rename(nome)
+    return pd.Series(contagens.to_numpy()).groupby(faixas, observed=False).sum().rename('count')
+
+
+def resultados_finais(total, com_tempos=False):
+    """Converte as contagens mescladas nos mesmos resultados de motor_analise.analisar_tudo"""
+    resultados = {'total_registros': total['linhas']}
+
+    resultados['planos'] = total['planos'].sort_values(ascending=False, kind='stable').rename('count')
+
+    cidades = total['cidades']
+    nomes = tabela_normalizacao(list(cidades.index), cidades.to_numpy(), ABREVIACOES_CIDADES)
+    resultados['cidades'] = (cidades.groupby(cidades.index.map(nomes)).sum()
+                             .sort_values(ascending=False, kind='stable').rename('count'))
+
+    pf_pj = total['pf_pj'].sort_values(ascending=False, kind='stable').rename('count')
+    resultados['pf_pj'] = pf_pj.rename_axis('tipo_pessoa')
+
+    idades = total['idades']
+    resultados['faixas_etarias'] = _contar_por_faixa(idades, categorizar_idade, 'faixa_etaria')
+    resultados['estatisticas_idade'] = descrever_contagens(idades).rename('idade')
+    resultados['total_com_nascimento'] = int(idades.sum())
+
+    # Média, mediana e dispersão sobre todos os tempos; categorias apenas sobre tempos não negativos
+    anos = total['dias_plataforma'].copy()
+    anos.index = anos.index.to_numpy(dtype=float) / 365.25
+    resumo = descrever_contagens(anos)
+    validos = anos[anos.index >= 0]
+    resultados['tempo'] = {
+        'media': resumo['mean'],
+        'mediana': resumo['50%'],
+        'variancia': resumo['std'] ** 2,
+        'desvio_padrao': resumo['std'],
+        'distribuicao': _contar_por_faixa(validos, categorizar_tempo, 'tempo_categoria'),
+        'freq_por_ano': total['cadastros_por_ano'].sort_index(),
+        # Valores individuais só são reconstituídos quando algum gráfico precisa deles
+        'tempos': (pd.Series(np.repeat(validos.index.to_numpy(), validos.to_numpy()), name='tempo_plataforma')
+                   if com_tempos else None),
+    }
+    return resultados
+
+
+def processar_em_paralelo(fatias, processos=None):
+    """Processa as fatias em um pool de processos e mescla os resultados parciais"""
+    print(f"Processando {len(fatias)} fatias em {processos or os.cpu_count()} processos...", flush=True)
+    with etapa('processamento_paralelo', fatias=len(fatias)) as registro:
+        with ProcessPoolExecutor(max_workers=processos) as pool:
+            resultados = list(pool.map(processar_fatia, fatias))
+        total = mesclar_parciais([parcial for parcial, _ in resultados])
+
+        # Linhas malformadas de todas as fatias de um arquivo vão para a quarentena desse arquivo
+        invalidas_por_arquivo = {}
+        for fatia, (_, linhas_invalidas) in zip(fatias, resultados):
+            invalidas_por_arquivo.setdefault(fatia.caminho, []).extend(linhas_invalidas)
+        for caminho, linhas_invalidas in invalidas_por_arquivo.items():
+            if linhas_invalidas:
+                gravar_quarentena(linhas_invalidas, caminho_quarentena_padrao(caminho))
+        registro['linhas'] = total['linhas']
+        registro['quarentena'] = sum(len(linhas) for linhas in invalidas_por_arquivo.values())
+    return total
+
+
+def _valores(serie):
+    return {str(chave): int(valor) for chave, valor in serie.items() if valor}
+
+
+def conferir(resultados, arquivos):
+    """Compara os resultados mesclados com uma execução única de motor_analise sobre os mesmos arquivos"""
+    print("\nConferindo com a execução em um único processo...", flush=True)
+    df = pd.concat([carregar_csv(arquivo, colunas=COLUNAS_ANALISES) for arquivo in arquivos], ignore_index=True)
+    unico = motor_analise.analisar_tudo(df)
+
+    divergencias = []
+    for chave in ('total_registros', 'total_com_nascimento'):
+        if resultados[chave] != unico[chave]:
+            divergencias.append(f"{chave}: {resultados[chave]} (fatias) != {unico[chave]} (único)")
+    contagens = {chave: (resultados[chave], unico[chave])
+                 for chave in ('planos', 'cidades', 'pf_pj', 'faixas_etarias')}
+    contagens['tempo_categoria'] = (resultados['tempo']['distribuicao'], unico['tempo']['distribuicao'])
+    contagens['cadastros_por_ano'] = (resultados['tempo']['freq_por_ano'], unico['tempo']['freq_por_ano'])
+    for chave, (paralelo, referencia) in contagens.items():
+        if _valores(paralelo) != _valores(referencia):
+            divergencias.append(f"{chave}: contagens diferentes")
+    for chave in ('media', 'mediana', 'variancia'):
+        if not np.isclose(resultados['tempo'][chave], unico['tempo'][chave], equal_nan=True):
+            divergencias.append(f"tempo {chave}: {resultados['tempo'][chave]} != {unico['tempo'][chave]}")
+    if not np.allclose(resultados['estatisticas_idade'].to_numpy(dtype=float),
+                       unico['estatisticas_idade'].to_numpy(dtype=float), equal_nan=True):
+        divergencias.append("estatísticas da idade diferentes")
+    return divergencias
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Análises sobre vários CSVs (ou fatias de um CSV) em paralelo")
+    parser.add_argument('arquivos', nargs='*', default=['z_raw_data_active.csv'],
+                        help="um ou mais CSVs (por exemplo, dumps regionais) com as colunas do esquema")
+    parser.add_argument('--partes', type=int, default=None,
+                        help="fatias por arquivo, divididas por intervalos de bytes "
+                             "(padrão: uma por núcleo com um único arquivo, senão 1)")
+    parser.add_argument('--conferir', action='store_true',
+                        help="refaz as análises em um único processo e compara os totais com os das fatias")
+    adicionar_argumentos(parser)
+    args = parser.parse_args(argv)
+    aplicar_argumentos(args)
+
+    for arquivo in args.arquivos:
+        if not os.path.exists(arquivo):
+            print(f"ERRO: Arquivo {arquivo} não encontrado!")
+            sys.exit(1)
+
+    partes = args.partes or (args.processos or os.cpu_count() if len(args.arquivos) == 1 else 1)
+    try:
+        fatias = [fatia for arquivo in args.arquivos for fatia in dividir_arquivo(arquivo, partes)]
+    except ValueError as e:
+        print(f"ERRO: {str(e)}")
+        sys.exit(1)
+    total = processar_em_paralelo(fatias, args.processos)
+
+    resultados = resultados_finais(total, com_tempos=not args.sem_graficos)
+    motor_analise.exibir_relatorio(resultados)
+
+    if not args.sem_graficos:
+        renderizar(motor_analise.tarefas_graficos(resultados), args.paralelo, args.processos)
+
+    if args.conferir:
+        divergencias = conferir(resultados, args.arquivos)
+        if divergencias:
+            for divergencia in divergencias:
+                print(f"ERRO: {divergencia}")
+            sys.exit(1)
+        print(f"Conferência: resultados de {len(fatias)} fatias idênticos aos da execução única.")
+
+    print("\nAnálise concluída!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+import pandas as pd
+import argparse
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from carregador import carregar_csv
+from esquema import colunas_para
+from instrumentacao import medir
+from normalizacao import remover_acentos
+
+# Trechos reutilizados pelas regras (o texto é comparado sem acentos e em minúsculas)
+_BANDEIRA = r'(?:visa|master\s*card|american\s+express|amex)'
+_CARTAO = rf'(?:cartao(?:\s+de\s+credito)?(?:\s+{_BANDEIRA})?|{_BANDEIRA})'
+_PARA = r'(?:\s*(?:->|=>|→)\s*|\s+(?:para|pra|p/|por)\s+)'
+_PLANO = r'(?:o\s+)?(?:plano\s+)?(?:webmail\s+)?'
+_ANTES = r'[^.;]*?,?\s*antes\s+(?:era\s+|pagava\s+(?:com\s+|no\s+)?)?'
+
+# Regras de extração: evento -> (padrão, categoria, descrição no relatório).
+# A ordem importa: quando duas regras casam na mesma posição, vale a primeira.
+REGRAS = {
+    'migracao_gold_mensal': (
+        rf'(?:migr\w*|mudou|passou|alterad\w*)\s+(?:de\s+\w+(?:\s+\w+)?\s+)?(?:para|pra|p/)\s+{_PLANO}gold\s+mensal',
+        'Mudanças de Plano', 'clientes migraram para planos Gold Mensal/Webmail Gold Mensal'),
+    'gold_para_silver': (
+        rf'gold{_PARA}{_PLANO}silver',
+        'Mudanças de Plano', 'clientes passaram de Gold para Silver'),
+    'silver_para_gold': (
+        rf'silver{_PARA}{_PLANO}gold',
+        'Mudanças de Plano', 'clientes passaram de Silver para Gold'),
+    'hibernacao': (
+        r'hibern\w*',
+        'Mudanças de Plano', 'contas hibernando por inatividade'),
+    'boleto_para_cartao': (
+        rf'boleto{_PARA}{_CARTAO}|{_CARTAO}{_ANTES}boleto',
+        'Alterações de Forma de Pagamento', 'clientes migraram de boleto para cartão'),
+    'cartao_para_boleto': (
+        rf'{_CARTAO}{_PARA}boleto|boleto{_ANTES}{_CARTAO}',
+        'Alterações de Forma de Pagamento', 'clientes migraram de cartão de crédito para boleto'),
+    'troca_cartao': (
+        rf'{_BANDEIRA}{_PARA}(?:cartao\s+)?{_BANDEIRA}',
+        'Alterações de Forma de Pagamento',
+        'clientes alteraram entre cartões de crédito (Visa/Mastercard/American Express)'),
+    'pop_gratuita': (
+        r'pop\s+gratuit\w*',
+        'Contas e Planos', 'contas "pop gratuitas" associadas a pacotes Virtua'),
+}
+
+# Todas as regras em uma única expressão com grupos nomeados: cada texto é percorrido
+# uma vez só, e o nome do grupo que casou identifica a regra
+PADRAO_COMBINADO = re.compile('|'.join(f'(?P<{evento}>{padrao})' for evento, (padrao, _, _) in REGRAS.items()))
+
+# Palavras em que uma regra pode começar. Procurá-las é barato (prefixos literais), e o padrão
+# combinado só é testado nessas posições; toda regra nova precisa começar por um destes gatilhos
+GATILHOS = re.compile(r'\b(?:migr|mudou|passou|alterad|gold|silver|hibern|boleto|cartao|visa|master'
+                      r'|american|amex|pop)')
+
+# Textos distintos enviados a cada processo, e mínimo para valer a pena usar o pool
+TAMANHO_BLOCO = 20_000
+MINIMO_PARALELO = 100_000
+
+ARQUIVO_EVENTOS = 'eventos_observacoes.csv'
+
+
+def preparar_texto(texto):
+    """Forma usada na comparação: sem acentos e em minúsculas"""
+    return remover_acentos(texto).casefold()
+
+
+def casar_textos(textos):
+    """Aplica as regras a uma lista de (código, texto) e devolve (código, evento, trecho)"""
+    encontrados = []
+    for codigo, texto in textos:
+        texto = preparar_texto(texto)
+        fim = 0
+        for gatilho in GATILHOS.finditer(texto):
+            # Como em finditer, ocorrências não se sobrepõem
+            if gatilho.start() < fim:
+                continue
+            ocorrencia = PADRAO_COMBINADO.match(texto, gatilho.start())
+            if ocorrencia:
+                encontrados.append((codigo, ocorrencia.lastgroup, ocorrencia.group()))
+                fim = ocorrencia.end()
+    return encontrados
+
+
+def _casar_distintos(distintos, processos=None):
+    """Casa os textos distintos, em blocos paralelos quando são muitos"""
+    textos = [(codigo, texto) for codigo, texto in enumerate(distintos) if texto]
+    if len(textos) < MINIMO_PARALELO or processos == 1:
+        return casar_textos(textos)
+
+    blocos = [textos[i:i + TAMANHO_BLOCO] for i in range(0, len(textos), TAMANHO_BLOCO)]
+    print(f"Aplicando regras a {len(textos)} textos distintos em {len(blocos)} blocos paralelos...", flush=True)
+    encontrados = []
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        for parcial in pool.map(casar_textos, blocos):
+            encontrados.extend(parcial)
+    return encontrados
+
+
+@medir('regras_observacoes')
+def extrair_eventos(df, processos=None):
+    """Extrai os eventos estruturados (login, evento, categoria, trecho) do campo observacoes"""
+    # Observações se repetem muito: as regras rodam só sobre os textos distintos
+    codigos, distintos = pd.factorize(df['observacoes'].astype(object), use_na_sentinel=True)
+    encontrados = pd.DataFrame(_casar_distintos([str(texto) for texto in distintos], processos),
+                               columns=['codigo', 'evento', 'trecho'])
+
+    linhas = pd.DataFrame({'login': df['login'].to_numpy(), 'codigo': codigos})
+    eventos = linhas.merge(encontrados, on='codigo', sort=False).drop(columns='codigo')
+    eventos.insert(2, 'categoria', eventos['evento'].map({evento: regra[1] for evento, regra in REGRAS.items()}))
+    return eventos
+
+
+def contar_eventos(eventos):
+    """Contagem de logins distintos e de ocorrências por evento, na ordem das regras"""
+    por_evento = eventos.groupby('evento')['login']
+    contagem = pd.DataFrame({
+        'categoria': [regra[1] for regra in REGRAS.values()],
+        'descricao': [regra[2] for regra in REGRAS.values()],
+        'logins': por_evento.nunique().reindex(list(REGRAS), fill_value=0),
+        'ocorrencias': por_evento.size().reindex(list(REGRAS), fill_value=0),
+    }, index=list(REGRAS))
+    return contagem
+
+
+def exibir_resumo(contagem):
+    """Imprime as contagens agrupadas por categoria, no formato dos insights do README"""
+    for categoria, grupo in contagem.groupby('categoria', sort=False):
+        print(f"\n{categoria}:\n")
+        for _, linha in grupo.iterrows():
+            print(f"- {linha['logins']} {linha['descricao']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extrai eventos de mudança de plano e de pagamento do campo observacoes")
+    parser.add_argument('arquivo', nargs='?', default='z_raw_data_active.csv',
+                        help="CSV de entrada (padrão: z_raw_data_active.csv)")
+    parser.add_argument('--saida', default=ARQUIVO_EVENTOS,
+                        help=f"CSV com os eventos por login (padrão: {ARQUIVO_EVENTOS})")
+    parser.add_argument('--processos', type=int, default=None,
+                        help="número de processos para aplicar as regras (1 desativa o paralelismo)")
+    args = parser.parse_args(argv)
+
+    print("Iniciando extração de eventos das observações...")
+    if not os.path.exists(args.arquivo):
+        print(f"ERRO: Arquivo {args.arquivo} não encontrado!")
+        sys.exit(1)
+
+    df = carregar_csv(args.arquivo, colunas=colunas_para('observacoes'))
+    print(f"Total de registros carregados: {len(df)}")
+
+    eventos = extrair_eventos(df, args.processos)
+    eventos.to_csv(args.saida, index=False)
+    print(f"{len(eventos)} eventos salvos em '{args.saida}'")
+
+    exibir_resumo(contar_eventos(eventos))
+
+
+if __name__ == "__main__":
+    main()
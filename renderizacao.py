@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+import os
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from instrumentacao import etapa
+
+# Backends do matplotlib que apenas gravam arquivos, sem abrir janelas
+BACKENDS_NAO_INTERATIVOS = {'agg', 'pdf', 'pgf', 'ps', 'svg', 'cairo', 'template'}
+
+
+def configurar_backend_headless():
+    """Seleciona o backend não interativo (Agg), para execuções em servidores e em lote"""
+    # A variável de ambiente é herdada pelos processos do pool de renderização
+    os.environ['MPLBACKEND'] = 'Agg'
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def modo_headless():
+    """Indica se o backend ativo do matplotlib é não interativo"""
+    import matplotlib
+    return matplotlib.get_backend().lower() in BACKENDS_NAO_INTERATIVOS
+
+
+def exibir_e_fechar():
+    """Mostra a figura atual apenas em backends interativos e libera sua memória"""
+    import matplotlib.pyplot as plt
+    if not modo_headless():
+        plt.show()
+    plt.close()
+
+
+def agrupar_outros(contagem, maximo=10):
+    """Mantém as maiores fatias e soma as demais em "Outros", para gráficos de pizza legíveis"""
+    if len(contagem) <= maximo:
+        return contagem
+    contagem_ordenada = contagem.sort_values(ascending=False)
+    principais = contagem_ordenada.head(maximo - 1)
+    outros = pd.Series({'Outros': contagem_ordenada[maximo - 1:].sum()})
+    return pd.concat([principais, outros])
+
+
+def renderizar_em_paralelo(tarefas, processos=None):
+    """Executa funções de renderização independentes em um pool de processos"""
+    # Cada tarefa é uma tupla (funcao, argumentos); a função precisa estar definida
+    # no nível de módulo para poder ser enviada aos processos
+    print(f"Renderizando {len(tarefas)} gráficos em paralelo...", flush=True)
+    with ProcessPoolExecutor(max_workers=processos, initializer=configurar_backend_headless) as pool:
+        futuros = [pool.submit(funcao, *argumentos) for funcao, argumentos in tarefas]
+        resultados = []
+        for futuro in futuros:
+            try:
+                resultados.append(futuro.result())
+            except Exception as e:
+                print(f"ERRO ao renderizar gráfico: {str(e)}", flush=True)
+                resultados.append(None)
+    return resultados
+
+
+def renderizar(tarefas, paralelo=False, processos=None):
+    """Renderiza as tarefas em sequência ou, se solicitado, em um pool de processos"""
+    with etapa('renderizar', graficos=len(tarefas), paralelo=paralelo):
+        if paralelo:
+            return renderizar_em_paralelo(tarefas, processos)
+        return [funcao(*argumentos) for funcao, argumentos in tarefas]
+
+
+def adicionar_argumentos(parser):
+    """Adiciona ao parser as opções comuns de renderização"""
+    parser.add_argument('--headless', action='store_true',
+                        help="usa um backend não interativo e não abre janelas")
+    parser.add_argument('--sem-graficos', action='store_true',
+                        help="calcula apenas os números, sem gerar gráficos")
+    parser.add_argument('--paralelo', action='store_true',
+                        help="renderiza gráficos independentes em um pool de processos")
+    parser.add_argument('--processos', type=int, default=None,
+                        help="número de processos do pool de renderização")
+
+
+def aplicar_argumentos(args):
+    """Configura o backend conforme as opções de renderização escolhidas"""
+    # Sem gráficos, o matplotlib nem chega a ser importado
+    if args.sem_graficos:
+        return
+    if args.headless or args.paralelo:
+        configurar_backend_headless()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+import pandas as pd
+import numpy as np
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from functools import lru_cache
+from urllib.parse import urlsplit, parse_qsl, unquote
+from carregador import carregar_csv
+from esquema import colunas_para
+from indice_ativos import ARQUIVO_ATIVOS, carregar_indice
+from analise_por_status import ORDEM_DIMENSOES, marcar_status, derivar_dimensoes
+from normalizacao import ABREVIACOES_POR_DIMENSAO, chave_canonica, chave_texto
+
+HOST_PADRAO = '127.0.0.1'
+PORTA_PADRAO = 8765
+
+# Intervalo, em segundos, entre as verificações de mudança nos arquivos de origem
+INTERVALO_VERIFICACAO = 2.0
+
+# Resultados de consultas agregadas guardados em memória (LRU)
+TAMANHO_CACHE = 1024
+
+# Colunas com índice invertido (valor -> posições das linhas); servem de filtro e de agrupamento
+COLUNAS_INDEXADAS = ['status', 'cidade', 'tipo_plano', 'tipo_pessoa', 'faixa_etaria', 'tempo_categoria']
+
+# Colunas devolvidas na consulta por login
+COLUNAS_LOGIN = ['login', 'status', 'cidade', 'tipo_plano', 'tipo_pessoa', 'cpf_cnpj',
+                 'data_cadastro', 'data_nascimento', 'idade', 'faixa_etaria', 'tempo_plataforma']
+
+MOTIVOS_HTTP = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+_VAZIO = np.empty(0, dtype=np.intp)
+
+
+class ErroConsulta(Exception):
+    """Consulta inválida, respondida com o código HTTP indicado"""
+
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def assinatura_arquivos(*caminhos):
+    """Tamanho e data de modificação dos arquivos, para detectar alterações"""
+    assinatura = []
+    for caminho in caminhos:
+        info = os.stat(caminho)
+        assinatura.append((info.st_size, info.st_mtime_ns))
+    return tuple(assinatura)
+
+
+def _json(dados):
+    return json.dumps(dados, ensure_ascii=False, default=str).encode('utf-8')
+
+
+class BaseConsultas:
+    """Dataset carregado uma vez, com índices por valor e cache de resultados"""
+
+    def __init__(self, arquivo, arquivo_ativos=ARQUIVO_ATIVOS, tamanho_cache=TAMANHO_CACHE):
+        self.arquivo = arquivo
+        self.arquivo_ativos = arquivo_ativos
+        self.assinatura = assinatura_arquivos(arquivo, arquivo_ativos)
+
+        inicio = time.perf_counter()
+        indice = carregar_indice(arquivo_ativos)
+        df = carregar_csv(arquivo, colunas=colunas_para('planos', 'cidades', 'pf_pj', 'idade', 'tempo'))
+        df = derivar_dimensoes(marcar_status(df, indice)).reset_index(drop=True)
+        self.df = df
+
+        # Posições (ordenadas) das linhas de cada valor; as chaves ignoram caixa, acentos e espaços
+        self.indices = {}
+        for coluna in COLUNAS_INDEXADAS:
+            posicoes = df.groupby(coluna, observed=True, sort=False).indices
+            self.indices[coluna] = {chave_texto(str(valor)): pos for valor, pos in posicoes.items()}
+        self.logins = df.groupby('login', sort=False).indices
+
+        # O cache pertence à instância: uma recarga começa com o cache vazio
+        self.contar = lru_cache(maxsize=tamanho_cache)(self._contar)
+        self.carregado_em = datetime.now().isoformat(timespec='seconds')
+        print(f"{len(df)} registros carregados e indexados em {time.perf_counter() - inicio:.2f}s", flush=True)
+
+    def _linhas(self, filtros):
+        """Posições das linhas que atendem a todos os filtros ((coluna, (chaves...)), ...)"""
+        conjuntos = []
+        for coluna, chaves in filtros:
+            indice = self.indices[coluna]
+            partes = [indice.get(chave, _VAZIO) for chave in chaves]
+            # Vários valores para a mesma coluna são alternativas (OU)
+            conjuntos.append(partes[0] if len(partes) == 1 else np.unique(np.concatenate(partes)))
+        if not conjuntos:
+            return None
+        # Interseção começando pelo menor conjunto
+        conjuntos.sort(key=len)
+        linhas = conjuntos[0]
+        for conjunto in conjuntos[1:]:
+            if len(linhas) == 0:
+                break
+            linhas = np.intersect1d(linhas, conjunto, assume_unique=True)
+        return linhas
+
+    def _contar(self, filtros, por):
+        """Corpo JSON da contagem (e, opcionalmente, da distribuição por uma coluna) das linhas filtradas"""
+        linhas = self._linhas(filtros)
+        total = len(self.df) if linhas is None else len(linhas)
+        resposta = {'total': total, 'filtros': {coluna: list(chaves) for coluna, chaves in filtros}}
+        if por is not None:
+            serie = self.df[por] if linhas is None else self.df[por].iloc[linhas]
+            contagens = serie.value_counts(dropna=False)
+            contagens = contagens[contagens > 0]
+            contagens = {('Não informado' if pd.isna(valor) else str(valor)): int(n)
+                         for valor, n in contagens.items()}
+            if por in ORDEM_DIMENSOES:
+                # Faixas na ordem das faixas, como no cubo, com "Não informado" no fim
+                ordem = {rotulo: i for i, rotulo in enumerate(ORDEM_DIMENSOES[por])}
+                contagens = dict(sorted(contagens.items(), key=lambda par: ordem.get(par[0], len(ordem))))
+            resposta['por'] = por
+            resposta['contagens'] = contagens
+        return _json(resposta)
+
+    def consultar_login(self, login):
+        """Corpo JSON com os registros de um login"""
+        posicoes = self.logins.get(login)
+        if posicoes is None:
+            raise ErroConsulta(404, f"login '{login}' não encontrado")
+        registros = self.df.iloc[posicoes][[col for col in COLUNAS_LOGIN if col in self.df.columns]]
+        return _json({'login': login,
+                      'registros': json.loads(registros.to_json(orient='records', date_format='iso',
+                                                                force_ascii=False))})
+
+    def saude(self):
+        """Corpo JSON com o estado do serviço"""
+        info = self.contar.cache_info()
+        return _json({'arquivo': self.arquivo, 'registros': len(self.df), 'carregado_em': self.carregado_em,
+                      'cache': {'acertos': info.hits, 'falhas': info.misses, 'tamanho': info.currsize}})
+
+
+def interpretar_filtros(parametros):
+    """Converte os parâmetros da URL em uma chave canônica (filtros ordenados, coluna de agrupamento)"""
+    filtros = {}
+    por = None
+    for nome, valor in parametros:
+        if nome == 'por':
+            if valor not in COLUNAS_INDEXADAS:
+                raise ErroConsulta(400, f"agrupamento desconhecido: '{valor}'")
+            por = valor
+        elif nome in COLUNAS_INDEXADAS:
+            # Abreviações (por exemplo, "Nit." para Niterói) são resolvidas como no cubo
+            filtros.setdefault(nome, set()).add(chave_canonica(valor, ABREVIACOES_POR_DIMENSAO.get(nome)))
+        else:
+            raise ErroConsulta(400, f"filtro desconhecido: '{nome}'")
+    # A mesma consulta com parâmetros em outra ordem reaproveita o resultado em cache
+    return tuple(sorted((coluna, tuple(sorted(chaves))) for coluna, chaves in filtros.items())), por
+
+
+class ServicoConsultas:
+    """Servidor HTTP (asyncio) que responde consultas sobre a base em memória"""
+
+    def __init__(self, arquivo, arquivo_ativos=ARQUIVO_ATIVOS, tamanho_cache=TAMANHO_CACHE):
+        self.tamanho_cache = tamanho_cache
+        self.base = BaseConsultas(arquivo, arquivo_ativos, tamanho_cache)
+
+    def responder(self, metodo, alvo):
+        """Retorna (status HTTP, corpo JSON) para uma requisição"""
+        if metodo != 'GET':
+            raise ErroConsulta(405, "apenas GET é suportado")
+        url = urlsplit(alvo)
+        base = self.base
+        if url.path == '/contagem':
+            filtros, por = interpretar_filtros(parse_qsl(url.query, keep_blank_values=True))
+            return 200, base.contar(filtros, por)
+        if url.path.startswith('/login/'):
+            return 200, base.consultar_login(unquote(url.path[len('/login/'):]))
+        if url.path == '/saude':
+            return 200, base.saude()
+        raise ErroConsulta(404, f"caminho desconhecido: '{url.path}'")
+
+    async def atender(self, leitor, escritor):
+        """Atende uma conexão, com suporte a keep-alive (HTTP/1.1)"""
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                partes = linha.decode('latin-1').split()
+                cabecalhos = {}
+                while True:
+                    cabecalho = await leitor.readline()
+                    if cabecalho in (b'\r\n', b'\n', b''):
+                        break
+                    nome, _, valor = cabecalho.decode('latin-1').partition(':')
+                    cabecalhos[nome.strip().lower()] = valor.strip().lower()
+
+                manter = (len(partes) == 3 and partes[2] == 'HTTP/1.1'
+                          and cabecalhos.get('connection') != 'close')
+                try:
+                    if len(partes) != 3:
+                        raise ErroConsulta(400, "requisição inválida")
+                    status, corpo = self.responder(partes[0], partes[1])
+                except ErroConsulta as e:
+                    status, corpo = e.status, _json({'erro': str(e)})
+
+                escritor.write(
+                    f"HTTP/1.1 {status} {MOTIVOS_HTTP[status]}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(corpo)}\r\n"
+                    f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n".encode('latin-1') + corpo)
+                await escritor.drain()
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    async def vigiar_arquivos(self, intervalo=INTERVALO_VERIFICACAO):
+        """Recarrega a base quando o dump ou o arquivo de ativos muda"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(intervalo)
+            base = self.base
+            try:
+                if assinatura_arquivos(base.arquivo, base.arquivo_ativos) == base.assinatura:
+                    continue
+                print("Arquivos de origem alterados; recarregando a base...", flush=True)
+                # A carga roda fora do loop de eventos: as consultas seguem na base antiga até a troca
+                self.base = await loop.run_in_executor(
+                    None, BaseConsultas, base.arquivo, base.arquivo_ativos, self.tamanho_cache)
+            except Exception as e:
+                print(f"ERRO ao recarregar a base: {str(e)}", flush=True)
+
+
+async def servir(servico, host=HOST_PADRAO, porta=PORTA_PADRAO, intervalo=INTERVALO_VERIFICACAO):
+    """Inicia o servidor HTTP e a verificação periódica dos arquivos"""
+    servidor = await asyncio.start_server(servico.atender, host, porta)
+    vigia = asyncio.create_task(servico.vigiar_arquivos(intervalo))
+    print(f"Serviço de consultas em http://{host}:{porta} (/contagem, /login/<login>, /saude)", flush=True)
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        vigia.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serviço HTTP local de consultas agregadas sobre a base em memória")
+    parser.add_argument('arquivo', nargs='?', default='z_raw_data.csv',
+                        help="dump completo (padrão: z_raw_data.csv)")
+    parser.add_argument('--ativos', default=ARQUIVO_ATIVOS,
+                        help=f"arquivo de usuários ativos (padrão: {ARQUIVO_ATIVOS})")
+    parser.add_argument('--host', default=HOST_PADRAO, help=f"endereço de escuta (padrão: {HOST_PADRAO})")
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO, help=f"porta (padrão: {PORTA_PADRAO})")
+    parser.add_argument('--intervalo', type=float, default=INTERVALO_VERIFICACAO,
+                        help=f"segundos entre verificações de alteração dos arquivos (padrão: {INTERVALO_VERIFICACAO})")
+    parser.add_argument('--cache', type=int, default=TAMANHO_CACHE,
+                        help=f"consultas guardadas no cache LRU (padrão: {TAMANHO_CACHE})")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.arquivo):
+        print(f"ERRO: Arquivo {args.arquivo} não encontrado!")
+        sys.exit(1)
+
+    servico = ServicoConsultas(args.arquivo, args.ativos, args.cache)
+    try:
+        asyncio.run(servir(servico, args.host, args.porta, args.intervalo))
+    except KeyboardInterrupt:
+        print("\nServiço encerrado.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,30 @@
 .4#!/usr/bin/env python3
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
-import seaborn as sns
 from datetime import datetime
 import sys
 import os
+import argparse
+from carregador import carregar_csv
+from datas import converter_coluna_data, data_referencia as converter_data_referencia
+from renderizacao import renderizar, adicionar_argumentos, aplicar_argumentos
+from instrumentacao import medir
+from esquema import colunas_para
+
+# Data de referência da análise (16 de junho de 2025)
+DATA_ATUAL = datetime(2025, 6, 16)
+
+# Categorias de tempo de plataforma, em anos
+FAIXAS_TEMPO = [0, 5, 10, 15, 20, 25, 30, float('inf')]
+LABELS_TEMPO = ['0-5', '5-10', '10-15', '15-20', '20-25', '25-30', '30+']
+
+def tempo_em_anos(datas_cadastro, data_referencia=DATA_ATUAL):
+    """Tempo decorrido desde o cadastro até a data de referência, em anos"""
+    return (data_referencia - datas_cadastro).dt.days / 365.25
+
+def categorizar_tempo(tempos):
+    """Agrupa tempos de plataforma nas categorias de anos"""
+    return pd.cut(tempos, bins=FAIXAS_TEMPO, labels=LABELS_TEMPO)
 
 def carregar_dados():
     """Carrega os dados do arquivo CSV"""
@@ -17,14 +36,15 @@ def carregar_dados():
             sys.exit(1)
 
         # Lê o arquivo CSV
-        df = pd.read_csv('z_raw_data_active.csv')
+        df = carregar_csv('z_raw_data_active.csv', colunas=colunas_para('tempo'))
         print(f"Total de registros carregados: {len(df)}")
         return df
     except Exception as e:
         print(f"ERRO ao carregar o arquivo CSV: {str(e)}")
         sys.exit(1)
 
-def calcular_tempo_plataforma(df):
+@medir('agregar_tempo_plataforma')
+def calcular_tempo_plataforma(df, data_referencia=DATA_ATUAL):
     """Calcula o tempo de plataforma para cada login"""
     try:
         print("Calculando tempo de plataforma para cada login...")
@@ -35,13 +55,10 @@ def calcular_tempo_plataforma(df):
             sys.exit(1)
 
         # Converter a coluna de data de cadastro para datetime
-        df['data_cadastro'] = pd.to_datetime(df['data_cadastro'], format='%d/%m/%Y', errors='coerce')
-
-        # Definir a data atual (16 de junho de 2025)
-        data_atual = datetime(2025, 6, 16)
+        converter_coluna_data(df, 'data_cadastro')
 
         # Calcular a diferença entre a data atual e a data de cadastro em anos
-        df['tempo_plataforma'] = (data_atual - df['data_cadastro']).dt.days / 365.25
+        df['tempo_plataforma'] = tempo_em_anos(df['data_cadastro'], data_referencia)
 
         # Exibir algumas estatísticas básicas
         print("Estatísticas básicas do tempo de plataforma (em anos):")
@@ -64,11 +81,7 @@ def calcular_tempo_plataforma(df):
         df = df[df['tempo_plataforma'] >= 0]  # remove tempos negativos, se houver
 
         # Agrupar em categorias de anos
-        df['tempo_categoria'] = pd.cut(
-            df['tempo_plataforma'],
-            bins=[0, 5, 10, 15, 20, 25, 30, float('inf')],
-            labels=['0-5', '5-10', '10-15', '15-20', '20-25', '25-30', '30+']
-        )
+        df['tempo_categoria'] = categorizar_tempo(df['tempo_plataforma'])
 
         return df, media, mediana, variancia, desvio_padrao
     except Exception as e:
@@ -95,86 +108,134 @@ def analisar_distribuicao(df, media, mediana, variancia, desvio_padrao):
         print(f"ERRO na análise de distribuição: {str(e)}")
         return None, None
 
-def gerar_graficos(df, distribuicao, freq_por_ano, media, mediana, variancia, desvio_padrao):
+def configurar_estilo():
+    """Configuração visual para os gráficos"""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    plt.style.use('ggplot')
+    sns.set(font_scale=1.1)
+
+def grafico_histograma(tempos, media, mediana):
+    """Histograma de distribuição de tempo na plataforma"""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    configurar_estilo()
+    plt.figure(figsize=(12, 7))
+    sns.histplot(tempos, bins=20, kde=True)
+    plt.axvline(media, color='red', linestyle='--', label=f'Média: {media:.2f} anos')
+    plt.axvline(mediana, color='green', linestyle='-', label=f'Mediana: {mediana:.2f} anos')
+    plt.title('Distribuição do Tempo de Plataforma', fontsize=16)
+    plt.xlabel('Tempo na Plataforma (anos)', fontsize=14)
+    plt.ylabel('Número de Usuários', fontsize=14)
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig('histograma_tempo_plataforma.png')
+    plt.close()
+    print("Histograma salvo como 'histograma_tempo_plataforma.png'")
+
+def grafico_categorias(distribuicao):
+    """Gráfico de barras para categorias de tempo"""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    configurar_estilo()
+    plt.figure(figsize=(12, 7))
+    sns.barplot(x=distribuicao.index, y=distribuicao.values)
+    plt.title('Distribuição por Categorias de Tempo', fontsize=16)
+    plt.xlabel('Categoria de Tempo (anos)', fontsize=14)
+    plt.ylabel('Número de Usuários', fontsize=14)
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.savefig('categorias_tempo_plataforma.png')
+    plt.close()
+    print("Gráfico de categorias salvo como 'categorias_tempo_plataforma.png'")
+
+def grafico_cadastros_por_ano(freq_por_ano):
+    """Gráfico de linha para frequência por ano de cadastro"""
+    import matplotlib.pyplot as plt
+    configurar_estilo()
+    plt.figure(figsize=(14, 7))
+    freq_por_ano.plot(kind='line', marker='o', linewidth=2)
+    plt.title('Número de Cadastros por Ano', fontsize=16)
+    plt.xlabel('Ano de Cadastro', fontsize=14)
+    plt.ylabel('Número de Cadastros', fontsize=14)
+    plt.grid(True)
+    plt.tight_layout()
+    plt.savefig('cadastros_por_ano.png')
+    plt.close()
+    print("Gráfico de cadastros por ano salvo como 'cadastros_por_ano.png'")
+
+def grafico_boxplot(tempos):
+    """Boxplot para visualizar a distribuição e outliers"""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    configurar_estilo()
+    plt.figure(figsize=(10, 6))
+    sns.boxplot(x=tempos)
+    plt.title('Boxplot do Tempo na Plataforma', fontsize=16)
+    plt.xlabel('Tempo na Plataforma (anos)', fontsize=14)
+    plt.tight_layout()
+    plt.savefig('boxplot_tempo_plataforma.png')
+    plt.close()
+    print("Boxplot salvo como 'boxplot_tempo_plataforma.png'")
+
+def grafico_metricas(media, mediana, variancia, desvio_padrao):
+    """Gráfico para mostrar média, mediana, variância e desvio padrão"""
+    import matplotlib.pyplot as plt
+    configurar_estilo()
+    plt.figure(figsize=(10, 6))
+    metricas = ['Média', 'Mediana', 'Desvio Padrão']
+    valores = [media, mediana, desvio_padrao]
+    colors = ['#FF9999', '#66B2FF', '#99FF99']
+
+    bars = plt.bar(metricas, valores, color=colors)
+    plt.title('Métricas Estatísticas do Tempo na Plataforma', fontsize=16)
+    plt.ylabel('Anos', fontsize=14)
+
+    # Adicionar valores nas barras
+    for bar in bars:
+        height = bar.get_height()
+        plt.text(bar.get_x() + bar.get_width()/2., height + 0.1,
+                f'{height:.2f}', ha='center', va='bottom', fontsize=12)
+
+    # Adicionar informação sobre variância em um texto
+    plt.figtext(0.5, 0.01, f'Variância: {variancia:.2f}', ha='center', fontsize=14)
+
+    plt.tight_layout()
+    plt.savefig('metricas_estatisticas.png')
+    plt.close()
+    print("Gráfico de métricas estatísticas salvo como 'metricas_estatisticas.png'")
+
+def tarefas_graficos(tempos, distribuicao, freq_por_ano, media, mediana, variancia, desvio_padrao):
+    """Lista os gráficos de tempo de plataforma como tarefas independentes de renderização"""
+    return [
+        (grafico_histograma, (tempos, media, mediana)),
+        (grafico_categorias, (distribuicao,)),
+        (grafico_cadastros_por_ano, (freq_por_ano,)),
+        (grafico_boxplot, (tempos,)),
+        (grafico_metricas, (media, mediana, variancia, desvio_padrao)),
+    ]
+
+def gerar_graficos(df, distribuicao, freq_por_ano, media, mediana, variancia, desvio_padrao,
+                   paralelo=False, processos=None):
     """Gera gráficos para análise"""
     try:
         print("Gerando gráficos de análise...")
 
-        # Configuração visual para os gráficos
-        plt.style.use('ggplot')
-        sns.set(font_scale=1.1)
-
-        # 1. Histograma de distribuição de tempo na plataforma
-        plt.figure(figsize=(12, 7))
-        sns.histplot(df['tempo_plataforma'], bins=20, kde=True)
-        plt.axvline(media, color='red', linestyle='--', label=f'Média: {media:.2f} anos')
-        plt.axvline(mediana, color='green', linestyle='-', label=f'Mediana: {mediana:.2f} anos')
-        plt.title('Distribuição do Tempo de Plataforma', fontsize=16)
-        plt.xlabel('Tempo na Plataforma (anos)', fontsize=14)
-        plt.ylabel('Número de Usuários', fontsize=14)
-        plt.legend()
-        plt.tight_layout()
-        plt.savefig('histograma_tempo_plataforma.png')
-        print("Histograma salvo como 'histograma_tempo_plataforma.png'")
-
-        # 2. Gráfico de barras para categorias de tempo
-        plt.figure(figsize=(12, 7))
-        sns.barplot(x=distribuicao.index, y=distribuicao.values)
-        plt.title('Distribuição por Categorias de Tempo', fontsize=16)
-        plt.xlabel('Categoria de Tempo (anos)', fontsize=14)
-        plt.ylabel('Número de Usuários', fontsize=14)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig('categorias_tempo_plataforma.png')
-        print("Gráfico de categorias salvo como 'categorias_tempo_plataforma.png'")
-
-        # 3. Gráfico de linha para frequência por ano de cadastro
-        plt.figure(figsize=(14, 7))
-        freq_por_ano.plot(kind='line', marker='o', linewidth=2)
-        plt.title('Número de Cadastros por Ano', fontsize=16)
-        plt.xlabel('Ano de Cadastro', fontsize=14)
-        plt.ylabel('Número de Cadastros', fontsize=14)
-        plt.grid(True)
-        plt.tight_layout()
-        plt.savefig('cadastros_por_ano.png')
-        print("Gráfico de cadastros por ano salvo como 'cadastros_por_ano.png'")
-
-        # 4. Boxplot para visualizar a distribuição e outliers
-        plt.figure(figsize=(10, 6))
-        sns.boxplot(x=df['tempo_plataforma'])
-        plt.title('Boxplot do Tempo na Plataforma', fontsize=16)
-        plt.xlabel('Tempo na Plataforma (anos)', fontsize=14)
-        plt.tight_layout()
-        plt.savefig('boxplot_tempo_plataforma.png')
-        print("Boxplot salvo como 'boxplot_tempo_plataforma.png'")
-
-        # 5. Gráfico para mostrar média, mediana, variância e desvio padrão
-        plt.figure(figsize=(10, 6))
-        metricas = ['Média', 'Mediana', 'Desvio Padrão']
-        valores = [media, mediana, desvio_padrao]
-        colors = ['#FF9999', '#66B2FF', '#99FF99']
-
-        bars = plt.bar(metricas, valores, color=colors)
-        plt.title('Métricas Estatísticas do Tempo na Plataforma', fontsize=16)
-        plt.ylabel('Anos', fontsize=14)
-
-        # Adicionar valores nas barras
-        for bar in bars:
-            height = bar.get_height()
-            plt.text(bar.get_x() + bar.get_width()/2., height + 0.1,
-                    f'{height:.2f}', ha='center', va='bottom', fontsize=12)
-
-        # Adicionar informação sobre variância em um texto
-        plt.figtext(0.5, 0.01, f'Variância: {variancia:.2f}', ha='center', fontsize=14)
-
-        plt.tight_layout()
-        plt.savefig('metricas_estatisticas.png')
-        print("Gráfico de métricas estatísticas salvo como 'metricas_estatisticas.png'")
+        tarefas = tarefas_graficos(df['tempo_plataforma'], distribuicao, freq_por_ano,
+                                   media, mediana, variancia, desvio_padrao)
+        renderizar(tarefas, paralelo, processos)
 
     except Exception as e:
         print(f"ERRO ao gerar gráficos: {str(e)}")
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Análise do tempo de plataforma dos usuários ativos")
+    parser.add_argument('--data-referencia', type=converter_data_referencia, default=DATA_ATUAL,
+                        help="data em que o tempo de plataforma é calculado (padrão: 16/06/2025)")
+    adicionar_argumentos(parser)
+    args = parser.parse_args(argv)
+    aplicar_argumentos(args)
+
     print("Iniciando análise de tempo na plataforma...")
     print(f"Diretório de trabalho: {os.getcwd()}")
 
@@ -182,13 +243,15 @@ def main():
     df = carregar_dados()
 
     # Calcular tempo de plataforma
-    df, media, mediana, variancia, desvio_padrao = calcular_tempo_plataforma(df)
+    df, media, mediana, variancia, desvio_padrao = calcular_tempo_plataforma(df, args.data_referencia)
 
     # Analisar distribuição de frequência
     distribuicao, freq_por_ano = analisar_distribuicao(df, media, mediana, variancia, desvio_padrao)
 
     # Gerar gráficos
-    gerar_graficos(df, distribuicao, freq_por_ano, media, mediana, variancia, desvio_padrao)
+    if not args.sem_graficos:
+        gerar_graficos(df, distribuicao, freq_por_ano, media, mediana, variancia, desvio_padrao,
+                       args.paralelo, args.processos)
 
     print("Análise concluída!")
 
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+import pandas as pd
+import numpy as np
+import argparse
+import os
+import sys
+from carregador import carregar_csv
+from datas import converter_coluna_data, datas_referencia
+from esquema import colunas_para
+from instrumentacao import medir
+from renderizacao import renderizar, adicionar_argumentos, aplicar_argumentos
+from distribuicao_idade import faixas_etarias, labels as LABELS_IDADE
+from tempo_plataforma import DATA_ATUAL, FAIXAS_TEMPO, LABELS_TEMPO
+
+NS_POR_DIA = 86_400 * 10 ** 9
+
+# Limite de células (datas de referência x datas distintas) calculadas de uma vez
+LIMITE_ELEMENTOS = 20_000_000
+
+# Padrão: série mensal dos dois anos anteriores à data de referência das análises
+INTERVALO_PADRAO = f"{DATA_ATUAL.replace(year=DATA_ATUAL.year - 2):%d/%m/%Y}..{DATA_ATUAL:%d/%m/%Y}"
+
+
+def _em_nanossegundos(datas):
+    return np.asarray(datas, dtype='datetime64[ns]').view(np.int64)
+
+
+def datas_distintas(datas):
+    """Datas válidas distintas (em nanossegundos) e quantas vezes cada uma aparece"""
+    return np.unique(_em_nanossegundos(pd.Series(datas).dropna()), return_counts=True)
+
+
+def matriz_faixas(datas, referencias, bordas, rotulos, fechado_a_direita=True, anos_completos=False):
+    """Matriz data de referência x faixa com a contagem de anos decorridos desde cada data"""
+    # Cada linha equivale a (referência - datas).dt.days / 365.25 seguido de pd.cut, mas o cálculo
+    # é feito de uma vez sobre a grade referências x datas distintas, ponderada pelas contagens
+    unicos, contagens = datas_distintas(datas)
+    referencias = pd.DatetimeIndex(referencias)
+    instantes = _em_nanossegundos(referencias)
+    bordas = np.asarray(bordas, dtype=float)
+    lado = 'left' if fechado_a_direita else 'right'
+    n_faixas = len(rotulos)
+
+    matriz = np.zeros((len(instantes), n_faixas), dtype=np.int64)
+    bloco = max(1, LIMITE_ELEMENTOS // max(len(unicos), 1))
+    for inicio in range(0, len(instantes), bloco):
+        parte = instantes[inicio:inicio + bloco]
+        # Divisão inteira arredonda para baixo, como Timedelta.days
+        dias = (parte[:, None] - unicos[None, :]) // NS_POR_DIA
+        anos = dias / 365.25
+        if anos_completos:
+            anos = np.trunc(anos)
+        faixa = np.searchsorted(bordas, anos, side=lado) - 1
+        validas = (faixa >= 0) & (faixa < n_faixas)
+        # Índice linear (referência, faixa) para somar todas as contagens com um único bincount
+        linhas = np.broadcast_to(np.arange(len(parte))[:, None], faixa.shape)
+        pesos = np.broadcast_to(contagens, faixa.shape)
+        somas = np.bincount(linhas[validas] * n_faixas + faixa[validas], weights=pesos[validas],
+                            minlength=len(parte) * n_faixas)
+        matriz[inicio:inicio + len(parte)] = somas.reshape(len(parte), n_faixas).astype(np.int64)
+
+    return pd.DataFrame(matriz, index=referencias.rename('data_referencia'), columns=list(rotulos))
+
+
+@medir('tendencia_idade')
+def tendencia_idade(datas_nascimento, referencias):
+    """Distribuição por faixa etária (idade completa, faixas [a, b)) em cada data de referência"""
+    return matriz_faixas(datas_nascimento, referencias, faixas_etarias, LABELS_IDADE,
+                         fechado_a_direita=False, anos_completos=True)
+
+
+@medir('tendencia_tempo')
+def tendencia_tempo(datas_cadastro, referencias):
+    """Distribuição por categoria de tempo de plataforma (faixas (a, b]) em cada data de referência"""
+    # Cadastros posteriores à data de referência têm tempo negativo e ficam fora, como em calcular_tempo_plataforma
+    return matriz_faixas(datas_cadastro, referencias, FAIXAS_TEMPO, LABELS_TEMPO, fechado_a_direita=True)
+
+
+def grafico_tendencia(matriz, titulo, rotulo_legenda, arquivo):
+    """Gráfico de áreas empilhadas da evolução das faixas ao longo das datas de referência"""
+    import matplotlib.pyplot as plt
+    matriz.plot(kind='area', stacked=True, figsize=(14, 7), linewidth=0)
+    plt.title(titulo, fontsize=16)
+    plt.xlabel('Data de referência', fontsize=14)
+    plt.ylabel('Número de Usuários', fontsize=14)
+    plt.legend(title=rotulo_legenda, bbox_to_anchor=(1.01, 1), loc='upper left')
+    plt.tight_layout()
+    plt.savefig(arquivo)
+    plt.close()
+    print(f"Gráfico salvo como '{arquivo}'")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Séries de faixa etária e tempo de plataforma em várias datas de referência")
+    parser.add_argument('arquivo', nargs='?', default='z_raw_data_active.csv',
+                        help="CSV de entrada (padrão: z_raw_data_active.csv)")
+    parser.add_argument('--data-referencia', default=INTERVALO_PADRAO,
+                        help=f"data ou intervalo INICIO..FIM (padrão: {INTERVALO_PADRAO})")
+    parser.add_argument('--frequencia', default='MS',
+                        help="passo do intervalo, como no pandas: MS (mensal), QS (trimestral), YS (anual), W, D...")
+    adicionar_argumentos(parser)
+    args = parser.parse_args(argv)
+    aplicar_argumentos(args)
+
+    if not os.path.exists(args.arquivo):
+        print(f"ERRO: Arquivo {args.arquivo} não encontrado!")
+        sys.exit(1)
+    try:
+        referencias = datas_referencia(args.data_referencia, args.frequencia)
+    except ValueError as e:
+        print(f"ERRO: {str(e)}")
+        sys.exit(1)
+    if len(referencias) == 0:
+        print(f"ERRO: nenhuma data de referência em {args.data_referencia} com frequência {args.frequencia}")
+        sys.exit(1)
+
+    df = carregar_csv(args.arquivo, colunas=colunas_para('idade', 'tempo'))
+    converter_coluna_data(df, 'data_nascimento')
+    converter_coluna_data(df, 'data_cadastro')
+    print(f"Calculando {len(referencias)} datas de referência "
+          f"({referencias[0]:%d/%m/%Y} a {referencias[-1]:%d/%m/%Y})...", flush=True)
+
+    idade = tendencia_idade(df['data_nascimento'], referencias)
+    tempo = tendencia_tempo(df['data_cadastro'], referencias)
+
+    with pd.option_context('display.max_rows', 200, 'display.width', 200):
+        print("\nDistribuição por faixa etária em cada data de referência:")
+        print(idade)
+        print("\nDistribuição por categoria de tempo (anos) em cada data de referência:")
+        print(tempo)
+    idade.to_csv('tendencia_faixa_etaria.csv')
+    tempo.to_csv('tendencia_tempo_plataforma.csv')
+    print("\nSéries salvas em 'tendencia_faixa_etaria.csv' e 'tendencia_tempo_plataforma.csv'")
+
+    if not args.sem_graficos and len(referencias) > 1:
+        renderizar([
+            (grafico_tendencia, (idade, 'Evolução por Faixa Etária', 'Faixa etária', 'tendencia_faixa_etaria.png')),
+            (grafico_tendencia, (tempo, 'Evolução por Tempo de Plataforma', 'Tempo (anos)',
+                                 'tendencia_tempo_plataforma.png')),
+        ], args.paralelo, args.processos)
+
+
+if __name__ == "__main__":
+    main()